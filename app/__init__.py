@@ -28,4 +28,12 @@ def create_app(config_class=Config):
     app.register_blueprint(volunteer_bp)
     app.register_blueprint(visitor_bp)
 
+    # Email outbox, data version and nightly stats session hooks, search DDL
+    from app import email, search, stats, versions  # noqa: F401
+
+    # CLI Commands
+    from app.commands import register_commands
+
+    register_commands(app)
+
     return app
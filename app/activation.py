@@ -0,0 +1,91 @@
+from collections import namedtuple
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Event
+from app.planning import create_events
+from app.weather import get_weather_forecast
+
+# A forecast night that meets an activation threshold. `event_id` and
+# `status` describe the event already on that date, if there is one
+Activation = namedtuple(
+    "Activation", ["date", "high", "low", "reasons", "event_id", "status"]
+)
+
+
+def activation_reasons(day, low_below, high_below=None):
+    """Why one forecast day calls for opening the shelter (empty if it does not)."""
+    reasons = []
+    if low_below is not None and day["low"] < low_below:
+        reasons.append(f"Low {day['low']}° (below {low_below:g}°)")
+    if high_below is not None and day["high"] < high_below:
+        reasons.append(f"High {day['high']}° (below {high_below:g}°)")
+    return reasons
+
+
+def propose_activations(forecast=None, today=None):
+    """
+    The nights from today on whose forecast meets the activation thresholds.
+
+    `forecast` defaults to the cached weather series. The whole series is
+    checked in one pass and matched to existing events with a single query,
+    whatever its length.
+    """
+    if forecast is None:
+        forecast = get_weather_forecast()
+    today = today or date.today()
+    low_below = current_app.config.get("ACTIVATION_LOW_BELOW")
+    high_below = current_app.config.get("ACTIVATION_HIGH_BELOW")
+
+    nights = [
+        (day, reasons)
+        for day in forecast
+        if day["date"] >= today
+        and (reasons := activation_reasons(day, low_below, high_below))
+    ]
+    if not nights:
+        return []
+
+    events = {
+        row.date: row
+        for row in db.session.execute(
+            select(Event.date, Event.id, Event.status)
+            .where(Event.date.in_([day["date"] for day, _ in nights]))
+            .order_by(Event.id.desc())
+        )
+    }
+    proposals = []
+    for day, reasons in nights:
+        event = events.get(day["date"])
+        proposals.append(
+            Activation(
+                day["date"],
+                day["high"],
+                day["low"],
+                reasons,
+                event.id if event else None,
+                event.status if event else None,
+            )
+        )
+    return proposals
+
+
+def activate(dates):
+    """
+    Create `planned` events, with the standard shifts, on `dates`.
+
+    Dates that already have an event are left alone. The caller commits.
+    Returns a SeasonPlan of the created and the skipped dates.
+    """
+    return create_events(dates, status="planned")
+
+
+def activated_events(dates):
+    """The events on `dates`, one per date, for a broadcast to cover."""
+    events = {}
+    for event in Event.query.filter(Event.date.in_(dates)).order_by(Event.id):
+        events.setdefault(event.date, event)
+    return [events[day] for day in sorted(events)]
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+from flask_mail import sanitize_address, sanitize_addresses
+
+
+class AsyncSMTPPool:
+    """
+    A small pool of authenticated SMTP connections driven by asyncio.
+
+    The event loop runs in its own daemon thread so the (synchronous)
+    email worker can hand over a batch with send_many() and block until
+    every message has an outcome. At most MAIL_ASYNC_CONCURRENCY messages
+    are in flight at once, each on its own connection, and MAIL_RATE_LIMIT
+    (messages per second, 0 for none) spaces out sends to the server.
+    Idle connections are kept for the next batch.
+    """
+
+    def __init__(self, config):
+        import aiosmtplib
+
+        self.aiosmtplib = aiosmtplib
+        self.config = config
+        self.size = max(1, int(config.get("MAIL_ASYNC_CONCURRENCY") or 1))
+        self.rate = float(config.get("MAIL_RATE_LIMIT") or 0)
+        self.idle = []
+        self.next_slot = 0.0
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="async-smtp", daemon=True
+        )
+        self.thread.start()
+        self.semaphore = self._run(self._make_semaphore())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.size)
+
+    def send_many(self, messages):
+        """Send flask_mail Messages; returns one exception or None per message."""
+        return self._run(self._send_many(messages))
+
+    def close(self):
+        """Quit the idle connections and stop the event loop."""
+        if self.loop.is_closed():
+            return
+        self._run(self._close_idle())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _send_many(self, messages):
+        results = await asyncio.gather(
+            *(self._send_one(message) for message in messages),
+            return_exceptions=True,
+        )
+        return [error if isinstance(error, Exception) else None for error in results]
+
+    async def _send_one(self, message):
+        sender = sanitize_address(message.sender)
+        recipients = list(sanitize_addresses(message.send_to))
+        payload = message.as_bytes()
+
+        async with self.semaphore:
+            await self._throttle()
+            smtp = self.idle.pop() if self.idle else None
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                try:
+                    await smtp.sendmail(sender, recipients, payload)
+                except self.aiosmtplib.SMTPServerDisconnected:
+                    # An idle connection the server has since dropped
+                    smtp = await self._connect()
+                    await smtp.sendmail(sender, recipients, payload)
+            except (
+                self.aiosmtplib.SMTPRecipientsRefused,
+                self.aiosmtplib.SMTPResponseException,
+            ):
+                # Rejected message; keep the connection if it is still usable
+                try:
+                    await smtp.rset()
+                    self.idle.append(smtp)
+                except Exception:
+                    smtp.close()
+                raise
+            except Exception:
+                if smtp is not None:
+                    smtp.close()
+                raise
+            self.idle.append(smtp)
+
+    async def _throttle(self):
+        if not self.rate:
+            return
+        now = self.loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _connect(self):
+        config = self.config
+        smtp = self.aiosmtplib.SMTP(
+            hostname=config.get("MAIL_SERVER") or "localhost",
+            port=config.get("MAIL_PORT"),
+            username=config.get("MAIL_USERNAME"),
+            password=config.get("MAIL_PASSWORD"),
+            use_tls=bool(config.get("MAIL_USE_SSL")),
+            start_tls=bool(config.get("MAIL_USE_TLS")),
+            timeout=config.get("MAIL_TIMEOUT") or 60,
+        )
+        await smtp.connect()
+        return smtp
+
+    async def _close_idle(self):
+        while self.idle:
+            smtp = self.idle.pop()
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
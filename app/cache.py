@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LRUCache:
+    """A small thread-safe mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def fragment_cache():
+    """The app's cache of rendered template fragments."""
+    cache = current_app.extensions.get("fragment_cache")
+    if cache is None:
+        size = current_app.config.get("FRAGMENT_CACHE_SIZE", 256)
+        cache = current_app.extensions.setdefault("fragment_cache", LRUCache(size))
+    return cache
+
+
+def cached_fragment(key, render):
+    """
+    Return the fragment stored under `key`, calling `render()` on a miss.
+
+    Keys should include every data version the fragment depends on (see
+    app.versions), so a write simply makes new keys and stale entries age
+    out of the LRU.
+    """
+    cache = fragment_cache()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment)
+    return fragment
@@ -0,0 +1,176 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import CheckIn, Visitor
+
+# Per-item outcomes returned by apply_checkin_batch()
+CHECKIN_CREATED = "created"
+# The client_id was applied before (a replayed or retried batch)
+CHECKIN_DUPLICATE = "duplicate"
+# The visitor already has a check-in for the event under another client_id
+CHECKIN_ALREADY = "already_checked_in"
+CHECKIN_ERROR = "error"
+
+MAX_CLIENT_ID_LENGTH = 64
+
+# Times a batch is applied when concurrent syncs keep conflicting with it
+BATCH_ATTEMPTS = 3
+
+
+class CheckInError(ValueError):
+    """An item of a batch that cannot be applied."""
+
+
+def _parse_timestamp(value):
+    """ISO 8601 timestamp as naive UTC, like CheckIn.check_in_time."""
+    if value is None:
+        return datetime.utcnow()
+    if not isinstance(value, str):
+        raise CheckInError("timestamp must be an ISO 8601 string")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise CheckInError(f"Invalid timestamp: {value}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_item(item):
+    """Validate one batch item into (client_id, visitor_id, name, timestamp)."""
+    if not isinstance(item, dict):
+        raise CheckInError("Each check-in must be an object")
+
+    client_id = item.get("client_id")
+    if not isinstance(client_id, str) or not client_id.strip():
+        raise CheckInError("client_id is required")
+    if len(client_id) > MAX_CLIENT_ID_LENGTH:
+        raise CheckInError(
+            f"client_id is longer than {MAX_CLIENT_ID_LENGTH} characters"
+        )
+
+    visitor_id = item.get("visitor_id")
+    name = item.get("name")
+    if visitor_id is not None:
+        if isinstance(visitor_id, bool) or not isinstance(visitor_id, int):
+            raise CheckInError("visitor_id must be an integer")
+    elif isinstance(name, str) and name.strip():
+        name = name.strip()
+    else:
+        raise CheckInError("Either visitor_id or name is required")
+
+    return client_id, visitor_id, name, _parse_timestamp(item.get("timestamp"))
+
+
+def apply_checkin_batch(event_id, items):
+    """
+    Apply a batch of door check-ins for an event.
+
+    Each item is ``{"client_id", "visitor_id" or "name", "timestamp"}``.
+    Items are idempotent on client_id, so a kiosk can resend a batch whose
+    response it never received. Visitors given by name are matched
+    case-insensitively (as the check-in form does) and created when
+    missing. A bad item is reported in its own result and does not stop
+    the others.
+
+    Lookups are done for the whole batch up front, so the cost is a few
+    queries regardless of its size. The caller is responsible for
+    committing; a concurrent batch carrying the same client_id makes the
+    commit fail on the unique constraint, after which the batch can simply
+    be applied again.
+
+    Returns one result dict per item, in order.
+    """
+    parsed = []
+    for item in items:
+        try:
+            parsed.append(_parse_item(item))
+        except CheckInError as e:
+            parsed.append(e)
+
+    valid = [p for p in parsed if not isinstance(p, CheckInError)]
+    client_ids = {client_id for client_id, _, _, _ in valid}
+    visitor_ids = {visitor_id for _, visitor_id, _, _ in valid if visitor_id}
+    names = {name.lower() for _, visitor_id, name, _ in valid if not visitor_id}
+
+    applied = {
+        checkin.client_id: checkin
+        for checkin in CheckIn.query.filter(CheckIn.client_id.in_(client_ids))
+    }
+    known_ids = set(
+        db.session.scalars(select(Visitor.id).where(Visitor.id.in_(visitor_ids)))
+    )
+    by_name = {}
+    for visitor in Visitor.query.filter(func.lower(Visitor.name).in_(names)).order_by(
+        Visitor.id
+    ):
+        by_name.setdefault(visitor.name.lower(), visitor)
+
+    # Keyed by visitor id, or by ("new", name) for visitors this batch creates
+    ids = known_ids | {visitor.id for visitor in by_name.values()}
+    checked_in = {
+        checkin.visitor_id: checkin
+        for checkin in CheckIn.query.filter(
+            CheckIn.event_id == event_id, CheckIn.visitor_id.in_(ids)
+        )
+    }
+
+    results = []
+    pending = []
+    for item, entry in zip(items, parsed):
+        if isinstance(entry, CheckInError):
+            client_id = item.get("client_id") if isinstance(item, dict) else None
+            results.append(
+                {"client_id": client_id, "status": CHECKIN_ERROR, "error": str(entry)}
+            )
+            continue
+
+        client_id, visitor_id, name, timestamp = entry
+        result = {"client_id": client_id}
+        results.append(result)
+
+        if client_id in applied:
+            result.update(status=CHECKIN_DUPLICATE)
+            pending.append((result, applied[client_id]))
+            continue
+
+        if visitor_id is not None:
+            if visitor_id not in known_ids:
+                result.update(
+                    status=CHECKIN_ERROR, error=f"Unknown visitor {visitor_id}"
+                )
+                continue
+            key = visitor_id
+            new_checkin = {"visitor_id": visitor_id}
+        else:
+            visitor = by_name.get(name.lower())
+            if visitor is None:
+                visitor = Visitor(name=name, alias=name)
+                db.session.add(visitor)
+                by_name[name.lower()] = visitor
+            key = visitor.id or ("new", name.lower())
+            new_checkin = {"visitor": visitor}
+
+        checkin = checked_in.get(key)
+        if checkin is not None:
+            result.update(status=CHECKIN_ALREADY)
+        else:
+            checkin = CheckIn(
+                event_id=event_id,
+                check_in_time=timestamp,
+                client_id=client_id,
+                **new_checkin,
+            )
+            db.session.add(checkin)
+            checked_in[key] = checkin
+            result.update(status=CHECKIN_CREATED)
+        applied[client_id] = checkin
+        pending.append((result, checkin))
+
+    # Fill in the ids the rows got
+    db.session.flush()
+    for result, checkin in pending:
+        result.update(checkin_id=checkin.id, visitor_id=checkin.visitor_id)
+    return results
@@ -0,0 +1,271 @@
+import signal
+import tempfile
+import threading
+import time
+
+import click
+from flask import current_app
+
+from app.extensions import db
+
+
+def register_commands(app):
+    """Attach the maintenance commands to the `flask` CLI."""
+    app.cli.add_command(check_signup_counters)
+    app.cli.add_command(send_signup_digest)
+    app.cli.add_command(email_benchmark)
+    app.cli.add_command(email_worker)
+    app.cli.add_command(search_reindex)
+    app.cli.add_command(find_duplicate_visitors)
+    app.cli.add_command(plan_season)
+    app.cli.add_command(plan_activations)
+    app.cli.add_command(rebuild_nightly_stats)
+    app.cli.add_command(export)
+
+
+@click.command("check-signup-counters")
+@click.option("--repair", is_flag=True, help="Rewrite counters that have drifted.")
+def check_signup_counters(repair):
+    """Detect (and optionally repair) drift in the shift signup counters."""
+    from app.signups import find_counter_drift, refresh_shift_counters
+
+    drift = find_counter_drift()
+    if not drift:
+        click.echo("All shift counters are consistent.")
+        return
+
+    for shift_id, stored, actual, stored_confirmed, actual_confirmed in drift:
+        click.echo(
+            f"Shift {shift_id}: signups {stored} (actual {actual}), "
+            f"confirmed {stored_confirmed} (actual {actual_confirmed})"
+        )
+
+    if repair:
+        refresh_shift_counters([row[0] for row in drift])
+        db.session.commit()
+        click.echo(f"Repaired {len(drift)} shift(s).")
+    else:
+        click.echo(f"{len(drift)} shift(s) drifted. Re-run with --repair to fix.")
+
+
+@click.command("send-signup-digest")
+@click.option("--force", is_flag=True, help="Send now, even inside the window.")
+def send_signup_digest(force):
+    """Email supervisors a summary of the unreported volunteer signups."""
+    from app.notifications import send_signup_digest as send_digest
+
+    count = send_digest(force=force)
+    click.echo(f"Reported {count} signup(s).")
+
+
+@click.command("email-benchmark")
+@click.option("--count", default=1000, show_default=True, help="Messages per run.")
+@click.option(
+    "--transport",
+    "transports",
+    multiple=True,
+    help="Transport to measure (repeatable). Defaults to null and maildir.",
+)
+def email_benchmark(count, transports):
+    """Measure messages per second for the email transports."""
+    from flask_mail import Message
+
+    from app.transports import get_transport
+
+    body = "Lorem ipsum dolor sit amet. " * 40
+    messages = [
+        Message(
+            subject=f"Benchmark {i}",
+            recipients=[f"benchmark{i}@example.com"],
+            body=body,
+            html=f"<p>{body}</p>",
+            sender=current_app.config.get("MAIL_DEFAULT_SENDER")
+            or "benchmark@example.com",
+        )
+        for i in range(count)
+    ]
+
+    for name in transports or ("null", "maildir"):
+        # Never spool benchmark mail where the real MTA picks it up
+        with tempfile.TemporaryDirectory() as spool_dir:
+            transport = get_transport(current_app, name, spool_dir=spool_dir)
+            started = time.perf_counter()
+            with transport:
+                for message in messages:
+                    transport.send(message)
+            elapsed = time.perf_counter() - started
+        click.echo(f"{name:10} {count / elapsed:12.0f} msg/s  ({elapsed:.3f}s)")
+
+
+@click.command("email-worker")
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Consumer threads (defaults to EMAIL_WORKER_THREADS).",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0),
+    default=15,
+    show_default=True,
+    help="Seconds to wait once the queue is empty.",
+)
+@click.option("--once", is_flag=True, help="Drain the queue once and exit.")
+def email_worker(threads, interval, once):
+    """Run the email queue consumer in this process."""
+    from app.email_worker import drain_queue, run_email_worker
+    from app.notifications import send_signup_digest as send_digest
+
+    app = current_app._get_current_object()
+    if once:
+        if app.config.get("SIGNUP_DIGEST_MINUTES"):
+            send_digest()
+        count = drain_queue(app)
+        click.echo(f"Processed {count} email(s).")
+        return
+
+    threads = threads or app.config.get("EMAIL_WORKER_THREADS") or 1
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        click.echo("Email worker: finishing current batches before exiting...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    run_email_worker(app, threads=threads, poll_interval=interval, stop=stop)
+    click.echo("Email worker stopped.")
+
+
+@click.command("search-reindex")
+def search_reindex():
+    """Create (if needed) and repopulate the user/visitor search index."""
+    from app.search import install_search_index
+
+    install_search_index(db.session.connection())
+    db.session.commit()
+    click.echo("Search index rebuilt.")
+
+
+@click.command("find-duplicate-visitors")
+@click.option(
+    "--threshold",
+    type=float,
+    default=None,
+    help="Lowest match score to report (0-1).",
+)
+def find_duplicate_visitors(threshold):
+    """List visitor profiles that are probably the same person."""
+    from app.dedupe import DEFAULT_THRESHOLD, find_duplicates
+
+    pairs = find_duplicates(threshold or DEFAULT_THRESHOLD)
+    for pair in pairs:
+        click.echo(
+            f"{pair.score:.2f}  #{pair.visitor_id} {pair.visitor_name}"
+            f"  ~  #{pair.other_id} {pair.other_name}"
+        )
+    click.echo(
+        f"{len(pairs)} likely duplicate pair(s). Merge them from /visitors/duplicates."
+    )
+
+
+@click.command("plan-season")
+@click.argument("start", type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.argument("end", type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.option("--weekdays", default="", help="Only these days, e.g. 'fri,sat'.")
+@click.option(
+    "--shifts",
+    default=None,
+    help="Shift template, e.g. '19:45-00:00,00:00-04:00,04:00-08:00'.",
+)
+@click.option(
+    "--status",
+    type=click.Choice(["planned", "active"]),
+    default="planned",
+    show_default=True,
+)
+@click.option("--capacity", type=click.IntRange(min=1), default=None)
+def plan_season(start, end, weekdays, shifts, status, capacity):
+    """Create events with their shifts for every night from START to END."""
+    from app.planning import parse_shift_template, parse_weekdays
+    from app.planning import plan_season as plan
+
+    try:
+        result = plan(
+            start.date(),
+            end.date(),
+            weekdays=parse_weekdays(weekdays),
+            shifts=parse_shift_template(shifts) if shifts else None,
+            status=status,
+            capacity=capacity,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
+    db.session.commit()
+
+    click.echo(f"Created {len(result.created)} event(s).")
+    for day in result.skipped:
+        click.echo(f"Skipped {day}: an event already exists.")
+
+
+@click.command("plan-activations")
+@click.option(
+    "--create", is_flag=True, help="Create planned events for the proposed nights."
+)
+def plan_activations(create):
+    """List the forecast nights that meet the activation thresholds."""
+    from app.activation import activate, propose_activations
+
+    proposals = propose_activations()
+    for night in proposals:
+        event = f"event #{night.event_id} ({night.status})" if night.event_id else "-"
+        click.echo(
+            f"{night.date}  {night.high}/{night.low}  "
+            f"{'; '.join(night.reasons)}  {event}"
+        )
+    click.echo(f"{len(proposals)} night(s) meet the activation thresholds.")
+
+    if create and proposals:
+        result = activate([night.date for night in proposals])
+        db.session.commit()
+        click.echo(f"Created {len(result.created)} planned event(s).")
+
+
+@click.command("rebuild-nightly-stats")
+def rebuild_nightly_stats():
+    """Recompute the nightly_stats rollup from scratch (run nightly)."""
+    from app.stats import rebuild_nightly_stats as rebuild
+
+    rows = rebuild()
+    db.session.commit()
+    click.echo(f"Rebuilt nightly stats for {rows} event(s).")
+
+
+@click.command("export")
+@click.argument("kind", type=click.Choice(["checkins", "signups", "emails"]))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["csv", "jsonl"]),
+    default="csv",
+    show_default=True,
+)
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w"),
+    default="-",
+    help="File to write (default: stdout).",
+)
+def export(kind, fmt, start, end, output):
+    """Stream check-ins, signups or the email log as CSV or JSON lines."""
+    from app.exports import export_chunks
+
+    for chunk in export_chunks(
+        kind, fmt, start.date() if start else None, end.date() if end else None
+    ):
+        output.write(chunk)
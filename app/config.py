@@ -15,6 +15,17 @@ class Config:
     SHELTER_NAME = os.environ.get("SHELTER_NAME") or "MECWS Shelter"
     WEATHER_LAT = float(os.environ.get("WEATHER_LAT") or 44.2601)
     WEATHER_LON = float(os.environ.get("WEATHER_LON") or -72.5754)
+    WEATHER_CACHE_SECONDS = int(os.environ.get("WEATHER_CACHE_SECONDS") or 1800)
+
+    # Forecast nights that call for activating the shelter: a low below
+    # ACTIVATION_LOW_BELOW, or (if set) a high below ACTIVATION_HIGH_BELOW,
+    # both in Fahrenheit
+    ACTIVATION_LOW_BELOW = float(os.environ.get("ACTIVATION_LOW_BELOW") or 10)
+    ACTIVATION_HIGH_BELOW = (
+        float(os.environ["ACTIVATION_HIGH_BELOW"])
+        if os.environ.get("ACTIVATION_HIGH_BELOW")
+        else None
+    )
 
     # Mail Config
     MAIL_SERVER = os.environ.get("MAIL_SERVER")
@@ -23,3 +34,53 @@ class Config:
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER")
+    # Email worker delivery: smtp, async_smtp (concurrent, pooled), sendmail,
+    # maildir (spool for a local MTA) or null (discard)
+    MAIL_TRANSPORT = os.environ.get("MAIL_TRANSPORT") or "smtp"
+    MAIL_SENDMAIL_PATH = os.environ.get("MAIL_SENDMAIL_PATH") or "/usr/sbin/sendmail"
+    MAIL_SPOOL_DIR = os.environ.get("MAIL_SPOOL_DIR") or os.path.join(
+        basedir, "../instance/maildir"
+    )
+    # async_smtp: connections/messages in flight, and messages per second
+    # allowed to the server (0 for no limit)
+    MAIL_ASYNC_CONCURRENCY = int(os.environ.get("MAIL_ASYNC_CONCURRENCY") or 5)
+    MAIL_RATE_LIMIT = float(os.environ.get("MAIL_RATE_LIMIT") or 0)
+    # Consumer threads in the `flask email-worker` process
+    EMAIL_WORKER_THREADS = int(os.environ.get("EMAIL_WORKER_THREADS") or 1)
+    # Seconds after which emails claimed by a worker that never finished them
+    # (it was killed mid-batch, say) go back to the queue
+    EMAIL_CLAIM_TIMEOUT = int(os.environ.get("EMAIL_CLAIM_TIMEOUT") or 900)
+    # Store template + context and let the email worker render at send time
+    EMAIL_DEFERRED_RENDERING = os.environ.get("EMAIL_DEFERRED_RENDERING") is not None
+    # Shared email bodies kept decompressed per process (LRU)
+    EMAIL_BODY_CACHE_SIZE = 64
+
+    # Supervisor notifications: 0 sends one email per signup, otherwise
+    # signups are collected into one digest per supervisor per window
+    SIGNUP_DIGEST_MINUTES = int(os.environ.get("SIGNUP_DIGEST_MINUTES") or 0)
+    SUPERVISOR_CACHE_SECONDS = int(os.environ.get("SUPERVISOR_CACHE_SECONDS") or 300)
+
+    # Rendered fragments kept per process (LRU); 0 disables the cache
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE") or 256)
+    # How long a process trusts its copy of the data versions behind cached
+    # fragments and ETags before re-reading them (writes made by the same
+    # process are seen immediately)
+    DATA_VERSION_TTL = float(os.environ.get("DATA_VERSION_TTL") or 2)
+
+    # Live event board (Server-Sent Events): how often each event's shared
+    # poller re-reads its version for writes made by other processes, and
+    # how many deltas it keeps for clients that reconnect
+    LIVE_POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL") or 2)
+    LIVE_HISTORY = 100
+    LIVE_QUEUE_SIZE = 100
+    LIVE_KEEPALIVE = 15
+    # Each open board holds a request thread for as long as it stays open
+    # (see README: Deployment); past this many per process the stream
+    # answers 503 and the board simply stops updating live
+    LIVE_MAX_STREAMS = int(os.environ.get("LIVE_MAX_STREAMS") or 20)
+
+    # Most check-ins the door kiosk may sync in one batch
+    CHECKIN_BATCH_LIMIT = 500
+
+    # Volunteers' iCalendar feeds kept rendered in memory
+    CALENDAR_CACHE_SIZE = 1000
@@ -0,0 +1,231 @@
+import re
+import unicodedata
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from sqlalchemy import delete, func, select, update
+
+from app.extensions import db
+from app.models import CheckIn, Visitor
+from app.versions import VISITORS, event_key
+
+# Pairs at or above this score are reported as likely duplicates
+DEFAULT_THRESHOLD = 0.85
+# Blocks bigger than this are too unspecific to be worth comparing within
+MAX_BLOCK_SIZE = 200
+
+DuplicatePair = namedtuple(
+    "DuplicatePair", ["visitor_id", "visitor_name", "other_id", "other_name", "score"]
+)
+
+_SOUNDEX_CODES = {
+    letter: str(code)
+    for code, letters in enumerate(["aeiouy", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+    for letter in letters
+}
+
+
+def normalize(name):
+    """Lower-case ASCII words only: 'José  O'Brien' -> 'jose obrien'."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    text = re.sub(r"['’`]", "", text.lower())
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def soundex(word):
+    """American Soundex code of a word ('' if it has no letters)."""
+    letters = [c for c in word.lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    last = _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter)
+        if digit is None:
+            # h and w do not separate letters with the same code
+            continue
+        if digit != "0" and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        last = digit
+    return code.ljust(4, "0")
+
+
+def blocking_keys(name, alias=None):
+    """
+    Keys under which a visitor is filed for comparison.
+
+    Two visitors are only scored against each other when they share a key.
+    Each of the first and last words is keyed exactly, together with the
+    initial of the other, so a typo in either word still leaves one key in
+    common; the pair of Soundex codes catches sound-alike spellings. Keys
+    ignore word order, so swapped first/last names meet as well.
+    """
+    words = normalize(name).split()
+    if not words:
+        return set()
+    first, last = words[0], words[-1]
+    keys = {
+        f"w:{first}:{last[0]}",
+        f"w:{last}:{first[0]}",
+        "s:" + ":".join(sorted((soundex(first), soundex(last)))),
+    }
+    alias = normalize(alias).replace(" ", "")
+    if alias:
+        keys.add("a:" + alias)
+    return keys
+
+
+class _Profile(
+    namedtuple("_Profile", ["id", "name", "alias", "text", "sorted_text", "grams"])
+):
+    """A visitor with everything the comparisons need worked out once."""
+
+    @classmethod
+    def build(cls, visitor_id, name, alias):
+        text = normalize(name)
+        padded = f" {text} "
+        return cls(
+            visitor_id,
+            name,
+            normalize(alias),
+            text,
+            " ".join(sorted(text.split())),
+            {padded[i : i + 2] for i in range(len(padded) - 1)},
+        )
+
+
+def _ratio(x, y, floor):
+    matcher = SequenceMatcher(None, x, y)
+    if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+        return 0.0
+    return matcher.ratio()
+
+
+def _compare(profile, other, floor=0.0):
+    if not profile.text or not other.text:
+        return 0.0
+    # Shared letter pairs bound how alike the names can be; most pairs in a
+    # block are rejected here, before the costlier sequence match
+    shared = len(profile.grams & other.grams)
+    if 2 * shared / (len(profile.grams) + len(other.grams)) < floor - 0.2:
+        return 0.0
+    return max(
+        _ratio(profile.text, other.text, floor),
+        _ratio(profile.sorted_text, other.sorted_text, floor),
+    )
+
+
+def similarity(name, other):
+    """0..1 likeness of two names, ignoring case, accents and word order."""
+    return _compare(_Profile.build(0, name, None), _Profile.build(0, other, None))
+
+
+def _score(profile, other, threshold):
+    # An alias shared by both profiles is worth a small bonus
+    bonus = 0.05 if profile.alias and profile.alias == other.alias else 0.0
+    score = _compare(profile, other, floor=threshold - bonus)
+    return round(min(1.0, score + bonus), 3)
+
+
+def find_duplicates(threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Likely duplicate visitor profiles, best matches first.
+
+    Visitors are grouped by blocking_keys() and only compared within a
+    group, so the work grows with the size of the groups rather than with
+    the square of the number of visitors.
+    """
+    profiles = [
+        _Profile.build(*row)
+        for row in db.session.execute(
+            select(Visitor.id, Visitor.name, Visitor.alias).order_by(Visitor.id)
+        )
+    ]
+
+    blocks = defaultdict(list)
+    for profile in profiles:
+        for key in blocking_keys(profile.text, profile.alias):
+            blocks[key].append(profile)
+
+    compared = set()
+    pairs = []
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > max_block_size:
+            continue
+        for profile, other in combinations(members, 2):
+            if (profile.id, other.id) in compared:
+                continue
+            compared.add((profile.id, other.id))
+            score = _score(profile, other, threshold)
+            if score >= threshold:
+                pairs.append(
+                    DuplicatePair(profile.id, profile.name, other.id, other.name, score)
+                )
+
+    pairs.sort(key=lambda pair: (-pair.score, pair.visitor_id, pair.other_id))
+    return pairs
+
+
+def merge_visitors(keep_id, merge_ids):
+    """
+    Fold the visitors in `merge_ids` into `keep_id`.
+
+    Their check-ins are re-pointed in bulk; where two of the profiles were
+    checked in to the same event, only the earliest check-in is kept. The
+    kept profile takes over an alias if it had none, and the others are
+    deleted. The caller is responsible for committing.
+
+    Returns the number of check-ins moved.
+    """
+    merge_ids = [visitor_id for visitor_id in merge_ids if visitor_id != keep_id]
+    if not merge_ids:
+        return 0
+    group = [keep_id, *merge_ids]
+    # The nights whose check-ins change, named so only they are recomputed
+    versions = [
+        event_key(event_id)
+        for event_id in db.session.scalars(
+            select(CheckIn.event_id).where(CheckIn.visitor_id.in_(group)).distinct()
+        )
+    ]
+
+    # One check-in per event for the merged profile
+    first_per_event = (
+        select(func.min(CheckIn.id))
+        .where(CheckIn.visitor_id.in_(group))
+        .group_by(CheckIn.event_id)
+    )
+    db.session.execute(
+        delete(CheckIn)
+        .where(CheckIn.visitor_id.in_(group), CheckIn.id.not_in(first_per_event))
+        .execution_options(synchronize_session=False, versions=versions)
+    )
+    moved = db.session.execute(
+        update(CheckIn)
+        .where(CheckIn.visitor_id.in_(merge_ids))
+        .values(visitor_id=keep_id)
+        .execution_options(synchronize_session=False, versions=versions)
+    ).rowcount
+
+    keep = db.session.get(Visitor, keep_id)
+    if not keep.alias:
+        keep.alias = db.session.scalar(
+            select(Visitor.alias)
+            .where(Visitor.id.in_(merge_ids), Visitor.alias.is_not(None))
+            .order_by(Visitor.id)
+            .limit(1)
+        )
+        db.session.flush()
+    db.session.execute(
+        delete(Visitor)
+        .where(Visitor.id.in_(merge_ids))
+        .execution_options(synchronize_session=False, versions=[VISITORS])
+    )
+    # Instances of the deleted rows must not be flushed back
+    db.session.expire_all()
+    return moved
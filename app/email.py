@@ -1,25 +1,346 @@
+import hashlib
+import json
+import re
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import current_app, render_template
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache
 from app.extensions import db
-from app.models import Email
+from app.models import Email, EmailBody
+
+# Columns every outbox row carries, so the rows share one executemany
+_OUTBOX_FIELDS = (
+    "recipient",
+    "subject",
+    "body_text",
+    "body_html",
+    "template",
+    "context",
+    "substitutions",
+)
+
+# {{ name }} placeholders filled from an email's substitutions
+_PLACEHOLDER = re.compile(r"\{\{ (\w+) \}\}")
 
 
 def send_email(subject, sender, recipients, text_body, html_body, sensitive=False):
     """
     Queue an email to be sent by an external provider/script.
-    Writes the email details to the 'emails' database table.
-    """
-    try:
-        for recipient in recipients:
-            email = Email(
-                recipient=recipient,
-                subject=subject,
-                body_text=text_body,
-                body_html=html_body,
-                status="pending",
-                sensitive=sensitive
+
+    The email is added to the caller's unit of work (see queue_emails) and
+    written to the 'emails' table in the caller's transaction, so it is only
+    sent if that transaction commits.
+    """
+    queue_emails(
+        [
+            {
+                "recipient": recipient,
+                "subject": subject,
+                "body_text": text_body,
+                "body_html": html_body,
+            }
+            for recipient in recipients
+        ],
+        sensitive=sensitive,
+    )
+
+
+def queue_emails(messages, sensitive=False):
+    """
+    Add emails to the current session's outbox.
+
+    `messages` is a list of dicts with recipient and subject plus either
+    body_text/body_html or template/context. Bodies may contain {{ name }}
+    placeholders, filled per recipient from an optional `substitutions`
+    dict; messages that share their bodies this way share one stored copy
+    of them (see store_email_bodies). Nothing is written or committed here:
+    the outbox is drained with a single bulk INSERT on the caller's next
+    ORM statement or commit, and discarded on rollback.
+    """
+    # Tie the outbox to a transaction so a rollback always discards it
+    session = db.session()
+    if not session.in_transaction():
+        session.begin()
+
+    outbox = session.info.setdefault("email_outbox", [])
+    for message in messages:
+        row = dict.fromkeys(_OUTBOX_FIELDS)
+        row.update(message, status="pending", sensitive=sensitive)
+        outbox.append(row)
+
+
+def body_digest(text, html):
+    """Content address of a pair of email bodies."""
+    return hashlib.sha256(json.dumps([text, html]).encode()).hexdigest()
+
+
+def _compress(body):
+    return None if body is None else zlib.compress(body.encode())
+
+
+def _decompress(data):
+    return None if data is None else zlib.decompress(data).decode()
+
+
+def store_email_bodies(connection, bodies):
+    """
+    Store {digest: (text, html)} in email_bodies.
+
+    Digests that are already stored are left alone, so concurrent writers
+    of the same body do not conflict.
+    """
+    table = EmailBody.__table__
+    rows = [
+        {"digest": digest, "text_z": _compress(text), "html_z": _compress(html)}
+        for digest, (text, html) in bodies.items()
+    ]
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        connection.execute(
+            dialect_insert(table).on_conflict_do_nothing(
+                index_elements=[table.c.digest]
+            ),
+            rows,
+        )
+        return
+
+    stored = set(
+        connection.execute(
+            select(table.c.digest).where(table.c.digest.in_(bodies))
+        ).scalars()
+    )
+    rows = [row for row in rows if row["digest"] not in stored]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def _share_bodies(session, rows):
+    """Swap the outbox rows' bodies for references to stored ones."""
+    digests = {}
+    for row in rows:
+        bodies = (row.pop("body_text"), row.pop("body_html"))
+        if row["substitutions"]:
+            row["substitutions"] = json.dumps(
+                row["substitutions"], separators=(",", ":")
             )
-            db.session.add(email)
+        else:
+            row["substitutions"] = None
+        if bodies == (None, None):
+            row["body_digest"] = None
+            continue
+        # A broadcast repeats the same two strings for every recipient
+        digest = digests.get(bodies)
+        if digest is None:
+            digest = digests[bodies] = body_digest(*bodies)
+        row["body_digest"] = digest
+
+    if digests:
+        store_email_bodies(
+            session.connection(),
+            {digest: bodies for bodies, digest in digests.items()},
+        )
+
+
+def _drain_outbox(session):
+    rows = session.info.pop("email_outbox", None)
+    if rows:
+        _share_bodies(session, rows)
+        session.execute(insert(Email), rows)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _outbox_before_orm_execute(orm_execute_state):
+    # Queries later in the same transaction can see the queued rows. Inside
+    # a savepoint they wait, so rolling it back cannot take them along.
+    session = orm_execute_state.session
+    if not session.in_nested_transaction():
+        _drain_outbox(session)
+
+
+@event.listens_for(Session, "before_commit")
+def _outbox_before_commit(session):
+    # Anything still queued is written just before the transaction commits
+    _drain_outbox(session)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _outbox_mark_savepoint(session, transaction):
+    if transaction.nested:
+        marks = session.info.setdefault("email_outbox_marks", {})
+        marks[transaction] = len(session.info.get("email_outbox", ()))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _outbox_after_transaction(session, transaction):
+    if not transaction.nested:
+        session.info.pop("email_outbox_marks", None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _outbox_after_rollback(session, previous_transaction):
+    if previous_transaction.nested:
+        # A savepoint only discards what was queued since it began
+        marks = session.info.get("email_outbox_marks", {})
+        mark = marks.pop(previous_transaction, 0)
+        del session.info.get("email_outbox", [])[mark:]
+        return
+    session.info.pop("email_outbox", None)
+
+
+def build_template_message(subject, template, sensitive=False, **context):
+    """
+    Build the queued fields for an email from `<template>.txt` / `.html`.
+
+    With EMAIL_DEFERRED_RENDERING enabled only the template name and a
+    compact JSON context are stored and the email worker renders the bodies
+    at send time; model instances in the context are stored as references.
+    Otherwise, and always for `sensitive` emails (whose context holds things
+    like login links that must not sit in plain JSON), both bodies are
+    rendered now. The returned dict has no recipient and is meant for
+    queue_emails().
+    """
+    if current_app.config.get("EMAIL_DEFERRED_RENDERING") and not sensitive:
+        return {
+            "subject": subject,
+            "template": template,
+            "context": encode_context(context),
+        }
+
+    return {
+        "subject": subject,
+        "body_text": render_template(f"{template}.txt", **context),
+        "body_html": render_template(f"{template}.html", **context),
+    }
+
+
+def send_template_email(
+    subject, sender, recipients, template, sensitive=False, **context
+):
+    """Queue a templated email to every recipient (see build_template_message)."""
+    message = build_template_message(subject, template, sensitive, **context)
+    queue_emails(
+        [dict(message, recipient=recipient) for recipient in recipients],
+        sensitive=sensitive,
+    )
+
+
+# Values JSON has no type for, stored as {tag: text} and parsed back.
+# datetime comes before date, which it subclasses.
+_TAGGED_TYPES = [
+    ("__datetime__", datetime, datetime.fromisoformat),
+    ("__date__", date, date.fromisoformat),
+    ("__time__", time, time.fromisoformat),
+    ("__decimal__", Decimal, Decimal),
+]
+
+
+def _encode_value(value):
+    # __class__ also sees through proxies such as current_user
+    if isinstance(value, db.Model):
+        return {"__model__": value.__class__.__name__, "id": value.id}
+    for tag, cls, _ in _TAGGED_TYPES:
+        if isinstance(value, cls):
+            return {tag: value.isoformat() if cls is not Decimal else str(value)}
+    raise TypeError(
+        f"{type(value).__name__} values cannot be stored in a deferred email context"
+    )
+
+
+def encode_context(context):
+    """
+    Serialize a template context, replacing model instances by references.
+
+    Dates, times and decimals are tagged so they decode to the same type;
+    any other value JSON cannot hold raises TypeError rather than coming
+    back as a string.
+    """
+    return json.dumps(context, separators=(",", ":"), default=_encode_value)
+
+
+def decode_context(payload):
+    """Inverse of encode_context: load referenced models, parse tagged values."""
+    registry = db.Model.registry._class_registry
+    parsers = {tag: parse for tag, _, parse in _TAGGED_TYPES}
+
+    def decode(value):
+        if "__model__" in value:
+            return db.session.get(registry[value["__model__"]], value["id"])
+        if len(value) == 1:
+            tag, text = next(iter(value.items()))
+            if tag in parsers:
+                return parsers[tag](text)
+        return value
+
+    return json.loads(payload or "{}", object_hook=decode)
+
+
+def _compiled_template(name):
+    """Compiled Jinja template, cached per app for the lifetime of the worker."""
+    cache = current_app.extensions.setdefault("email_templates", {})
+    template = cache.get(name)
+    if template is None:
+        template = cache[name] = current_app.jinja_env.get_template(name)
+    return template
+
+
+def _stored_bodies(digest):
+    """
+    Decompressed (text, html) stored under `digest`.
+
+    Stored bodies never change, so they are cached per app; a broadcast is
+    read and decompressed once however many recipients it has.
+    """
+    cache = current_app.extensions.get("email_bodies")
+    if cache is None:
+        size = current_app.config.get("EMAIL_BODY_CACHE_SIZE", 64)
+        cache = current_app.extensions.setdefault("email_bodies", LRUCache(size))
+    bodies = cache.get(digest)
+    if bodies is None:
+        row = db.session.execute(
+            select(EmailBody.text_z, EmailBody.html_z).where(EmailBody.digest == digest)
+        ).one()
+        bodies = (_decompress(row.text_z), _decompress(row.html_z))
+        cache.set(digest, bodies)
+    return bodies
+
+
+def fill_placeholders(body, substitutions):
+    """Replace the {{ name }} placeholders in `body` found in `substitutions`."""
+    if not body or not substitutions:
+        return body
+    return _PLACEHOLDER.sub(
+        lambda match: substitutions.get(match.group(1), match.group(0)), body
+    )
+
+
+def render_email_bodies(email):
+    """
+    Return (text_body, html_body) for a queued email.
+
+    Deferred emails are rendered from their template reference, and shared
+    bodies get the email's substitutions filled in; others simply return
+    the bodies stored on the row.
+    """
+    if email.template:
+        context = decode_context(email.context)
+        return (
+            _compiled_template(f"{email.template}.txt").render(**context),
+            _compiled_template(f"{email.template}.html").render(**context),
+        )
+
+    if email.body_digest is None:
+        return email.body_text, email.body_html
 
-        db.session.commit()
-    except Exception as e:
-        print(f"Failed to queue email: {e}")
-        db.session.rollback()
+    text, html = _stored_bodies(email.body_digest)
+    substitutions = json.loads(email.substitutions or "{}")
+    return (
+        fill_placeholders(text, substitutions),
+        fill_placeholders(html, substitutions),
+    )
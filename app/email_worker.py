@@ -1,76 +1,261 @@
-import time
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
+
 from flask_mail import Message
-from app.extensions import db, mail
+from sqlalchemy import select, update
+
+from app.email import render_email_bodies
+from app.extensions import db
 from app.models import Email
+from app.notifications import send_signup_digest
+from app.transports import TransportUnavailable, get_transport
+
+# Emails handled per batch; the session is reset after each one
+BATCH_SIZE = 50
+
+# Statuses are committed after every this many messages, so a crash part
+# way through a batch leaves at most this many delivered emails pending
+STATUS_CHUNK_SIZE = 10
+
+# Loaded per message rather than with the batch
+_BODY_COLUMNS = [
+    Email.template,
+    Email.context,
+    Email.body_text,
+    Email.body_html,
+    Email.body_digest,
+    Email.substitutions,
+]
 
 
-def start_email_worker(app):
+def _write_statuses(results):
+    if results:
+        # One bulk UPDATE by primary key
+        db.session.execute(update(Email), results)
+        db.session.commit()
+
+
+def _claim_batch(app, batch_size, shard=None):
     """
-    Starts a background thread that checks for pending emails every 15 seconds
-    and sends them using the configured mail server.
+    Mark up to `batch_size` pending emails 'sending' and return their id,
+    recipient and subject, oldest first.
+
+    The claim is one UPDATE committed before anything is sent, so worker
+    processes on other hosts never pick up the same email; on PostgreSQL
+    rows another worker is claiming right now are skipped, not waited for.
+    Claims older than EMAIL_CLAIM_TIMEOUT are first returned to the queue.
     """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config.get("EMAIL_CLAIM_TIMEOUT", 900))
+    db.session.execute(
+        update(Email)
+        .where(Email.status == "sending", Email.claimed_at < stale)
+        .values(status="pending", claimed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+    candidates = select(Email.id).filter_by(status="pending")
+    if shard is not None:
+        index, count = shard
+        candidates = candidates.where(Email.id % count == index)
+    candidates = (
+        candidates.order_by(Email.created_at, Email.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claim = (
+        update(Email)
+        # Re-checked so a row claimed meanwhile is not claimed twice
+        .where(Email.id.in_(candidates), Email.status == "pending")
+        .values(status="sending", claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    headers = [Email.id, Email.recipient, Email.subject, Email.created_at]
+    if db.session.get_bind().dialect.update_returning:
+        claimed = db.session.execute(claim.returning(*headers)).all()
+    else:
+        db.session.execute(claim)
+        claimed = db.session.execute(
+            select(*headers).filter_by(status="sending", claimed_at=now)
+        ).all()
+    db.session.commit()
+    return sorted(claimed, key=lambda row: (row.created_at, row.id))
+
 
-    def worker():
-        # Ensure we work within the application context
-        with app.app_context():
-            print("Email worker started.")
-            while True:
+def _release(ids):
+    """Return claimed emails that were never attempted to the queue."""
+    if ids:
+        db.session.execute(
+            update(Email)
+            .where(Email.id.in_(ids), Email.status == "sending")
+            .values(status="pending", claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+def process_batch(app, batch_size=BATCH_SIZE, shard=None):
+    """
+    Send one batch of pending emails through the configured transport and
+    return how many were processed.
+
+    The batch is claimed (see `_claim_batch`) before anything is sent, so
+    any number of worker processes can share the queue. `shard` is an
+    (index, count) pair restricting the batch to emails whose
+    id % count == index, so consumer threads of one process do not compete
+    for the same rows.
+
+    Only ids and headers are selected up front; each message's bodies are
+    loaded right before it is sent and dropped right after, so at most one
+    body is held in memory at a time. Statuses are written back with a bulk
+    UPDATE every STATUS_CHUNK_SIZE messages, or once the batch is flushed
+    for transports that only deliver then.
+    """
+    try:
+        headers = _claim_batch(app, batch_size, shard)
+        if not headers:
+            # An idle worker never opens the transport
+            return 0
+
+        results = []
+        written = 0
+        with get_transport(app) as transport:
+            for header in headers:
                 try:
-                    # Find pending emails
-                    # Limit to avoid memory issues if backed up, but strictly request said "emails to send"
-                    pending_emails = (
-                        Email.query.filter_by(status="pending")
-                        .order_by(Email.created_at)
-                        .limit(50)
-                        .all()
-                    )
+                    # Bodies (or the deferred template context) load here, one
+                    # message at a time and in a single SELECT
+                    bodies = db.session.execute(
+                        select(*_BODY_COLUMNS).where(Email.id == header.id)
+                    ).one()
+                    body_text, body_html = render_email_bodies(bodies)
 
-                    if pending_emails:
-                        print(
-                            f"Email Worker: Found {len(pending_emails)} pending emails."
-                        )
-
-                    for email_record in pending_emails:
-                        try:
-                            # Construct Message
-                            msg = Message(
-                                subject=email_record.subject,
-                                recipients=[email_record.recipient],
-                                body=email_record.body_text,
-                                html=email_record.body_html,
-                                sender=app.config.get("MAIL_DEFAULT_SENDER"),
-                            )
-
-                            # Send
-                            mail.send(msg)
-
-                            # Update Status
-                            email_record.status = "sent"
-                            email_record.sent_at = datetime.utcnow()
-                            print(
-                                f"Email Worker: Sent email {email_record.id} to {email_record.recipient}"
-                            )
-
-                        except Exception as e:
-                            # Handle Failure
-                            email_record.status = "failed"
-                            email_record.error_message = str(e)
-                            print(
-                                f"Email Worker: Failed to send email {email_record.id}: {e}"
-                            )
-
-                        # Commit update
-                        db.session.commit()
+                    # Construct Message
+                    msg = Message(
+                        subject=header.subject,
+                        recipients=[header.recipient],
+                        body=body_text,
+                        html=body_html,
+                        sender=app.config.get("MAIL_DEFAULT_SENDER"),
+                    )
 
+                    # Hand off to the configured transport
+                    transport.send(msg, key=header.id)
+                    results.append(
+                        {
+                            "id": header.id,
+                            "status": "sent",
+                            "sent_at": datetime.utcnow(),
+                            "error_message": None,
+                        }
+                    )
+                except TransportUnavailable as e:
+                    # Not this message's fault: it and the rest of the batch
+                    # stay pending for the next run
+                    print(f"Email Worker: Transport unavailable, pausing batch: {e}")
+                    break
                 except Exception as e:
-                    print(f"Email Worker Error: {e}")
-                    # Prevent tight loop on extensive DB error
-                    time.sleep(5)
+                    # Handle Failure
+                    results.append(
+                        {
+                            "id": header.id,
+                            "status": "failed",
+                            "sent_at": None,
+                            # Some mail errors (BadHeaderError) carry no message
+                            "error_message": str(e) or type(e).__name__,
+                        }
+                    )
+                    print(f"Email Worker: Failed to send email {header.id}: {e}")
+
+                if (
+                    not transport.delivers_on_close
+                    and len(results) - written >= STATUS_CHUNK_SIZE
+                ):
+                    _write_statuses(results[written:])
+                    written = len(results)
+
+        # Transports that deliver on flush report their failures afterwards
+        for result in results:
+            error = transport.failures.get(result["id"])
+            if error is not None:
+                result.update(
+                    status="failed",
+                    sent_at=None,
+                    error_message=str(error) or type(error).__name__,
+                )
+                print(f"Email Worker: Failed to send email {result['id']}: {error}")
+
+        _write_statuses(results[written:])
+        attempted = {result["id"] for result in results}
+        _release([header.id for header in headers if header.id not in attempted])
+        if results:
+            sent = sum(1 for r in results if r["status"] == "sent")
+            print(f"Email Worker: Sent {sent} of {len(results)} emails.")
+
+        return len(results)
+    finally:
+        # Start every batch with an empty identity map
+        db.session.remove()
+
+
+def drain_queue(app, batch_size=BATCH_SIZE, shard=None, stop=None):
+    """
+    Process batches until the queue is empty (or `stop` is set between
+    batches); returns the total processed.
+    """
+    total = 0
+    while stop is None or not stop.is_set():
+        processed = process_batch(app, batch_size, shard)
+        total += processed
+        if processed < batch_size:
+            break
+    return total
 
-                time.sleep(15)
 
-    thread = threading.Thread(target=worker, daemon=True)
-    thread.start()
-    return thread
+def _consume(app, stop, index, count, poll_interval):
+    # Ensure we work within the application context
+    with app.app_context():
+        print(f"Email worker {index + 1}/{count} started.")
+        while not stop.is_set():
+            try:
+                # Collapse recent signups into supervisor digests first
+                if index == 0 and app.config.get("SIGNUP_DIGEST_MINUTES"):
+                    send_signup_digest()
+
+                # Send everything that is pending, batch by batch
+                drain_queue(app, shard=(index, count), stop=stop)
+
+            except Exception as e:
+                print(f"Email Worker Error: {e}")
+                db.session.remove()
+                # Prevent tight loop on extensive DB error
+                stop.wait(5)
+
+            stop.wait(poll_interval)
+        print(f"Email worker {index + 1}/{count} stopped.")
+
+
+def run_email_worker(app, threads=1, poll_interval=15, stop=None):
+    """
+    Consume the email queue with `threads` threads until `stop` is set.
+
+    Blocks until every thread has exited. Setting `stop` lets each thread
+    finish the batch it is sending, so nothing is left half-sent; the
+    `flask email-worker` command sets it on SIGTERM/SIGINT.
+    """
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(
+            target=_consume,
+            args=(app, stop, index, threads, poll_interval),
+            name=f"email-worker-{index}",
+        )
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    pool = app.extensions.pop("async_smtp_pool", None)
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,184 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import CheckIn, Email, Event, Shift, Signup, User, Visitor
+
+# Rows fetched per round trip. Results are streamed (a server-side cursor
+# where the driver has one) and written out a batch at a time, so memory
+# stays flat however many rows an export covers.
+EXPORT_BATCH_SIZE = 1000
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Spreadsheets run a cell starting with one of these as a formula; names
+# typed in at the kiosk must never do that when a CSV export is opened
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+Export = namedtuple("Export", ["columns", "statement", "date_column"])
+
+
+def _checkins():
+    return Export(
+        [
+            "id",
+            "event_date",
+            "check_in_time",
+            "visitor_id",
+            "visitor_name",
+            "visitor_alias",
+            "client_id",
+        ],
+        select(
+            CheckIn.id,
+            Event.date,
+            CheckIn.check_in_time,
+            Visitor.id,
+            Visitor.name,
+            Visitor.alias,
+            CheckIn.client_id,
+        )
+        .join(Event, Event.id == CheckIn.event_id)
+        .join(Visitor, Visitor.id == CheckIn.visitor_id)
+        .order_by(CheckIn.id),
+        Event.date,
+    )
+
+
+def _signups():
+    return Export(
+        [
+            "id",
+            "event_date",
+            "shift_start",
+            "shift_end",
+            "user_id",
+            "volunteer_name",
+            "volunteer_email",
+            "confirmed",
+            "created_at",
+        ],
+        select(
+            Signup.id,
+            Event.date,
+            Shift.start_time,
+            Shift.end_time,
+            User.id,
+            User.name,
+            User.email,
+            Signup.confirmed,
+            Signup.created_at,
+        )
+        .join(Shift, Shift.id == Signup.shift_id)
+        .join(Event, Event.id == Shift.event_id)
+        .join(User, User.id == Signup.user_id)
+        .order_by(Signup.id),
+        Event.date,
+    )
+
+
+def _emails():
+    # The bodies are left out: they can be large, and some are sensitive
+    return Export(
+        [
+            "id",
+            "created_at",
+            "recipient",
+            "subject",
+            "status",
+            "sent_at",
+            "error_message",
+        ],
+        select(
+            Email.id,
+            Email.created_at,
+            Email.recipient,
+            Email.subject,
+            Email.status,
+            Email.sent_at,
+            Email.error_message,
+        ).order_by(Email.id),
+        Email.created_at,
+    )
+
+
+EXPORTS = {"checkins": _checkins, "signups": _signups, "emails": _emails}
+
+
+def export_batches(kind, start=None, end=None):
+    """
+    The rows of export `kind`, in lists of up to EXPORT_BATCH_SIZE.
+
+    `start` and `end` (dates, inclusive) filter on the event date, or on
+    the queue date for emails. Returns (columns, batches); the batches are
+    fetched lazily as the generator is consumed.
+    """
+    export = EXPORTS[kind]()
+    statement = export.statement
+    if start:
+        statement = statement.where(export.date_column >= start)
+    if end:
+        if export.date_column.type.python_type is datetime:
+            statement = statement.where(export.date_column < end + timedelta(days=1))
+        else:
+            statement = statement.where(export.date_column <= end)
+
+    def batches():
+        result = db.session.execute(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        try:
+            for partition in result.partitions():
+                yield partition
+        finally:
+            result.close()
+
+    return export.columns, batches()
+
+
+def _json_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    """Text that a spreadsheet would read as a formula, quoted with a '."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(columns, batches):
+    """CSV text: the header straight away, then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(map(_csv_cell, row) for row in batch)
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(columns, batches):
+    """One JSON object per line, one chunk per batch."""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, map(_json_value, row)))) + "\n"
+            for row in batch
+        )
+
+
+def export_chunks(kind, fmt, start=None, end=None):
+    """Text chunks of export `kind` in format `fmt` ('csv' or 'jsonl')."""
+    columns, batches = export_batches(kind, start, end)
+    if fmt == "csv":
+        return csv_chunks(columns, batches)
+    return jsonl_chunks(columns, batches)
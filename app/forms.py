@@ -7,9 +7,10 @@ from wtforms import (
     SubmitField,
     TextAreaField,
     BooleanField,
+    IntegerField,
     widgets,
 )
-from wtforms.validators import DataRequired
+from wtforms.validators import DataRequired, NumberRange, Optional
 
 
 class EventForm(FlaskForm):
@@ -22,6 +23,35 @@ class EventForm(FlaskForm):
     submit = SubmitField("Create Event")
 
 
+class SeasonPlanForm(FlaskForm):
+    start_date = DateField("First Night", validators=[DataRequired()])
+    end_date = DateField("Last Night", validators=[DataRequired()])
+    weekdays = SelectMultipleField(
+        "Only On (leave empty for every night)",
+        choices=[
+            ("0", "Mon"),
+            ("1", "Tue"),
+            ("2", "Wed"),
+            ("3", "Thu"),
+            ("4", "Fri"),
+            ("5", "Sat"),
+            ("6", "Sun"),
+        ],
+        option_widget=widgets.CheckboxInput(),
+        widget=widgets.ListWidget(prefix_label=False),
+    )
+    shifts = StringField("Shifts (HH:MM-HH:MM, comma separated)")
+    capacity = IntegerField(
+        "Volunteers Per Shift", validators=[Optional(), NumberRange(min=1)]
+    )
+    status = SelectField(
+        "Status",
+        choices=[("planned", "Planned"), ("active", "Active")],
+        default="planned",
+    )
+    submit = SubmitField("Create Events")
+
+
 class VisitorForm(FlaskForm):
     name = StringField("Name", validators=[DataRequired()])
     alias = StringField("Alias (Optional)")
@@ -97,4 +127,10 @@ class EmailTemplateForm(FlaskForm):
 class BroadcastEmailForm(FlaskForm):
     subject = StringField("Subject", validators=[DataRequired()])
     message = TextAreaField("Message", validators=[DataRequired()], description="Use {{ name }} for volunteer name and {{ date }} for event date.")
+    targeted = BooleanField(
+        "Only volunteers who can fill an open slot",
+        default=True,
+        description="Skips volunteers already signed up that night and those whose "
+        "shift preferences match no open shift.",
+    )
     submit = SubmitField("Send Email")
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import time
+
+from flask import current_app, make_response, request, session
+
+
+def version_etag(*parts):
+    """
+    Weak ETag value for a page built from the given data versions and inputs.
+
+    While CSRF protection is on, the tag also rolls over every half
+    WTF_CSRF_TIME_LIMIT so a revalidated page never carries an expired
+    form token.
+    """
+    config = current_app.config
+    limit = config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    if config.get("WTF_CSRF_ENABLED", True) and limit:
+        parts = (*parts, int(time.time() // (limit / 2)))
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def conditional_page(etag, render):
+    """
+    Answer a GET with 304 Not Modified if the client already holds `etag`;
+    otherwise return `render()` with the ETag attached.
+
+    Nothing is cached while flashed messages are pending, since the page
+    that shows them is a one-off.
+    """
+    if "_flashes" in session:
+        return render()
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag, weak=True)
+    # Per-user pages: keep them out of shared caches and always revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+
+# Accept type a client can ask for instead of sending HX-Request
+FRAGMENT_MIMETYPE = "text/html-fragment"
+
+
+def wants_fragment():
+    """True when the client asked for just the changed piece of the page."""
+    if request.headers.get("HX-Request") == "true":
+        return True
+    return request.accept_mimetypes.best == FRAGMENT_MIMETYPE
+
+
+def fragment_response(html="", message=None, category="info", status=200):
+    """
+    Answer an in-page action with a rendered fragment.
+
+    The message that a full page would have flashed travels in an
+    HX-Trigger header instead, so it is not left in the session for the
+    next page load.
+    """
+    response = make_response(html, status)
+    if message:
+        response.headers["HX-Trigger"] = json.dumps(
+            {"flash": {"message": message, "category": category}}
+        )
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,169 @@
+import hashlib
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.cache import LRUCache
+from app.extensions import db
+from app.models import Event, Shift, Signup
+from app.versions import data_version, data_versions, event_key, user_key
+
+# An event is the night of its date: shifts starting before noon fall on
+# the following morning
+OVERNIGHT_CUTOFF = time(12, 0)
+
+TZID = "America/New_York"
+
+# US Eastern time rules in force since 2007
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TZID}",
+    "BEGIN:DAYLIGHT",
+    "DTSTART:20070311T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU",
+    "TZOFFSETFROM:-0500",
+    "TZOFFSETTO:-0400",
+    "TZNAME:EDT",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "DTSTART:20071104T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=1SU",
+    "TZOFFSETFROM:-0400",
+    "TZOFFSETTO:-0500",
+    "TZNAME:EST",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+
+def shift_span(night, start_time, end_time):
+    """
+    Local start and end datetimes of a shift on the night of `night`.
+
+    A shift whose end is not after its start runs past midnight, so
+    19:45-00:00 ends at midnight the next day.
+    """
+    day = night + timedelta(days=1) if start_time < OVERNIGHT_CUTOFF else night
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    pieces = []
+    while data:
+        size = 75 if not pieces else 74
+        # Do not cut a multi-byte character in half
+        while size < len(data) and (data[size] & 0xC0) == 0x80:
+            size -= 1
+        pieces.append(data[:size].decode())
+        data = data[size:]
+    return "\r\n ".join(pieces)
+
+
+def _local(value):
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def render_calendar(rows, shelter_name, stamp):
+    """
+    The iCalendar text for (signup_id, confirmed, night, start, end, ...)
+    rows, with times local to TZID.
+    """
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//MECWS//Volunteer Schedule//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(shelter_name)} Shifts",
+        f"X-WR-TIMEZONE:{TZID}",
+        *VTIMEZONE,
+    ]
+    for signup_id, confirmed, night, start_time, end_time, *_ in rows:
+        start, end = shift_span(night, start_time, end_time)
+        summary = f"{shelter_name} shift" + ("" if confirmed else " (pending)")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:signup-{signup_id}@mecws",
+            f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTSTART;TZID={TZID}:{_local(start)}",
+            f"DTEND;TZID={TZID}:{_local(end)}",
+            f"SUMMARY:{_escape(summary)}",
+            f"STATUS:{'CONFIRMED' if confirmed else 'TENTATIVE'}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def _feed_cache():
+    cache = current_app.extensions.get("calendar_feeds")
+    if cache is None:
+        size = current_app.config.get("CALENDAR_CACHE_SIZE", 1000)
+        cache = current_app.extensions.setdefault("calendar_feeds", LRUCache(size))
+    return cache
+
+
+def calendar_feed(user_id):
+    """
+    (ics_text, etag) of a volunteer's shifts, confirmed and pending.
+
+    Feeds are cached per user under the version of the user's key, which
+    every change to their signups bumps. An entry also remembers the
+    versions of the events it lists, so a night that is moved or deleted
+    is noticed as well; a repeat poll costs no query beyond the version
+    lookups (themselves mirrored for DATA_VERSION_TTL).
+    """
+    cache = _feed_cache()
+    user_version = data_version(user_key(user_id))
+    key = (user_id, user_version)
+
+    entry = cache.get(key)
+    if entry is not None:
+        event_keys, event_versions, body, etag = entry
+        if data_versions(*event_keys) == event_versions:
+            return body, etag
+
+    rows = db.session.execute(
+        select(
+            Signup.id,
+            Signup.confirmed,
+            Event.date,
+            Shift.start_time,
+            Shift.end_time,
+            Event.id,
+        )
+        .join(Shift, Shift.id == Signup.shift_id)
+        .join(Event, Event.id == Shift.event_id)
+        .where(Signup.user_id == user_id)
+        .order_by(Event.date, Shift.start_time, Signup.id)
+    ).all()
+    event_keys = tuple(sorted({event_key(row[-1]) for row in rows}))
+    event_versions = data_versions(*event_keys)
+    body = render_calendar(
+        rows, current_app.config.get("SHELTER_NAME", "MECWS"), datetime.utcnow()
+    )
+    etag = hashlib.blake2b(
+        repr((user_id, user_version, event_keys, event_versions)).encode(),
+        digest_size=12,
+    ).hexdigest()
+
+    cache.set(key, (event_keys, event_versions, body, etag))
+    return body, etag
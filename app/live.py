@@ -0,0 +1,284 @@
+import json
+import queue
+import threading
+from collections import deque
+
+from flask import render_template
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import CheckIn, DataVersion, Event, Shift
+from app.versions import event_key, versions_bumped
+
+# Sent to a client that missed deltas it cannot be given again
+RELOAD = "event: reload\ndata: {}\n\n"
+KEEPALIVE = ": keepalive\n\n"
+
+_broker_lock = threading.Lock()
+
+
+class StreamLimitReached(Exception):
+    """As many live streams as the caller allows are already open."""
+
+
+def sse_message(kind, data, version=None):
+    """One Server-Sent Events message; `version` becomes its id."""
+    lines = []
+    if version is not None:
+        lines.append(f"id: {version}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _current_version(event_id):
+    # Read straight from the table: the per-process mirror may lag by its TTL
+    version = db.session.execute(
+        select(DataVersion.version).where(DataVersion.key == event_key(event_id))
+    ).scalar()
+    return version or 0
+
+
+def _shift_signature(shift):
+    return (
+        shift.start_time,
+        shift.end_time,
+        shift.capacity,
+        tuple(
+            (signup.id, signup.user_id, signup.confirmed) for signup in shift.signups
+        ),
+    )
+
+
+class Subscription:
+    """One client's queue of pre-formatted SSE messages."""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+        self.lagged = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # The client stopped reading; it resyncs with a reload instead
+            self.lagged = True
+
+    def messages(self, keepalive=15):
+        """Yield messages until the broker closes; comments keep proxies open."""
+        while not self.lagged:
+            try:
+                message = self.queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield KEEPALIVE
+                continue
+            if message is None:
+                return
+            yield message
+        yield RELOAD
+
+
+class _Channel:
+    """
+    Live state of one event, shared by all of its subscribers.
+
+    A single poller thread diffs check-ins and shift staffing whenever the
+    event's data version moves and fans the rendered deltas out to every
+    subscriber. It is woken straight away by commits in this process and
+    otherwise re-reads the version every LIVE_POLL_INTERVAL seconds, which
+    is how writes made by other processes are picked up.
+    """
+
+    def __init__(self, broker, event_id, url_root):
+        self.broker = broker
+        self.event_id = event_id
+        self.url_root = url_root
+        self.subscribers = set()
+        self.history = deque(maxlen=broker.app.config.get("LIVE_HISTORY", 100))
+        self.wake = threading.Event()
+        self.closed = False
+        self.lock = threading.Lock()
+        self._snapshot()
+        self.thread = threading.Thread(
+            target=self._run, name=f"live-event-{event_id}", daemon=True
+        )
+
+    def _snapshot(self):
+        self.version = _current_version(self.event_id)
+        self.last_checkin_id = (
+            db.session.execute(
+                select(db.func.max(CheckIn.id)).where(CheckIn.event_id == self.event_id)
+            ).scalar()
+            or 0
+        )
+        self.shifts = {
+            shift.id: _shift_signature(shift)
+            for shift in Shift.query.filter_by(event_id=self.event_id)
+        }
+
+    def add(self, subscription, since):
+        with self.lock:
+            self.subscribers.add(subscription)
+            if since is None or since >= self.version:
+                return
+            # Replay what the client missed, if that is still in the history
+            missed = [entry for entry in self.history if entry[1] > since]
+            if not missed or missed[0][0] > since:
+                subscription.put(RELOAD)
+                return
+            for _, _, messages in missed:
+                for message in messages:
+                    subscription.put(message)
+
+    def _run(self):
+        interval = self.broker.app.config.get("LIVE_POLL_INTERVAL", 2)
+        while not self.closed:
+            self.wake.wait(interval)
+            self.wake.clear()
+            if self.closed:
+                break
+            try:
+                with self.broker.app.test_request_context(base_url=self.url_root):
+                    self._poll()
+            except Exception as e:
+                self.broker.app.logger.error(
+                    f"Live board poll for event {self.event_id} failed: {e}"
+                )
+
+    def _poll(self):
+        version = _current_version(self.event_id)
+        if version == self.version:
+            return
+
+        messages = []
+        for checkin in (
+            CheckIn.query.filter(
+                CheckIn.event_id == self.event_id,
+                CheckIn.id > self.last_checkin_id,
+            )
+            .order_by(CheckIn.id)
+            .all()
+        ):
+            html = render_template("admin/_checkin_row.html", checkin=checkin)
+            messages.append(
+                sse_message("checkin", {"id": checkin.id, "html": html}, version)
+            )
+            self.last_checkin_id = checkin.id
+
+        shifts = {
+            shift.id: shift
+            for shift in Shift.query.filter_by(event_id=self.event_id).order_by(
+                Shift.start_time
+            )
+        }
+        if db.session.get(Event, self.event_id) is None or set(shifts) != set(
+            self.shifts
+        ):
+            # Cards came or went: a delta cannot express that, so resync
+            messages.append(sse_message("reload", {}, version))
+        for shift_id, shift in shifts.items():
+            signature = _shift_signature(shift)
+            if self.shifts.get(shift_id) != signature:
+                html = render_template(
+                    "admin/_shift_card.html", shift=shift, assign_form=None
+                )
+                messages.append(
+                    sse_message("shift", {"id": shift_id, "html": html}, version)
+                )
+        self.shifts = {
+            shift_id: _shift_signature(shift) for shift_id, shift in shifts.items()
+        }
+
+        with self.lock:
+            self.history.append((self.version, version, messages))
+            self.version = version
+            for subscription in self.subscribers:
+                for message in messages:
+                    subscription.put(message)
+
+
+class LiveBroker:
+    """In-process pub/sub for the live event board."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.channels = {}
+        # Open subscriptions, one per connected board
+        self.streams = 0
+
+    def subscribe(self, event_id, since=None, url_root="http://localhost/", limit=None):
+        """
+        Start receiving deltas for `event_id`.
+
+        `since` is the event data version the client already shows; missed
+        deltas are replayed from the channel history (or a reload is sent).
+        Raises StreamLimitReached when `limit` subscriptions are already open.
+        """
+        with self.lock:
+            if limit and self.streams >= limit:
+                raise StreamLimitReached(f"{self.streams} live streams are open")
+            channel = self.channels.get(event_id)
+            if channel is None:
+                channel = _Channel(self, event_id, url_root)
+                self.channels[event_id] = channel
+                channel.thread.start()
+            subscription = Subscription(
+                channel, self.app.config.get("LIVE_QUEUE_SIZE", 100)
+            )
+            channel.add(subscription, since)
+            self.streams += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        channel = subscription.channel
+        with self.lock:
+            with channel.lock:
+                if subscription in channel.subscribers:
+                    channel.subscribers.discard(subscription)
+                    self.streams -= 1
+                if channel.subscribers:
+                    return
+            # Last one out stops the poller
+            if self.channels.get(channel.event_id) is channel:
+                del self.channels[channel.event_id]
+        channel.closed = True
+        channel.wake.set()
+
+    def notify(self, keys):
+        """Wake the pollers of events whose version keys just changed."""
+        with self.lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            if event_key(channel.event_id) in keys:
+                channel.wake.set()
+
+    def close(self):
+        with self.lock:
+            channels = list(self.channels.values())
+            self.channels.clear()
+            self.streams = 0
+        for channel in channels:
+            channel.closed = True
+            channel.wake.set()
+            with channel.lock:
+                for subscription in channel.subscribers:
+                    subscription.put(None)
+                channel.subscribers.clear()
+
+
+def live_broker(app):
+    """The app's LiveBroker, created on first use."""
+    with _broker_lock:
+        broker = app.extensions.get("live_broker")
+        if broker is None:
+            broker = app.extensions["live_broker"] = LiveBroker(app)
+        return broker
+
+
+@versions_bumped.connect
+def _wake_pollers(app, keys):
+    broker = app.extensions.get("live_broker")
+    if broker is not None:
+        broker.notify(keys)
@@ -1,9 +1,17 @@
-from datetime import datetime
+from datetime import datetime, time
 
 from flask_login import UserMixin
+from sqlalchemy import event, inspect
 
 from app.extensions import db, login_manager
 
+# The overnight slots volunteers can say they prefer, with their hours
+SHIFT_SLOTS = {
+    "7:45PM-12AM": (time(19, 45), time(0, 0)),
+    "12AM-4AM": (time(0, 0), time(4, 0)),
+    "4AM-8AM": (time(4, 0), time(8, 0)),
+}
+
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
@@ -19,15 +27,62 @@ class User(UserMixin, db.Model):
     level = db.Column(
         db.String(50), default="Beginner"
     )  # 'Beginner', 'Intermediate', 'Advanced'
-    shift_preference = db.Column(db.String(50))  # '7:45PM-12AM', '12AM-4AM', '4AM-8AM'
     email_allowed = db.Column(db.Boolean, default=True)
+    # Secret in the URL of the user's iCalendar feed (see app.ical)
+    calendar_token = db.Column(db.String(64), unique=True, index=True)
 
     signups = db.relationship("Signup", backref="volunteer", lazy="dynamic")
+    preferences = db.relationship(
+        "ShiftPreference", backref="user", cascade="all, delete-orphan"
+    )
+
+    @property
+    def shift_slots(self):
+        """The preferred slots (keys of SHIFT_SLOTS), in shift order."""
+        slots = {preference.slot for preference in self.preferences}
+        order = {slot: i for i, slot in enumerate(SHIFT_SLOTS)}
+        return sorted(slots, key=lambda slot: (order.get(slot, len(order)), slot))
+
+    @shift_slots.setter
+    def shift_slots(self, slots):
+        slots = {slot.strip() for slot in slots or () if slot and slot.strip()}
+        kept = [p for p in self.preferences if p.slot in slots]
+        have = {p.slot for p in kept}
+        self.preferences = kept + [
+            ShiftPreference(slot=slot) for slot in sorted(slots - have)
+        ]
+
+    @property
+    def shift_preference(self):
+        """The preferred slots as one comma-joined string, as once stored."""
+        return ",".join(self.shift_slots) or None
+
+    @shift_preference.setter
+    def shift_preference(self, value):
+        self.shift_slots = (value or "").split(",")
 
     def __repr__(self):
         return f"<User {self.email}>"
 
 
+class ShiftPreference(db.Model):
+    """One slot of SHIFT_SLOTS a volunteer prefers to work."""
+
+    __tablename__ = "shift_preferences"
+    __table_args__ = (
+        # "Who prefers this slot" is answered from the index alone
+        db.Index("ix_shift_preferences_slot_user", "slot", "user_id"),
+    )
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    slot = db.Column(db.String(20), primary_key=True)
+
+    def __repr__(self):
+        return f"<ShiftPreference User:{self.user_id} {self.slot}>"
+
+
 class Visitor(db.Model):
     __tablename__ = "visitors"
 
@@ -66,6 +121,13 @@ class Shift(db.Model):
     # "Each shift requires two people to staff it."
     capacity = db.Column(db.Integer, default=2)
 
+    # Denormalized counters, kept in sync by the Signup mapper events below
+    # so staffing views never have to COUNT signups
+    signup_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    confirmed_count = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+
     signups = db.relationship(
         "Signup", backref="shift", lazy="dynamic", cascade="all, delete-orphan"
     )
@@ -73,24 +135,102 @@ class Shift(db.Model):
     def __repr__(self):
         return f"<Shift {self.start_time}-{self.end_time}>"
 
-    @property
-    def confirmed_count(self):
-        return self.signups.filter_by(confirmed=True).count()
-
 
 class Signup(db.Model):
     __tablename__ = "signups"
+    __table_args__ = (
+        # A volunteer can only hold one slot on a given shift
+        db.UniqueConstraint("user_id", "shift_id", name="uq_signups_user_shift"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    shift_id = db.Column(db.Integer, db.ForeignKey("shifts.id"), nullable=False)
-    confirmed = db.Column(db.Boolean, default=False)
+    # active_history so the counter events can see the previous value even when
+    # the attribute was expired (e.g. after a commit) before being changed
+    shift_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("shifts.id"), nullable=False),
+        active_history=True,
+    )
+    confirmed = db.column_property(
+        db.Column(db.Boolean, default=False), active_history=True
+    )
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set once supervisors have been told about the signup (see app.notifications)
+    supervisor_notified_at = db.Column(db.DateTime, index=True)
 
     def __repr__(self):
         return f"<Signup User:{self.user_id} Shift:{self.shift_id}>"
 
 
+def _bump_shift_counters(connection, target, shift_id, signups, confirmed):
+    """Apply a counter delta to a shift inside the current flush."""
+    if not shift_id or not (signups or confirmed):
+        return
+
+    shifts = Shift.__table__
+    connection.execute(
+        shifts.update()
+        .where(shifts.c.id == shift_id)
+        .values(
+            signup_count=shifts.c.signup_count + signups,
+            confirmed_count=shifts.c.confirmed_count + confirmed,
+        )
+    )
+
+    # Make an already loaded Shift re-read its counters on next access
+    session = inspect(target).session
+    if session is None:
+        return
+    key = inspect(Shift).identity_key_from_primary_key((shift_id,))
+    shift = session.identity_map.get(key)
+    if shift is not None:
+        session.expire(shift, ["signup_count", "confirmed_count"])
+
+
+@event.listens_for(Signup, "after_insert")
+def _signup_inserted(mapper, connection, target):
+    _bump_shift_counters(
+        connection, target, target.shift_id, 1, 1 if target.confirmed else 0
+    )
+
+
+@event.listens_for(Signup, "after_delete")
+def _signup_deleted(mapper, connection, target):
+    _bump_shift_counters(
+        connection, target, target.shift_id, -1, -1 if target.confirmed else 0
+    )
+
+
+@event.listens_for(Signup, "after_update")
+def _signup_updated(mapper, connection, target):
+    state = inspect(target)
+    shift_history = state.attrs.shift_id.history
+    confirmed_history = state.attrs.confirmed.history
+
+    old_shift_id = (
+        shift_history.deleted[0] if shift_history.deleted else target.shift_id
+    )
+    was_confirmed = (
+        confirmed_history.deleted[0]
+        if confirmed_history.deleted
+        else target.confirmed
+    )
+
+    if old_shift_id != target.shift_id:
+        # Moved to another shift: take it off the old one, add to the new one
+        _bump_shift_counters(
+            connection, target, old_shift_id, -1, -1 if was_confirmed else 0
+        )
+        _bump_shift_counters(
+            connection, target, target.shift_id, 1, 1 if target.confirmed else 0
+        )
+    elif bool(was_confirmed) != bool(target.confirmed):
+        # Confirmed or un-confirmed in place
+        _bump_shift_counters(
+            connection, target, target.shift_id, 0, 1 if target.confirmed else -1
+        )
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -98,11 +238,18 @@ def load_user(user_id):
 
 class CheckIn(db.Model):
     __tablename__ = "checkins"
+    __table_args__ = (
+        db.UniqueConstraint("client_id", name="uq_checkins_client_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey("events.id"), nullable=False)
-    visitor_id = db.Column(db.Integer, db.ForeignKey("visitors.id"), nullable=False)
+    visitor_id = db.Column(
+        db.Integer, db.ForeignKey("visitors.id"), nullable=False, index=True
+    )
     check_in_time = db.Column(db.DateTime, default=datetime.utcnow)
+    # Id the door kiosk gave the check-in, so replayed batches are idempotent
+    client_id = db.Column(db.String(64))
 
     event = db.relationship("Event", backref=db.backref("checkins", lazy="dynamic"))
     visitor = db.relationship("Visitor", backref=db.backref("checkins", lazy="dynamic"))
@@ -111,6 +258,50 @@ class CheckIn(db.Model):
         return f"<CheckIn Event:{self.event_id} Visitor:{self.visitor_id}>"
 
 
+class NightlyStat(db.Model):
+    """Per-event rollup for reports; kept current by app.stats on commit."""
+
+    __tablename__ = "nightly_stats"
+
+    event_id = db.Column(
+        db.Integer, db.ForeignKey("events.id", ondelete="CASCADE"), primary_key=True
+    )
+    date = db.Column(db.Date, nullable=False, index=True)
+    guests = db.Column(db.Integer, nullable=False, default=0)
+    # Guests checking in for the first time, against those seen on earlier nights
+    new_guests = db.Column(db.Integer, nullable=False, default=0)
+    returning_guests = db.Column(db.Integer, nullable=False, default=0)
+    slots_required = db.Column(db.Integer, nullable=False, default=0)
+    slots_filled = db.Column(db.Integer, nullable=False, default=0)
+    slots_confirmed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def confirmed_ratio(self):
+        """Share of the filled slots that are confirmed (None if none are filled)."""
+        if not self.slots_filled:
+            return None
+        return self.slots_confirmed / self.slots_filled
+
+    def __repr__(self):
+        return f"<NightlyStat {self.date} guests={self.guests}>"
+
+
+class EmailBody(db.Model):
+    """A distinct pair of email bodies, stored once however many emails use it."""
+
+    __tablename__ = "email_bodies"
+
+    # sha256 of the text and HTML bodies (see app.email.body_digest)
+    digest = db.Column(db.String(64), primary_key=True)
+    # zlib-compressed UTF-8
+    text_z = db.Column(db.LargeBinary)
+    html_z = db.Column(db.LargeBinary)
+
+    def __repr__(self):
+        return f"<EmailBody {self.digest[:12]}>"
+
+
 class Email(db.Model):
     __tablename__ = "emails"
 
@@ -119,11 +310,25 @@ class Email(db.Model):
     subject = db.Column(db.String(255), nullable=False)
     body_text = db.Column(db.Text)
     body_html = db.Column(db.Text)
-    status = db.Column(db.String(20), default="pending")  # pending, sent, failed
+    # pending, sending (claimed by a worker), sent, failed
+    status = db.Column(db.String(20), default="pending")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     sent_at = db.Column(db.DateTime)
     error_message = db.Column(db.Text)
+    # When a worker claimed the email; stale claims are handed out again
+    claimed_at = db.Column(db.DateTime)
     sensitive = db.Column(db.Boolean, default=False)
+    # Deferred rendering: template path (without extension) and JSON context,
+    # rendered by the email worker at send time instead of body_text/body_html
+    template = db.Column(db.String(100))
+    context = db.Column(db.Text)
+    # Emails queued through app.email share their bodies in email_bodies;
+    # JSON {name: value} filled into the body's {{ name }} placeholders for
+    # this recipient. body_text/body_html only hold bodies written directly.
+    body_digest = db.Column(
+        db.String(64), db.ForeignKey("email_bodies.digest"), index=True
+    )
+    substitutions = db.Column(db.Text)
 
     def __repr__(self):
         return f"<Email {self.id} to {self.recipient}>"
@@ -145,6 +350,18 @@ class EmailTemplate(db.Model):
         return f"<EmailTemplate {self.slug}>"
 
 
+class DataVersion(db.Model):
+    """Change counters for cached views; bumped by app.versions on commit."""
+
+    __tablename__ = "data_versions"
+
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DataVersion {self.key}={self.version}>"
+
+
 class LoginToken(db.Model):
     __tablename__ = "login_tokens"
 
@@ -0,0 +1,246 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, render_template, url_for
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import joinedload
+
+from app.email import queue_emails, send_template_email
+from app.extensions import db
+from app.models import LoginToken, Shift, Signup, User
+from app.targeting import opted_in_volunteers
+
+BROADCAST_MESSAGE = (
+    "Hi {{ name }},\n\n"
+    "We are activating the shelter for {{ date }}. "
+    "We still have open shifts and would appreciate your help.\n\n"
+    "Please click the link below to sign up:\n"
+    "{{ link }}\n\n"
+    "Thanks,\nMECWS Team"
+)
+
+
+def _supervisor_cache():
+    """Per-app cache of supervisor recipients."""
+    return current_app.extensions.setdefault(
+        "supervisor_cache",
+        {"emails": None, "loaded_at": 0.0, "lock": threading.Lock()},
+    )
+
+
+def supervisor_emails():
+    """
+    Email addresses of the supervisors who accept notifications.
+
+    The list is cached per process and dropped whenever a User row is
+    written in this process; SUPERVISOR_CACHE_SECONDS bounds how stale it
+    can get when another process changes a supervisor.
+    """
+    cache = _supervisor_cache()
+    ttl = current_app.config.get("SUPERVISOR_CACHE_SECONDS", 300)
+    with cache["lock"]:
+        emails = cache["emails"]
+        if emails is not None and time.monotonic() - cache["loaded_at"] < ttl:
+            return list(emails)
+
+    rows = db.session.query(User.email).filter(
+        User.role == "Shelter Supervisor",
+        # email_allowed defaults to True if None (legacy rows)
+        User.email_allowed.isnot(False),
+    )
+    emails = [email for (email,) in rows]
+
+    with cache["lock"]:
+        cache["emails"] = emails
+        cache["loaded_at"] = time.monotonic()
+    return list(emails)
+
+
+def clear_supervisor_cache():
+    cache = _supervisor_cache()
+    with cache["lock"]:
+        cache["emails"] = None
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    if has_app_context():
+        clear_supervisor_cache()
+
+
+def _admin_url():
+    """Absolute link to the signup queue, relative when no request/SERVER_NAME."""
+    try:
+        return url_for("admin.manage_signups", _external=True)
+    except RuntimeError:
+        return "/admin/signups"
+
+
+def notify_new_signup(user, shift):
+    """
+    Tell supervisors about a new volunteer signup.
+
+    With SIGNUP_DIGEST_MINUTES set the pending signup itself is the recorded
+    event and send_signup_digest() reports it later; otherwise one email is
+    queued to every supervisor right away. The caller commits.
+    """
+    if current_app.config.get("SIGNUP_DIGEST_MINUTES"):
+        return
+
+    recipients = supervisor_emails()
+    if recipients:
+        send_template_email(
+            "[MECWS] New Volunteer Signup",
+            current_app.config["MAIL_DEFAULT_SENDER"],
+            recipients,
+            "email/new_signup",
+            user=user,
+            shift=shift,
+            url=_admin_url(),
+        )
+
+    # Keep the signup out of any later digest
+    db.session.execute(
+        update(Signup)
+        .where(Signup.user_id == user.id, Signup.shift_id == shift.id)
+        .values(supervisor_notified_at=datetime.utcnow())
+        # Reporting a signup changes nothing any cached view shows
+        .execution_options(synchronize_session=False, versions=())
+    )
+
+
+def send_signup_digest(force=False):
+    """
+    Send each supervisor one summary of the signups not yet reported.
+
+    Nothing is sent until the oldest unreported signup has waited a full
+    SIGNUP_DIGEST_MINUTES window (unless `force` is set), so a burst of
+    signups after a broadcast collapses into a single email per supervisor.
+
+    Returns the number of signups reported.
+    """
+    window = timedelta(minutes=current_app.config.get("SIGNUP_DIGEST_MINUTES") or 0)
+    unreported = (
+        Signup.supervisor_notified_at.is_(None),
+        Signup.confirmed.is_(False),
+    )
+
+    # Cheap check first: this runs on every email worker iteration
+    now = datetime.utcnow()
+    oldest = db.session.query(func.min(Signup.created_at)).filter(*unreported).scalar()
+    if oldest is None or (not force and oldest > now - window):
+        return 0
+
+    signups = (
+        Signup.query.options(
+            joinedload(Signup.volunteer),
+            joinedload(Signup.shift).joinedload(Shift.event),
+        )
+        .filter(*unreported)
+        .order_by(Signup.created_at)
+        .all()
+    )
+
+    recipients = supervisor_emails()
+    if recipients:
+        admin_url = _admin_url()
+        text_body = render_template(
+            "email/signup_digest.txt", signups=signups, url=admin_url
+        )
+        html_body = render_template(
+            "email/signup_digest.html", signups=signups, url=admin_url
+        )
+        queue_emails(
+            [
+                {
+                    "recipient": recipient,
+                    "subject": f"[MECWS] {len(signups)} New Volunteer Signup(s)",
+                    "body_text": text_body,
+                    "body_html": html_body,
+                }
+                for recipient in recipients
+            ]
+        )
+
+    db.session.execute(
+        update(Signup)
+        .where(Signup.id.in_([s.id for s in signups]))
+        .values(supervisor_notified_at=now)
+        # Reporting a signup changes nothing any cached view shows
+        .execution_options(synchronize_session=False, versions=())
+    )
+    db.session.commit()
+    return len(signups)
+
+
+def broadcast_subject(events):
+    dates = sorted(event.date for event in events)
+    if len(dates) == 1:
+        return f"Volunteers Needed: {dates[0].strftime('%A, %B %d')}"
+    return (
+        f"Volunteers Needed: {dates[0].strftime('%B %d')} - "
+        f"{dates[-1].strftime('%B %d')}"
+    )
+
+
+def _date_list(dates):
+    names = [day.strftime("%B %d, %Y") for day in sorted(dates)]
+    if len(names) <= 2:
+        return " and ".join(names)
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def queue_broadcast(events, subject, message, recipients=None):
+    """
+    Ask volunteers to sign up for `events`.
+
+    `recipients` is a User query or list, by default every Team Member who
+    allows email (see app.targeting for narrower ones). Each volunteer gets
+    one email, however many events it covers, with {{ name }}, {{ date }}
+    and {{ link }} filled in; the link is a 48 hour magic login to the
+    available shifts. Needs a request context for the links. The caller
+    commits.
+
+    Returns the number of volunteers emailed.
+    """
+    if recipients is None:
+        recipients = opted_in_volunteers()
+    expiry = datetime.utcnow() + timedelta(days=2)
+    next_url = url_for("volunteer.available_shifts")
+
+    # Every recipient shares these bodies; only the name and link differ
+    body = message.replace("{{ date }}", _date_list(event.date for event in events))
+    html_body = f"<p>{body.replace(chr(10), '<br>')}</p>".replace(
+        "{{ link }}", '<a href="{{ link }}">Click here to sign up</a>'
+    )
+
+    messages = []
+    for user in recipients:
+        token = str(uuid.uuid4())
+        db.session.add(LoginToken(token=token, user_id=user.id, expires_at=expiry))
+        magic_link = url_for(
+            "main.validate_magic_link",
+            token=token,
+            next=next_url,
+            _external=True,
+            _scheme="https",
+        )
+        messages.append(
+            {
+                "recipient": user.email,
+                "subject": f"[MECWS] {subject}",
+                "body_text": body,
+                "body_html": html_body,
+                "substitutions": {
+                    "name": user.name or "Team Member",
+                    "link": magic_link,
+                },
+            }
+        )
+
+    queue_emails(messages)
+    return len(messages)
@@ -0,0 +1,142 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models import Event, Shift
+from app.versions import SCHEDULE, event_key
+
+# The three overnight shifts every event gets unless told otherwise
+STANDARD_SHIFTS = [
+    (time(19, 45), time(0, 0)),
+    (time(0, 0), time(4, 0)),
+    (time(4, 0), time(8, 0)),
+]
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# Longest range plan_season() accepts, against runaway inserts from a typo
+MAX_SEASON_DAYS = 366
+
+SeasonPlan = namedtuple("SeasonPlan", ["created", "skipped"])
+
+
+def parse_shift_template(text):
+    """
+    Parse '19:45-00:00, 00:00-04:00' into [(start, end), ...] times.
+
+    Raises ValueError for anything else.
+    """
+    shifts = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            start, end = (
+                datetime.strptime(value.strip(), "%H:%M").time()
+                for value in part.split("-")
+            )
+        except ValueError:
+            raise ValueError(f"Invalid shift '{part}', expected HH:MM-HH:MM") from None
+        shifts.append((start, end))
+    if not shifts:
+        raise ValueError("At least one shift is required")
+    return shifts
+
+
+def format_shift_template(shifts):
+    return ", ".join(
+        f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in shifts
+    )
+
+
+def parse_weekdays(text):
+    """Parse 'mon,wed,fri' into weekday numbers (Monday is 0)."""
+    days = set()
+    for name in text.split(","):
+        name = name.strip().lower()[:3]
+        if not name:
+            continue
+        if name not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday '{name}'")
+        days.add(WEEKDAYS.index(name))
+    return days
+
+
+def season_dates(start, end, weekdays=None):
+    """Every date from start to end (inclusive), optionally only on weekdays."""
+    if end < start:
+        raise ValueError("The end date is before the start date")
+    if (end - start).days >= MAX_SEASON_DAYS:
+        raise ValueError(f"A season can span at most {MAX_SEASON_DAYS} days")
+    return [
+        day
+        for day in (start + timedelta(days=i) for i in range((end - start).days + 1))
+        if not weekdays or day.weekday() in weekdays
+    ]
+
+
+def plan_season(
+    start, end, weekdays=None, shifts=None, status="planned", capacity=None
+):
+    """
+    Create an event, with its shifts, for every night of a season.
+
+    See create_events(); the caller is responsible for committing.
+    """
+    return create_events(season_dates(start, end, weekdays), shifts, status, capacity)
+
+
+def create_events(dates, shifts=None, status="planned", capacity=None):
+    """
+    Create an event, with its shifts, on each of `dates`.
+
+    Dates that already have an event are skipped. Events and shifts go in
+    with one bulk INSERT each instead of one flush per object, so a
+    90-night season costs a handful of statements. The caller is
+    responsible for committing.
+
+    Returns a SeasonPlan of the created and the skipped dates.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return SeasonPlan([], [])
+    shifts = shifts or STANDARD_SHIFTS
+
+    existing = set(
+        db.session.scalars(
+            select(Event.date).where(Event.date.between(dates[0], dates[-1])).distinct()
+        )
+    )
+    new_dates = [day for day in dates if day not in existing]
+    skipped = [day for day in dates if day in existing]
+    if not new_dates:
+        return SeasonPlan([], skipped)
+
+    # Every event gets the same shifts, so the ids may come back in any
+    # order; not asking for parameter order keeps the INSERT batched
+    # Neither INSERT falls back to the EVENTS key: the shifts name the new
+    # events, so only their stats rows are computed on commit
+    event_ids = db.session.scalars(
+        insert(Event).returning(Event.id).execution_options(versions=[SCHEDULE]),
+        [{"date": day, "status": status} for day in new_dates],
+    ).all()
+
+    shift_rows = [
+        {"event_id": event_id, "start_time": start_time, "end_time": end_time}
+        for event_id in event_ids
+        for start_time, end_time in shifts
+    ]
+    if capacity is not None:
+        for row in shift_rows:
+            row["capacity"] = capacity
+    db.session.execute(
+        insert(Shift).execution_options(
+            versions=[SCHEDULE, *map(event_key, event_ids)]
+        ),
+        shift_rows,
+    )
+
+    return SeasonPlan(new_dates, skipped)
@@ -0,0 +1,38 @@
+from sqlalchemy import and_, exists, false
+
+from app.models import SHIFT_SLOTS, ShiftPreference, Signup, User
+
+
+def slot_for_shift(shift):
+    """The SHIFT_SLOTS key with the shift's exact hours, or None."""
+    for slot, hours in SHIFT_SLOTS.items():
+        if hours == (shift.start_time, shift.end_time):
+            return slot
+    return None
+
+
+def volunteers_preferring(slot):
+    """Users who prefer `slot`, read off the (slot, user_id) index."""
+    return User.query.join(
+        ShiftPreference,
+        and_(ShiftPreference.user_id == User.id, ShiftPreference.slot == slot),
+    ).order_by(User.name, User.email)
+
+
+def volunteers_for_shift(shift, exclude_signed_up=True):
+    """
+    Users whose preferred slot is this shift's, as a single query.
+
+    Those already signed up for the shift are left out unless
+    `exclude_signed_up` is false. Shifts outside the standard slots match
+    no one.
+    """
+    slot = slot_for_shift(shift)
+    if slot is None:
+        return User.query.filter(false())
+    query = volunteers_preferring(slot)
+    if exclude_signed_up:
+        query = query.filter(
+            ~exists().where(Signup.user_id == User.id, Signup.shift_id == shift.id)
+        )
+    return query
@@ -1,10 +1,65 @@
-from datetime import time
-
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from datetime import date
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user, login_required
-
-from app.forms import AssignVolunteerForm, EventForm, TeamMemberForm
-from app.models import Event, Shift, Signup, User, db
+from markupsafe import Markup
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app.activation import activate, activated_events, propose_activations
+from app.cache import cached_fragment
+from app.checkins import BATCH_ATTEMPTS, apply_checkin_batch
+from app.exports import FORMATS, export_chunks
+from app.forms import AssignVolunteerForm, EventForm, SeasonPlanForm, TeamMemberForm
+from app.http import (
+    conditional_page,
+    fragment_response,
+    version_etag,
+    wants_fragment,
+)
+from app.live import StreamLimitReached, live_broker
+from app.models import (
+    SHIFT_SLOTS,
+    Event,
+    NightlyStat,
+    Shift,
+    ShiftPreference,
+    Signup,
+    User,
+    db,
+)
+from app.notifications import BROADCAST_MESSAGE, broadcast_subject, queue_broadcast
+from app.planning import (
+    STANDARD_SHIFTS,
+    format_shift_template,
+    parse_shift_template,
+    plan_season,
+)
+from app.preferences import volunteers_preferring
+from app.search import search_users
+from app.stats import season_totals
+from app.targeting import broadcast_recipients, opted_in_volunteers
+from app.versions import (
+    EVENTS,
+    SCHEDULE,
+    USERS,
+    VISITORS,
+    data_version,
+    data_versions,
+    event_key,
+    user_key,
+)
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -19,8 +74,17 @@ def require_supervisor():
 
 @admin_bp.route("/events")
 def list_events():
-    events = Event.query.order_by(Event.date.desc()).all()
-    return render_template("admin/list_events.html", events=events)
+    # Rows (with their per-shift staffing badges) only change with the schedule
+    event_rows = cached_fragment(
+        ("event_rows", data_version(SCHEDULE)),
+        lambda: Markup(
+            render_template(
+                "admin/_event_rows.html",
+                events=Event.query.order_by(Event.date.desc()).all(),
+            )
+        ),
+    )
+    return render_template("admin/list_events.html", event_rows=event_rows)
 
 
 @admin_bp.route("/events/new", methods=["GET", "POST"])
@@ -31,14 +95,8 @@ def create_event():
         db.session.add(event)
 
         # Create standard shifts
-        shifts = [
-            Shift(start_time=time(19, 45), end_time=time(0, 0), event=event),
-            Shift(start_time=time(0, 0), end_time=time(4, 0), event=event),
-            Shift(start_time=time(4, 0), end_time=time(8, 0), event=event),
-        ]
-
-        for shift in shifts:
-            db.session.add(shift)
+        for start_time, end_time in STANDARD_SHIFTS:
+            db.session.add(Shift(start_time=start_time, end_time=end_time, event=event))
 
         db.session.commit()
         flash("Event and standard shifts created successfully.", "success")
@@ -54,6 +112,125 @@ def create_event():
     )
 
 
+@admin_bp.route("/events/plan", methods=["GET", "POST"])
+def plan_events():
+    """Create the events (and shifts) for a whole season in one go."""
+    form = SeasonPlanForm()
+    if request.method == "GET":
+        form.shifts.data = format_shift_template(STANDARD_SHIFTS)
+
+    if form.validate_on_submit():
+        try:
+            plan = plan_season(
+                form.start_date.data,
+                form.end_date.data,
+                weekdays={int(day) for day in form.weekdays.data},
+                shifts=parse_shift_template(form.shifts.data),
+                status=form.status.data,
+                capacity=form.capacity.data,
+            )
+        except ValueError as e:
+            flash(str(e), "danger")
+            return render_template("admin/plan_events.html", form=form)
+
+        db.session.commit()
+        message = f"Created {len(plan.created)} event(s)."
+        if plan.skipped:
+            message += f" Skipped {len(plan.skipped)} date(s) that already had one."
+        flash(message, "success")
+        return redirect(url_for("admin.list_events"))
+
+    return render_template("admin/plan_events.html", form=form)
+
+
+@admin_bp.route("/events/activations", methods=["GET", "POST"])
+def plan_activations():
+    """Propose events for the forecast nights that meet the thresholds."""
+    if request.method == "POST":
+        try:
+            dates = [date.fromisoformat(day) for day in request.form.getlist("dates")]
+        except ValueError:
+            flash("Invalid date selected.", "danger")
+            return redirect(url_for("admin.plan_activations"))
+        if not dates:
+            flash("Select at least one night.", "warning")
+            return redirect(url_for("admin.plan_activations"))
+
+        plan = activate(dates)
+        message = f"Created {len(plan.created)} planned event(s)."
+        if request.form.get("action") == "broadcast":
+            events = activated_events(dates)
+            count = queue_broadcast(
+                events,
+                broadcast_subject(events),
+                BROADCAST_MESSAGE,
+                broadcast_recipients([event.id for event in events]),
+            )
+            message += f" Broadcast sent to {count} volunteers."
+        db.session.commit()
+        flash(message, "success")
+        return redirect(url_for("admin.plan_activations"))
+
+    return render_template(
+        "admin/plan_activations.html", proposals=propose_activations()
+    )
+
+
+def _date_range_args():
+    """The optional ?start=&end= dates; raises ValueError if malformed."""
+    start, end = request.args.get("start"), request.args.get("end")
+    return (
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+@admin_bp.route("/reports")
+def reports():
+    """Season statistics, read from the nightly_stats rollup."""
+    try:
+        start, end = _date_range_args()
+    except ValueError:
+        flash("Invalid date range.", "danger")
+        return redirect(url_for("admin.reports"))
+
+    query = NightlyStat.query
+    if start:
+        query = query.filter(NightlyStat.date >= start)
+    if end:
+        query = query.filter(NightlyStat.date <= end)
+    return render_template(
+        "admin/reports.html",
+        nights=query.order_by(NightlyStat.date.desc()).all(),
+        totals=season_totals(start, end),
+        start=start,
+        end=end,
+    )
+
+
+@admin_bp.route("/exports/<any(checkins, signups, emails):kind>.<any(csv, jsonl):fmt>")
+def export(kind, fmt):
+    """Stream a whole table as CSV or JSON lines, optionally for a date range."""
+    try:
+        start, end = _date_range_args()
+    except ValueError:
+        return Response("Invalid date range.", status=400, mimetype="text/plain")
+
+    # The rows are fetched while the response is sent, so the request (and
+    # its database session) has to outlive the view
+    return Response(
+        stream_with_context(export_chunks(kind, fmt, start, end)),
+        mimetype=FORMATS[fmt],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{kind}-{date.today().isoformat()}.{fmt}"'
+            ),
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @admin_bp.route("/events/<int:event_id>/edit", methods=["GET", "POST"])
 def edit_event(event_id):
     event = Event.query.get_or_404(event_id)
@@ -80,6 +257,17 @@ def delete_event(event_id):
 
 @admin_bp.route("/events/<int:event_id>")
 def view_event(event_id):
+    # Staffing, check-ins, the volunteer picker and the visitor list
+    etag = version_etag(
+        "event",
+        event_id,
+        current_user.id,
+        *data_versions(event_key(event_id), EVENTS, USERS, VISITORS),
+    )
+    return conditional_page(etag, lambda: _render_event(event_id))
+
+
+def _render_event(event_id):
     event = Event.query.get_or_404(event_id)
 
     # Form for assigning volunteers
@@ -95,46 +283,156 @@ def view_event(event_id):
     visitors = Visitor.query.order_by(Visitor.name).all()
 
     return render_template(
-        "admin/view_event.html", event=event, assign_form=assign_form, visitors=visitors
+        "admin/view_event.html",
+        event=event,
+        assign_form=assign_form,
+        visitors=visitors,
+        live_version=data_version(event_key(event_id)),
+    )
+
+
+@admin_bp.route("/events/<int:event_id>/live")
+def event_stream(event_id):
+    """Server-Sent Events feed of check-ins and staffing changes for an event."""
+    Event.query.get_or_404(event_id)
+
+    # The page passes the version it was rendered at; reconnects send the
+    # id of the last message they saw
+    since = request.headers.get("Last-Event-ID") or request.args.get("since", "")
+    since = int(since) if since.isdigit() else None
+
+    broker = live_broker(current_app._get_current_object())
+    try:
+        subscription = broker.subscribe(
+            event_id,
+            since,
+            request.url_root,
+            limit=current_app.config.get("LIVE_MAX_STREAMS"),
+        )
+    except StreamLimitReached:
+        # Every stream holds a worker thread; keep some for other requests
+        return Response(
+            "Too many live boards are open.",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": "30"},
+        )
+    keepalive = current_app.config.get("LIVE_KEEPALIVE", 15)
+
+    def stream():
+        try:
+            yield from subscription.messages(keepalive)
+        finally:
+            broker.unsubscribe(subscription)
+
+    # No stream_with_context: the database session is released when the
+    # view returns, not held for as long as the client stays connected
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+def _event_action_result(event_id, message, category, fragment="", status=200):
+    """
+    Finish a check-in/staffing action: the updated fragment for in-page
+    requests (see app.http.wants_fragment), a flash and redirect otherwise.
+    """
+    if wants_fragment():
+        return fragment_response(fragment, message, category, status)
+    flash(message, category)
+    return redirect(url_for("admin.view_event", event_id=event_id))
+
+
+def _render_shift_card(shift):
+    return render_template(
+        "admin/_shift_card.html", shift=shift, assign_form=AssignVolunteerForm()
     )
 
 
 @admin_bp.route("/events/<int:event_id>/checkin", methods=["POST"])
 def checkin_visitor(event_id):
-    event = Event.query.get_or_404(event_id)
+    Event.query.get_or_404(event_id)
     visitor_name = request.form.get("visitor_name")
 
     if not visitor_name:
-        flash("Visitor name is required.", "warning")
-        return redirect(url_for("admin.view_event", event_id=event_id))
+        return _event_action_result(
+            event_id, "Visitor name is required.", "warning", status=422
+        )
 
     from app.models import CheckIn, Visitor
 
     # 1. Try to find existing visitor by exact name (case insensitive ideally, but sqlite is default case insensitive for ascii)
     visitor = Visitor.query.filter(Visitor.name.ilike(visitor_name)).first()
 
+    created = False
     if not visitor:
-        # Create new visitor
+        # Create new visitor (committed together with the check-in)
         visitor = Visitor(
             name=visitor_name, alias=visitor_name
         )  # Default alias to name
         db.session.add(visitor)
-        db.session.commit()
-        flash(f"Created new visitor profile for {visitor_name}.", "info")
+        db.session.flush()
+        created = True
 
     # 2. Check overlap
     existing_checkin = CheckIn.query.filter_by(
         event_id=event_id, visitor_id=visitor.id
     ).first()
     if existing_checkin:
-        flash(f"{visitor.name} is already checked in.", "warning")
-    else:
-        checkin = CheckIn(event_id=event_id, visitor_id=visitor.id)
-        db.session.add(checkin)
-        db.session.commit()
-        flash(f"Checked in {visitor.name} successfully.", "success")
+        return _event_action_result(
+            event_id, f"{visitor.name} is already checked in.", "warning", status=409
+        )
 
-    return redirect(url_for("admin.view_event", event_id=event_id))
+    checkin = CheckIn(event_id=event_id, visitor_id=visitor.id)
+    db.session.add(checkin)
+    db.session.commit()
+
+    message = f"Checked in {visitor.name} successfully."
+    if created:
+        if wants_fragment():
+            message = f"Created new visitor profile for {visitor_name}. {message}"
+        else:
+            flash(f"Created new visitor profile for {visitor_name}.", "info")
+    return _event_action_result(
+        event_id,
+        message,
+        "success",
+        fragment=render_template("admin/_checkin_row.html", checkin=checkin),
+    )
+
+
+@admin_bp.route("/events/<int:event_id>/checkins/batch", methods=["POST"])
+def checkin_batch(event_id):
+    """
+    JSON batch check-in for the door kiosk, which queues check-ins while
+    offline and syncs them in bursts (see app.checkins).
+
+    Body: {"checkins": [{"client_id", "visitor_id" or "name", "timestamp"}]}.
+    Answers {"results": [...]} with one result per item, in order.
+    """
+    Event.query.get_or_404(event_id)
+
+    payload = request.get_json(silent=True)
+    items = payload.get("checkins") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return jsonify(error='Expected a JSON object with a "checkins" list.'), 400
+    limit = current_app.config["CHECKIN_BATCH_LIMIT"]
+    if len(items) > limit:
+        return jsonify(error=f"At most {limit} check-ins per batch."), 413
+
+    for _ in range(BATCH_ATTEMPTS):
+        try:
+            results = apply_checkin_batch(event_id, items)
+            db.session.commit()
+            return jsonify(results=results)
+        except IntegrityError:
+            # A concurrent sync of the same client_ids got there first;
+            # applied again, those items come back as duplicates
+            db.session.rollback()
+
+    return jsonify(error="Conflicting syncs are in progress; retry the batch."), 409
 
 
 @admin_bp.route("/shifts/<int:shift_id>/assign", methods=["POST"])
@@ -174,32 +472,59 @@ def assign_volunteer(shift_id):
             ).first()
 
     if not user:
-        flash("Could not find a user matching that name/email.", "danger")
-        return redirect(url_for("admin.view_event", event_id=shift.event_id))
+        return _event_action_result(
+            shift.event_id,
+            "Could not find a user matching that name/email.",
+            "danger",
+            status=422,
+        )
 
     user_id = user.id
 
     # Check if already signed up
     existing = Signup.query.filter_by(user_id=user_id, shift_id=shift_id).first()
     if existing:
-        flash("User is already assigned to this shift.", "warning")
-    else:
-        signup = Signup(user_id=user_id, shift_id=shift_id, confirmed=True)
-        db.session.add(signup)
+        return _event_action_result(
+            shift.event_id,
+            "User is already assigned to this shift.",
+            "warning",
+            status=409,
+        )
+
+    signup = Signup(user_id=user_id, shift_id=shift_id, confirmed=True)
+    db.session.add(signup)
+    try:
         db.session.commit()
-        flash(f"Volunteer {user.name or user.email} assigned successfully.", "success")
+    except IntegrityError:
+        # Another request assigned the same user in the meantime
+        db.session.rollback()
+        return _event_action_result(
+            shift.event_id,
+            "User is already assigned to this shift.",
+            "warning",
+            status=409,
+        )
 
-    return redirect(url_for("admin.view_event", event_id=shift.event_id))
+    return _event_action_result(
+        shift.event_id,
+        f"Volunteer {user.name or user.email} assigned successfully.",
+        "success",
+        fragment=_render_shift_card(shift),
+    )
 
 
 @admin_bp.route("/signups/<int:signup_id>/remove", methods=["POST"])
 def remove_signup(signup_id):
     signup = Signup.query.get_or_404(signup_id)
-    event_id = signup.shift.event_id
+    shift = signup.shift
     db.session.delete(signup)
     db.session.commit()
-    flash("Volunteer removed from shift.", "info")
-    return redirect(url_for("admin.view_event", event_id=event_id))
+    return _event_action_result(
+        shift.event_id,
+        "Volunteer removed from shift.",
+        "info",
+        fragment=_render_shift_card(shift),
+    )
 
 
 @admin_bp.route("/signups")
@@ -219,31 +544,106 @@ def manage_signups():
 def confirm_signup(signup_id):
     signup = Signup.query.get_or_404(signup_id)
     signup.confirmed = True
-    db.session.commit()
 
     # Mock Notification
     # print(f"NOTIFICATION SENT TO {signup.volunteer.email}: Your signup for {signup.shift.event.date} has been CONFIRMED.")
 
     from flask import current_app
 
-    from app.email import send_email
+    from app.email import send_template_email
 
-    send_email(
+    send_template_email(
         "[MECWS] Signup Confirmed",
         current_app.config["MAIL_DEFAULT_SENDER"],
         [signup.volunteer.email],
-        render_template(
-            "email/signup_confirmed.txt", user=signup.volunteer, shift=signup.shift
-        ),
-        render_template(
-            "email/signup_confirmed.html", user=signup.volunteer, shift=signup.shift
-        ),
+        "email/signup_confirmed",
+        user=signup.volunteer,
+        shift=signup.shift,
     )
 
+    # Confirmation and email are committed together
+    db.session.commit()
+
     flash(f"Signup for {signup.volunteer.email} confirmed.", "success")
     return redirect(url_for("admin.manage_signups"))
 
 
+@admin_bp.route("/signups/bulk", methods=["POST"])
+def bulk_signups():
+    """Confirm or reject a selected set of pending signups in one transaction."""
+    from sqlalchemy import delete, update
+    from sqlalchemy.orm import joinedload
+
+    from app.email import build_template_message, queue_emails
+    from app.signups import refresh_shift_counters
+
+    action = request.form.get("action")
+    signup_ids = request.form.getlist("signup_ids", type=int)
+
+    if action not in ("confirm", "reject") or not signup_ids:
+        flash("Select at least one signup and an action.", "warning")
+        return redirect(url_for("admin.manage_signups"))
+
+    # Load everything the notifications need in a single query
+    signups = (
+        Signup.query.options(
+            joinedload(Signup.volunteer),
+            joinedload(Signup.shift).joinedload(Shift.event),
+        )
+        .filter(Signup.id.in_(signup_ids), Signup.confirmed.is_(False))
+        .all()
+    )
+    if not signups:
+        flash("None of the selected signups are pending anymore.", "info")
+        return redirect(url_for("admin.manage_signups"))
+
+    ids = [s.id for s in signups]
+    shift_ids = {s.shift_id for s in signups}
+    versions = {
+        SCHEDULE,
+        *(event_key(s.shift.event_id) for s in signups),
+        *(user_key(s.user_id) for s in signups),
+    }
+
+    if action == "confirm":
+        db.session.execute(
+            update(Signup)
+            .where(Signup.id.in_(ids))
+            .values(confirmed=True)
+            .execution_options(synchronize_session=False, versions=versions)
+        )
+
+        # Build every confirmation up front and queue them in one insert
+        queue_emails(
+            [
+                dict(
+                    build_template_message(
+                        "[MECWS] Signup Confirmed",
+                        "email/signup_confirmed",
+                        user=s.volunteer,
+                        shift=s.shift,
+                    ),
+                    recipient=s.volunteer.email,
+                )
+                for s in signups
+            ]
+        )
+    else:
+        db.session.execute(
+            delete(Signup)
+            .where(Signup.id.in_(ids))
+            .execution_options(synchronize_session=False, versions=versions)
+        )
+
+    # Bulk statements bypass the Signup mapper events
+    refresh_shift_counters(shift_ids)
+    db.session.commit()
+
+    verb = "confirmed" if action == "confirm" else "rejected"
+    flash(f"{len(ids)} signup(s) {verb}.", "success" if action == "confirm" else "info")
+    return redirect(url_for("admin.manage_signups"))
+
+
 @admin_bp.route("/signups/reject/<int:signup_id>", methods=["POST"])
 def reject_signup(signup_id):
     signup = Signup.query.get_or_404(signup_id)
@@ -258,19 +658,26 @@ def reject_signup(signup_id):
 @admin_bp.route("/team")
 def manage_team():
     query = request.args.get("q", "")
+    slot = request.args.get("slot", "")
+    if slot not in SHIFT_SLOTS:
+        slot = ""
     if query:
-        # Search by Name or Email
-        users = (
-            User.query.filter(
-                (User.email.ilike(f"%{query}%")) | (User.name.ilike(f"%{query}%"))
-            )
-            .order_by(User.role, User.email)
-            .all()
-        )
+        # Search by name, email or phone, best matches first
+        users = search_users(query)
+    elif slot:
+        users = volunteers_preferring(slot)
     else:
-        users = User.query.order_by(User.role, User.email).all()
+        users = User.query.order_by(User.role, User.email)
+    if query and slot:
+        users = users.filter(User.preferences.any(ShiftPreference.slot == slot))
 
-    return render_template("admin/list_team.html", users=users, search_query=query)
+    return render_template(
+        "admin/list_team.html",
+        users=users.options(selectinload(User.preferences)).all(),
+        search_query=query,
+        slot=slot,
+        slots=SHIFT_SLOTS,
+    )
 
 
 @admin_bp.route("/team/new", methods=["GET", "POST"])
@@ -289,7 +696,7 @@ def add_team_member():
             emergency_contact=form.emergency_contact.data,
             role=form.role.data,
             level=form.level.data,
-            shift_preference=",".join(form.shift_preference.data),
+            shift_slots=form.shift_preference.data,
             email_allowed=form.email_allowed.data
         )
         db.session.add(user)
@@ -306,9 +713,8 @@ def edit_team_member(user_id):
     user = User.query.get_or_404(user_id)
     form = TeamMemberForm(obj=user)
 
-    # Pre-process stored string to list for form population (GET)
-    if request.method == "GET" and user.shift_preference:
-        form.shift_preference.data = user.shift_preference.split(",")
+    if request.method == "GET":
+        form.shift_preference.data = user.shift_slots
 
     if form.validate_on_submit():
         user.name = form.name.data
@@ -319,8 +725,7 @@ def edit_team_member(user_id):
         user.level = form.level.data
         user.email_allowed = form.email_allowed.data
 
-        # Convert list back to string for storage
-        user.shift_preference = ",".join(form.shift_preference.data)
+        user.shift_slots = form.shift_preference.data
 
         db.session.commit()
         flash(f"Team member {user.email} updated successfully.", "success")
@@ -341,8 +746,16 @@ def list_emails():
 def view_email(email_id):
     from app.models import Email
 
+    from app.email import render_email_bodies
+
     email = Email.query.get_or_404(email_id)
-    return render_template("admin/view_email.html", email=email)
+    # Deferred emails have no stored bodies; render a preview on demand
+    body_text, body_html = None, None
+    if not email.sensitive:
+        body_text, body_html = render_email_bodies(email)
+    return render_template(
+        "admin/view_email.html", email=email, body_text=body_text, body_html=body_html
+    )
 
 
 @admin_bp.route("/templates")
@@ -421,70 +834,28 @@ def delete_template(template_id):
 @admin_bp.route("/events/<int:event_id>/broadcast", methods=["GET", "POST"])
 def broadcast_email(event_id):
     from app.forms import BroadcastEmailForm
-    from flask import current_app
-    from app.email import send_email
 
     event = Event.query.get_or_404(event_id)
     form = BroadcastEmailForm()
 
     if request.method == "GET":
-        form.subject.data = f"Volunteers Needed: {event.date.strftime('%A, %B %d')}"
-        form.message.data = (
-            "Hi {{ name }},\n\n"
-            "We are activating the shelter for {{ date }}. "
-            "We still have open shifts and would appreciate your help.\n\n"
-            "Please click the link below to sign up:\n"
-            "{{ link }}\n\n"
-            "Thanks,\nMECWS Team"
-        )
+        form.subject.data = broadcast_subject([event])
+        form.message.data = BROADCAST_MESSAGE
 
     if form.validate_on_submit():
-        # Get all team members who allow emails
-        # Filter where email_allowed is True or None (legacy)
-        users = User.query.filter(User.role == "Team Member").all()
-        recipients = [u for u in users if u.email_allowed is not False]
-        
-        # Pre-import for loop
-        import uuid
-        from app.models import LoginToken
-        from datetime import datetime, timedelta
-        
-        count = 0
-        for user in recipients:
-            # Generate Login Token for user
-            token_str = str(uuid.uuid4())
-            expiry = datetime.utcnow() + timedelta(days=2) # 48 hour link for broadcast
-            token_entry = LoginToken(token=token_str, user_id=user.id, expires_at=expiry)
-            db.session.add(token_entry)
-            
-            # Create Magic Link with redirect
-            # We want them to go to available shifts
-            magic_link = url_for("main.validate_magic_link", token=token_str, next=url_for('volunteer.available_shifts'), _external=True, _scheme='https')
-
-            # Replace variables
-            message = form.message.data
-            message = message.replace("{{ name }}", user.name or "Team Member")
-            message = message.replace("{{ date }}", event.date.strftime('%B %d, %Y'))
-            message = message.replace("{{ link }}", magic_link)
-            
-            # Send (Simple text body for now, could enhance to HTML)
-            # Basic HTML conversion
-            html_body = f"<p>{message.replace(chr(10), '<br>')}</p>"
-            # Make link clickable in HTML
-            if magic_link in message:
-                 html_body = html_body.replace(magic_link, f'<a href="{magic_link}">Click here to sign up</a>')
-            
-            send_email(
-                f"[MECWS] {form.subject.data}",
-                current_app.config["MAIL_DEFAULT_SENDER"],
-                [user.email],
-                message,
-                html_body
-            )
-            count += 1
-            
-        db.session.commit() # Commit all tokens
+        recipients = broadcast_recipients([event.id]) if form.targeted.data else None
+        count = queue_broadcast(
+            [event], form.subject.data, form.message.data, recipients
+        )
+        # Commit the login tokens; the queued emails are bulk inserted with them
+        db.session.commit()
         flash(f"Broadcast sent to {count} volunteers.", "success")
         return redirect(url_for("admin.view_event", event_id=event.id))
 
-    return render_template("admin/broadcast_email.html", form=form, event=event)
+    return render_template(
+        "admin/broadcast_email.html",
+        form=form,
+        event=event,
+        targeted_count=broadcast_recipients([event.id]).count(),
+        opted_in_count=opted_in_volunteers().count(),
+    )
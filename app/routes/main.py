@@ -50,23 +50,26 @@ def login():
             expiry = datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
             token_entry = LoginToken(token=token_str, user_id=user.id, expires_at=expiry)
             db.session.add(token_entry)
-            db.session.commit()
 
             # Send Email
             # Ensure HTTPS
             link = url_for("main.validate_magic_link", token=token_str, _external=True, _scheme='https')
 
-            from app.email import send_email
+            from app.email import send_template_email
 
-            send_email(
+            send_template_email(
                 "[MECWS] Login Link",
                 current_app.config["MAIL_DEFAULT_SENDER"],
                 [email],
-                render_template("email/login_link.txt", url=link, name=user.name),
-                render_template("email/login_link.html", url=link, name=user.name),
-                sensitive=True
+                "email/login_link",
+                sensitive=True,
+                url=link,
+                name=user.name,
             )
 
+            # Token and email are committed together
+            db.session.commit()
+
         flash(
             "If your email is registered, you will receive a login link shortly.",
             "info",
@@ -125,8 +128,8 @@ def profile():
 
     form = ProfileForm(obj=current_user)
 
-    if request.method == "GET" and current_user.shift_preference:
-        form.shift_preference.data = current_user.shift_preference.split(",")
+    if request.method == "GET":
+        form.shift_preference.data = current_user.shift_slots
 
     if form.validate_on_submit():
         current_user.name = form.name.data
@@ -134,11 +137,7 @@ def profile():
         current_user.emergency_contact = form.emergency_contact.data
         current_user.email_allowed = form.email_allowed.data
 
-        # Format shift prefs
-        if form.shift_preference.data:
-            current_user.shift_preference = ",".join(form.shift_preference.data)
-        else:
-            current_user.shift_preference = ""
+        current_user.shift_slots = form.shift_preference.data
 
         db.session.commit()
         flash("Your profile has been updated.", "success")
@@ -1,8 +1,11 @@
-from flask import Blueprint, flash, redirect, render_template, url_for
+from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy import func, select
 
+from app.dedupe import find_duplicates, merge_visitors
 from app.forms import VisitorForm
 from app.models import CheckIn, Event, Visitor, db
+from app.search import search_visitors
 
 visitor_bp = Blueprint("visitor", __name__, url_prefix="/visitors")
 
@@ -18,13 +21,20 @@ def require_supervisor():
 @visitor_bp.route("/")
 @login_required
 def list_visitors():
-    visitors = Visitor.query.order_by(Visitor.name).all()
+    query = request.args.get("q", "")
+    if query:
+        visitors = search_visitors(query).all()
+    else:
+        visitors = Visitor.query.order_by(Visitor.name).all()
     # Find today's event for check-in context
     from datetime import date
 
     today_event = Event.query.filter_by(date=date.today()).first()
     return render_template(
-        "visitor/list_visitors.html", visitors=visitors, today_event=today_event
+        "visitor/list_visitors.html",
+        visitors=visitors,
+        today_event=today_event,
+        search_query=query,
     )
 
 
@@ -72,3 +82,42 @@ def edit_visitor(visitor_id):
     return render_template(
         "visitor/create_visitor.html", form=form, title="Edit Visitor"
     )
+
+
+@visitor_bp.route("/duplicates")
+@login_required
+def duplicates():
+    pairs = find_duplicates()
+    visitor_ids = {pair.visitor_id for pair in pairs} | {
+        pair.other_id for pair in pairs
+    }
+    checkin_counts = dict(
+        db.session.execute(
+            select(CheckIn.visitor_id, func.count())
+            .where(CheckIn.visitor_id.in_(visitor_ids))
+            .group_by(CheckIn.visitor_id)
+        ).all()
+    )
+    return render_template(
+        "visitor/duplicates.html", pairs=pairs, checkin_counts=checkin_counts
+    )
+
+
+@visitor_bp.route("/merge", methods=["POST"])
+@login_required
+def merge():
+    keep = Visitor.query.get_or_404(request.form.get("keep_id", type=int))
+    other = Visitor.query.get_or_404(request.form.get("merge_id", type=int))
+    if keep.id == other.id:
+        flash("Cannot merge a visitor into itself.", "warning")
+        return redirect(url_for("visitor.duplicates"))
+
+    keep_name, other_name = keep.name, other.name
+    moved = merge_visitors(keep.id, [other.id])
+    db.session.commit()
+
+    flash(
+        f"Merged {other_name} into {keep_name} ({moved} check-in(s) moved).",
+        "success",
+    )
+    return redirect(url_for("visitor.duplicates"))
@@ -1,28 +1,91 @@
+import secrets
 from datetime import date
 
-from flask import Blueprint, flash, redirect, render_template, url_for
+from flask import (
+    Blueprint,
+    abort,
+    flash,
+    get_template_attribute,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from flask_login import current_user, login_required
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
 
-from app.models import Event, Shift, Signup, db
+from app.cache import cached_fragment
+from app.http import conditional_page, version_etag
+from app.ical import calendar_feed
+from app.models import Event, Shift, Signup, User, db
+from app.notifications import notify_new_signup
+from app.signups import SIGNUP_DUPLICATE, SIGNUP_FULL, claim_shift_slot
+from app.versions import SCHEDULE, data_version, data_versions, user_key
 
 volunteer_bp = Blueprint("volunteer", __name__, url_prefix="/volunteer")
 
 
+def _render_shift_rows(today):
+    """
+    Render every upcoming shift row as (shift_id, open_row, signed_up_row).
+
+    Both variants are kept so the cached rows serve every volunteer; only
+    the choice between them depends on who is asking.
+    """
+    shift_row = get_template_attribute("volunteer/_shift_row.html", "shift_row")
+    shifts = (
+        Shift.query.join(Shift.event)
+        .options(contains_eager(Shift.event))
+        .filter(Event.date >= today)
+        .order_by(Event.date, Event.id, Shift.id)
+    )
+    return [
+        (
+            shift.id,
+            shift_row(shift.event, shift, False),
+            shift_row(shift.event, shift, True),
+        )
+        for shift in shifts
+    ]
+
+
 @volunteer_bp.route("/shifts")
 @login_required
 def available_shifts():
     # Only show future or today's events
-    # Only show future or today's events
-    query = Event.query.filter(Event.date >= date.today())
+    today = date.today()
+
+    # Repeat views are answered from the versions alone, without queries
+    etag = version_etag(
+        "shifts",
+        current_user.id,
+        today,
+        *data_versions(SCHEDULE, user_key(current_user.id)),
+    )
+    return conditional_page(etag, lambda: _render_available_shifts(today))
 
-    # query = Event.query.filter(Event.date >= date.today())
-    query = Event.query.filter(Event.date >= date.today())
 
-    events = query.order_by(Event.date).all()
-    print(
-        f"DEBUG: User={current_user.email}, Role={current_user.role}, Events={len(events)}"
+def _render_available_shifts(today):
+    # The table only changes when the schedule does (or the day rolls over)
+    rows = cached_fragment(
+        ("available_shifts", today, data_version(SCHEDULE)),
+        lambda: _render_shift_rows(today),
+    )
+
+    signed_up = set(
+        db.session.scalars(
+            db.select(Signup.shift_id).filter_by(user_id=current_user.id)
+        )
+    )
+    return render_template(
+        "volunteer/available_shifts.html",
+        rows=[
+            signed_up_row if shift_id in signed_up else open_row
+            for shift_id, open_row, signed_up_row in rows
+        ],
     )
-    return render_template("volunteer/available_shifts.html", events=events)
 
 
 @volunteer_bp.route("/signup/<int:shift_id>", methods=["POST"])
@@ -30,58 +93,39 @@ def available_shifts():
 def signup(shift_id):
     shift = Shift.query.get_or_404(shift_id)
 
-    # Check if already signed up
-    if shift.signups.filter_by(user_id=current_user.id).first():
+    # Capacity check and insert happen in one atomic statement
+    # (unconfirmed by default)
+    outcome = claim_shift_slot(shift.id, current_user.id)
+
+    if outcome == SIGNUP_DUPLICATE:
         flash("You are already signed up for this shift.", "warning")
         return redirect(url_for("volunteer.available_shifts"))
 
-    # Check capacity
-    if shift.signups.count() >= shift.capacity:
+    if outcome == SIGNUP_FULL:
         flash("This shift is full.", "danger")
         return redirect(url_for("volunteer.available_shifts"))
 
-    # Create signup (unconfirmed by default)
-    signup_entry = Signup(user_id=current_user.id, shift_id=shift.id, confirmed=False)
-    db.session.add(signup_entry)
-    db.session.commit()
-
-    # Mock Notification
-    # print(f"NOTIFICATION: User {current_user.email} signed up for Shift {shift.id}. Supervisor needs to confirm.")
+    # Notify Supervisors (immediately, or later in a digest)
+    notify_new_signup(current_user, shift)
 
-    # Notify Supervisors
+    # Notify Volunteer of Pending Status
     from flask import current_app
 
-    from app.email import send_email
-    from app.models import User
+    from app.email import send_template_email
 
-    supervisors = User.query.filter_by(role="Shelter Supervisor").all()
-    # Filter supervisors who allow emails (default to True if None)
-    supervisor_emails = [s.email for s in supervisors if s.email_allowed is not False]
-
-    if supervisor_emails:
-        admin_url = url_for("admin.manage_signups", _external=True)
-        send_email(
-            "[MECWS] New Volunteer Signup",
-            current_app.config["MAIL_DEFAULT_SENDER"],
-            supervisor_emails,
-            render_template(
-                "email/new_signup.txt", user=current_user, shift=shift, url=admin_url
-            ),
-            render_template(
-                "email/new_signup.html", user=current_user, shift=shift, url=admin_url
-            ),
-        )
-
-    # Notify Volunteer of Pending Status
     if current_user.email_allowed is not False:
-        send_email(
+        send_template_email(
             "[MECWS] Signup Pending",
             current_app.config["MAIL_DEFAULT_SENDER"],
             [current_user.email],
-            render_template("email/signup_pending.txt", user=current_user, shift=shift),
-            render_template("email/signup_pending.html", user=current_user, shift=shift),
+            "email/signup_pending",
+            user=current_user,
+            shift=shift,
         )
 
+    # Signup and notifications land in one transaction
+    db.session.commit()
+
     flash("Signup requested! Waiting for supervisor confirmation.", "success")
     return redirect(url_for("volunteer.my_schedule"))
 
@@ -89,6 +133,15 @@ def signup(shift_id):
 @volunteer_bp.route("/my-schedule")
 @login_required
 def my_schedule():
+    etag = version_etag(
+        "my_schedule",
+        current_user.id,
+        *data_versions(SCHEDULE, user_key(current_user.id)),
+    )
+    return conditional_page(etag, _render_my_schedule)
+
+
+def _render_my_schedule():
     my_signups = (
         Signup.query.join(Shift)
         .join(Event)
@@ -120,3 +173,36 @@ def cancel_signup(signup_id):
 
     flash("Signup cancelled successfully.", "info")
     return redirect(url_for("volunteer.my_schedule"))
+
+
+@volunteer_bp.route("/calendar/token", methods=["POST"])
+@login_required
+def reset_calendar_token():
+    # A new token also revokes any link shared before
+    had_token = current_user.calendar_token is not None
+    current_user.calendar_token = secrets.token_urlsafe(32)
+    db.session.commit()
+
+    if had_token:
+        flash("Your calendar link was replaced. Update your calendar app.", "info")
+    else:
+        flash("Calendar link created. Add it to your calendar app.", "success")
+    return redirect(url_for("volunteer.my_schedule"))
+
+
+@volunteer_bp.route("/calendar/<token>.ics")
+def calendar(token):
+    """The user's shifts as an iCalendar feed; the token stands in for a login."""
+    user_id = db.session.scalar(select(User.id).where(User.calendar_token == token))
+    if user_id is None:
+        abort(404)
+
+    body, etag = calendar_feed(user_id)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(body)
+        response.mimetype = "text/calendar"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
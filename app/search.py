@@ -0,0 +1,229 @@
+import re
+
+from sqlalchemy import and_, column, event, false, func, literal_column, or_, table
+
+from app.extensions import db
+from app.models import User, Visitor
+
+# SQLite: one FTS5 table per searchable model. Its rowid is the row's id,
+# and triggers keep it in step with every write (ORM, bulk statements and
+# raw SQL alike). Matches are ranked by bm25, with names weighted highest.
+#
+# PostgreSQL: trigram GIN indexes over the same fields, so substring
+# searches use an index instead of scanning the table.
+#
+# Other databases fall back to ILIKE.
+
+_user_search = table("user_search", column("rowid"), column("rank"))
+_visitor_search = table("visitor_search", column("rowid"), column("rank"))
+
+
+def _phone_sql(col):
+    """The phone as typed plus its bare digits, so '5551234' also matches."""
+    digits = f"coalesce({col}, '')"
+    for char in "-() .+":
+        digits = f"replace({digits}, '{char}', '')"
+    return f"coalesce({col}, '') || ' ' || {digits}"
+
+
+_USER_ROW = f"new.name, new.email, {_phone_sql('new.phone_number')}"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+    "name, email, phone, tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3')",
+    "INSERT INTO user_search(user_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 5.0, 2.0)')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS visitor_search USING fts5("
+    "name, alias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO visitor_search(visitor_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 8.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, {_USER_ROW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_au
+    AFTER UPDATE OF name, email, phone_number ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, {_USER_ROW});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_ai AFTER INSERT ON visitors BEGIN
+        INSERT INTO visitor_search(rowid, name, alias)
+        VALUES (new.id, new.name, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_au
+    AFTER UPDATE OF name, alias ON visitors BEGIN
+        DELETE FROM visitor_search WHERE rowid = old.id;
+        INSERT INTO visitor_search(rowid, name, alias)
+        VALUES (new.id, new.name, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_ad AFTER DELETE ON visitors BEGIN
+        DELETE FROM visitor_search WHERE rowid = old.id;
+    END""",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS user_search_ai",
+    "DROP TRIGGER IF EXISTS user_search_au",
+    "DROP TRIGGER IF EXISTS user_search_ad",
+    "DROP TRIGGER IF EXISTS visitor_search_ai",
+    "DROP TRIGGER IF EXISTS visitor_search_au",
+    "DROP TRIGGER IF EXISTS visitor_search_ad",
+    "DROP TABLE IF EXISTS user_search",
+    "DROP TABLE IF EXISTS visitor_search",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM user_search",
+    "INSERT INTO user_search(rowid, name, email, phone) "
+    f"SELECT id, name, email, {_phone_sql('phone_number')} FROM users",
+    "DELETE FROM visitor_search",
+    "INSERT INTO visitor_search(rowid, name, alias) "
+    "SELECT id, name, alias FROM visitors",
+]
+
+# Lower-cased search documents; the queries below must use the exact same
+# expressions for PostgreSQL to pick the indexes
+_USER_DOC = (
+    "lower(coalesce(users.name, '') || ' ' || coalesce(users.email, '') "
+    "|| ' ' || coalesce(users.phone_number, ''))"
+)
+_VISITOR_DOC = (
+    "lower(coalesce(visitors.name, '') || ' ' || coalesce(visitors.alias, ''))"
+)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users "
+    f"USING gin (({_USER_DOC}) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_visitors_search_trgm ON visitors "
+    f"USING gin (({_VISITOR_DOC}) gin_trgm_ops)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS ix_users_search_trgm",
+    "DROP INDEX IF EXISTS ix_visitors_search_trgm",
+]
+
+
+def install_search_index(connection):
+    """
+    Create the search tables/indexes (and triggers) for this database.
+
+    Safe to run again; on SQLite it also repopulates the FTS tables.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statements = SQLITE_DDL + SQLITE_REBUILD
+    elif dialect == "postgresql":
+        statements = POSTGRES_DDL
+    else:
+        return
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_index(connection):
+    dialect = connection.dialect.name
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}.get(dialect)
+    for statement in statements or ():
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    # Covers db.create_all(); migrated databases get it from their revision
+    install_search_index(connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    drop_search_index(connection)
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def _fts_match(terms):
+    # Every term as a quoted prefix, so user input cannot form FTS syntax
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _like_terms(expression, terms):
+    # Terms are word characters only; "_" is the one LIKE wildcard among them
+    return and_(
+        *(
+            expression.like("%" + term.replace("_", r"\_") + "%", escape="\\")
+            for term in terms
+        )
+    )
+
+
+def _has_fts(connection):
+    return bool(
+        connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'user_search'"
+        ).scalar()
+    )
+
+
+def _search(model, query, fts_table, doc_sql, fallback_columns, order_by):
+    terms = _terms(query or "")
+    if not terms:
+        return model.query.filter(false())
+
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == "sqlite" and _has_fts(connection):
+        ranked = (
+            db.select(fts_table.c.rowid, fts_table.c.rank)
+            .where(literal_column(fts_table.name).match(_fts_match(terms)))
+            .subquery()
+        )
+        return model.query.join(ranked, model.id == ranked.c.rowid).order_by(
+            ranked.c.rank, *order_by
+        )
+
+    if dialect == "postgresql":
+        doc = literal_column(doc_sql)
+        return model.query.filter(_like_terms(doc, terms)).order_by(
+            func.similarity(doc, " ".join(terms)).desc(), *order_by
+        )
+
+    return model.query.filter(
+        and_(
+            *(
+                or_(*(col.ilike(f"%{term}%") for col in fallback_columns))
+                for term in terms
+            )
+        )
+    ).order_by(*order_by)
+
+
+def search_users(query):
+    """Users matching every word of `query` (name, email or phone), best first."""
+    return _search(
+        User,
+        query,
+        _user_search,
+        _USER_DOC,
+        (User.name, User.email, User.phone_number),
+        (User.email,),
+    )
+
+
+def search_visitors(query):
+    """Visitors matching every word of `query` (name or alias), best first."""
+    return _search(
+        Visitor,
+        query,
+        _visitor_search,
+        _VISITOR_DOC,
+        (Visitor.name, Visitor.alias),
+        (Visitor.name,),
+    )
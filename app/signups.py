@@ -0,0 +1,142 @@
+from sqlalchemy import and_, exists, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Shift, Signup
+from app.versions import SCHEDULE, shift_key, user_key
+
+# Outcomes returned by claim_shift_slot()
+SIGNUP_CREATED = "created"
+SIGNUP_DUPLICATE = "duplicate"
+SIGNUP_FULL = "full"
+
+
+def claim_shift_slot(shift_id, user_id, confirmed=False):
+    """
+    Atomically sign a user up for a shift if it still has room.
+
+    The capacity check is a conditional UPDATE on the shift's signup
+    counter, which row-locks the shift until the transaction ends, so two
+    volunteers racing for the last slot cannot both pass it. The signup row
+    is then inserted in the same transaction. Both statements bypass the
+    ORM, so the Signup mapper events do not count the new row twice.
+
+    The caller is responsible for committing. Both statements run in a
+    savepoint; on a unique constraint violation only that is rolled back,
+    so the caller's other pending work (queued emails included) is kept.
+
+    Returns one of SIGNUP_CREATED, SIGNUP_DUPLICATE or SIGNUP_FULL.
+    """
+    already_signed_up = exists().where(
+        and_(Signup.shift_id == shift_id, Signup.user_id == user_id)
+    )
+    versions = (SCHEDULE, shift_key(shift_id), user_key(user_id))
+
+    try:
+        with db.session.begin_nested():
+            claimed = db.session.execute(
+                update(Shift)
+                .where(
+                    Shift.id == shift_id,
+                    Shift.signup_count < Shift.capacity,
+                    ~already_signed_up,
+                )
+                .values(
+                    signup_count=Shift.signup_count + 1,
+                    confirmed_count=Shift.confirmed_count + (1 if confirmed else 0),
+                )
+                .execution_options(synchronize_session=False, versions=versions)
+            )
+
+            if claimed.rowcount == 1:
+                db.session.execute(
+                    insert(Signup)
+                    .values(user_id=user_id, shift_id=shift_id, confirmed=confirmed)
+                    .execution_options(versions=versions)
+                )
+    except IntegrityError:
+        # Lost a race against the same user on the (user_id, shift_id)
+        # constraint; the savepoint has been rolled back
+        return SIGNUP_DUPLICATE
+
+    if claimed.rowcount == 1:
+        _expire_counters([shift_id])
+        return SIGNUP_CREATED
+
+    # Nothing claimed: work out why (only on the failure path)
+    if db.session.query(already_signed_up).scalar():
+        return SIGNUP_DUPLICATE
+    return SIGNUP_FULL
+
+
+def _actual_counts():
+    """Subqueries counting the real signup rows for each shift."""
+    signups = (
+        select(func.count(Signup.id))
+        .where(Signup.shift_id == Shift.id)
+        .correlate(Shift)
+        .scalar_subquery()
+    )
+    confirmed = (
+        select(func.count(Signup.id))
+        .where(Signup.shift_id == Shift.id, Signup.confirmed.is_(True))
+        .correlate(Shift)
+        .scalar_subquery()
+    )
+    return signups, confirmed
+
+
+def find_counter_drift():
+    """
+    Compare the denormalized counters on every shift with the signup rows.
+
+    Returns a list of (shift_id, stored_signups, actual_signups,
+    stored_confirmed, actual_confirmed) tuples for shifts that disagree.
+    """
+    signups, confirmed = _actual_counts()
+    rows = db.session.execute(
+        select(
+            Shift.id,
+            Shift.signup_count,
+            signups,
+            Shift.confirmed_count,
+            confirmed,
+        ).where((Shift.signup_count != signups) | (Shift.confirmed_count != confirmed))
+    )
+    return [tuple(row) for row in rows]
+
+
+def refresh_shift_counters(shift_ids=None):
+    """
+    Recompute the counters from the signup rows.
+
+    Used to repair drift and after bulk statements that bypass the ORM.
+    Only the given shifts are touched when shift_ids is provided, otherwise
+    only the shifts that drifted. The caller is responsible for committing.
+    """
+    if shift_ids is None:
+        shift_ids = [row[0] for row in find_counter_drift()]
+    if not shift_ids:
+        return
+
+    signups, confirmed = _actual_counts()
+    db.session.execute(
+        update(Shift)
+        .where(Shift.id.in_(shift_ids))
+        .values(signup_count=signups, confirmed_count=confirmed)
+        # Named keys, so only the stats of these shifts' events are redone
+        .execution_options(
+            synchronize_session=False, versions=[SCHEDULE, *map(shift_key, shift_ids)]
+        )
+    )
+    _expire_counters(shift_ids)
+
+
+def _expire_counters(shift_ids):
+    """Make already loaded shifts re-read their counters on next access."""
+    mapper = inspect(Shift)
+    for shift_id in shift_ids:
+        key = mapper.identity_key_from_primary_key((shift_id,))
+        shift = db.session.identity_map.get(key)
+        if shift is not None:
+            db.session.expire(shift, ["signup_count", "confirmed_count"])
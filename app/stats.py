@@ -0,0 +1,162 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, exists, func, insert, literal, select, true
+
+from app.extensions import db
+from app.models import CheckIn, Event, NightlyStat, Shift
+from app.versions import versions_committing
+
+# The nightly_stats rollup holds one row per event, so reports read a row per
+# night instead of aggregating every check-in and shift since the start.
+# Rows are recomputed inside the transaction of any commit that touches their
+# event (see _refresh_on_commit), from the same data-version keys that
+# invalidate the cached views. Whether a guest is new depends on earlier
+# nights as well, so an edit to an old night can leave later rows stale
+# until `flask rebuild-nightly-stats` (run nightly) recomputes them all; so
+# can a bulk statement that does not name the events it touches.
+
+STAT_COLUMNS = [
+    "event_id",
+    "date",
+    "guests",
+    "new_guests",
+    "returning_guests",
+    "slots_required",
+    "slots_filled",
+    "slots_confirmed",
+    "updated_at",
+]
+
+
+def _stats_select(event_ids=None):
+    """SELECT computing the nightly_stats rows of `event_ids` (all if None)."""
+    events = Event.__table__
+    checkins = CheckIn.__table__
+    shifts = Shift.__table__
+    earlier = CheckIn.__table__.alias("earlier")
+    earlier_event = Event.__table__.alias("earlier_event")
+
+    def only(column):
+        return column.in_(event_ids) if event_ids is not None else true()
+
+    # One row per guest and night, flagged if they were in on an earlier night
+    seen_before = (
+        exists()
+        .where(
+            earlier.c.visitor_id == checkins.c.visitor_id,
+            earlier_event.c.id == earlier.c.event_id,
+            earlier_event.c.date < events.c.date,
+        )
+        .correlate(checkins, events)
+    )
+    guest_rows = (
+        select(
+            checkins.c.event_id,
+            checkins.c.visitor_id,
+            case((seen_before, 1), else_=0).label("repeat"),
+        )
+        .join(events, events.c.id == checkins.c.event_id)
+        .where(only(checkins.c.event_id))
+        .distinct()
+        .subquery()
+    )
+    guests = (
+        select(
+            guest_rows.c.event_id,
+            func.count().label("guests"),
+            func.sum(guest_rows.c.repeat).label("repeat"),
+        )
+        .group_by(guest_rows.c.event_id)
+        .subquery()
+    )
+    slots = (
+        select(
+            shifts.c.event_id,
+            func.sum(func.coalesce(shifts.c.capacity, 0)).label("required"),
+            func.sum(shifts.c.signup_count).label("filled"),
+            func.sum(shifts.c.confirmed_count).label("confirmed"),
+        )
+        .where(only(shifts.c.event_id))
+        .group_by(shifts.c.event_id)
+        .subquery()
+    )
+
+    total = func.coalesce(guests.c.guests, 0)
+    returning = func.coalesce(guests.c.repeat, 0)
+    return (
+        select(
+            events.c.id,
+            events.c.date,
+            total,
+            total - returning,
+            returning,
+            func.coalesce(slots.c.required, 0),
+            func.coalesce(slots.c.filled, 0),
+            func.coalesce(slots.c.confirmed, 0),
+            literal(datetime.utcnow(), db.DateTime),
+        )
+        .outerjoin(guests, guests.c.event_id == events.c.id)
+        .outerjoin(slots, slots.c.event_id == events.c.id)
+        .where(only(events.c.id))
+    )
+
+
+def refresh_nightly_stats(event_ids=None, connection=None):
+    """
+    Recompute the rollup rows of `event_ids` (every event if None).
+
+    Runs as one DELETE and one INSERT ... SELECT on `connection` (the
+    session's by default), so it joins the caller's transaction; events
+    that no longer exist simply lose their row.
+    """
+    if event_ids is not None:
+        event_ids = sorted(event_ids)
+        if not event_ids:
+            return
+    connection = connection or db.session.connection()
+    table = NightlyStat.__table__
+
+    statement = delete(table)
+    if event_ids is not None:
+        statement = statement.where(table.c.event_id.in_(event_ids))
+    connection.execute(statement)
+    connection.execute(
+        insert(table).from_select(STAT_COLUMNS, _stats_select(event_ids))
+    )
+
+
+def rebuild_nightly_stats(connection=None):
+    """Recompute the whole rollup from the raw history; returns the row count."""
+    connection = connection or db.session.connection()
+    refresh_nightly_stats(connection=connection)
+    return connection.execute(select(func.count()).select_from(NightlyStat)).scalar()
+
+
+@versions_committing.connect
+def _refresh_on_commit(session, connection, keys):
+    # EVENTS alone (a bulk statement that did not name its events) is left to
+    # the nightly rebuild; redoing every row would hold up the request
+    event_ids = {int(key.split(":", 1)[1]) for key in keys if key.startswith("event:")}
+    refresh_nightly_stats(event_ids, connection=connection)
+
+
+def season_totals(start=None, end=None):
+    """Sums over the rollup rows dated from `start` to `end` (either optional)."""
+    query = select(
+        func.count().label("nights"),
+        func.coalesce(func.sum(NightlyStat.guests), 0).label("guests"),
+        func.coalesce(func.sum(NightlyStat.new_guests), 0).label("new_guests"),
+        func.coalesce(func.sum(NightlyStat.returning_guests), 0).label(
+            "returning_guests"
+        ),
+        func.coalesce(func.sum(NightlyStat.slots_required), 0).label("slots_required"),
+        func.coalesce(func.sum(NightlyStat.slots_filled), 0).label("slots_filled"),
+        func.coalesce(func.sum(NightlyStat.slots_confirmed), 0).label(
+            "slots_confirmed"
+        ),
+    )
+    if start:
+        query = query.where(NightlyStat.date >= start)
+    if end:
+        query = query.where(NightlyStat.date <= end)
+    return db.session.execute(query).one()
@@ -0,0 +1,57 @@
+from sqlalchemy import and_, case, exists, or_, select
+
+from app.models import SHIFT_SLOTS, Shift, ShiftPreference, Signup, User
+
+
+def opted_in_volunteers():
+    """Team Members who take email (None on legacy accounts counts as yes)."""
+    return User.query.filter(
+        User.role == "Team Member", User.email_allowed.is_not(False)
+    )
+
+
+def shift_slot():
+    """SQL expression naming a shift's SHIFT_SLOTS key (NULL for other hours)."""
+    return case(
+        *(
+            (and_(Shift.start_time == start, Shift.end_time == end), slot)
+            for slot, (start, end) in SHIFT_SLOTS.items()
+        ),
+        else_=None,
+    )
+
+
+def open_shifts(event_ids):
+    """Shifts of the events with a slot left: capacity minus signups."""
+    return select(Shift.id).where(
+        Shift.event_id.in_(event_ids), Shift.capacity > Shift.signup_count
+    )
+
+
+def broadcast_recipients(event_ids):
+    """
+    Opted-in volunteers who could fill an open slot of the events.
+
+    Everyone already signed up for one of the events is left out, and so is
+    anyone whose stated preferences match none of the open shifts; no
+    preferences, or an open shift outside the standard slots, matches
+    anyone. One query, whatever the number of volunteers or shifts.
+    """
+    event_ids = list(event_ids)
+    open_shift = open_shifts(event_ids)
+    committed = exists().where(
+        Signup.user_id == User.id,
+        Signup.shift_id.in_(select(Shift.id).where(Shift.event_id.in_(event_ids))),
+    )
+    has_preferences = exists().where(ShiftPreference.user_id == User.id)
+    open_odd_shift = exists(open_shift.where(shift_slot().is_(None)))
+    open_preferred_shift = exists(
+        open_shift.join(ShiftPreference, ShiftPreference.slot == shift_slot()).where(
+            ShiftPreference.user_id == User.id
+        )
+    )
+    return opted_in_volunteers().filter(
+        ~committed,
+        exists(open_shift),
+        or_(~has_preferences, open_odd_shift, open_preferred_shift),
+    )
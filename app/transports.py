@@ -0,0 +1,247 @@
+import os
+import smtplib
+import socket
+import subprocess
+import threading
+import time
+
+from flask_mail import sanitize_address, sanitize_addresses
+
+from app.extensions import mail
+
+
+class TransportUnavailable(Exception):
+    """
+    Raised by send() when the transport cannot deliver any more messages.
+
+    The message it was given, and the rest of the batch, were not handed
+    off and should be tried again later rather than marked failed.
+    """
+
+
+class Transport:
+    """
+    Delivers flask_mail Messages for the email worker.
+
+    A transport is used as a context manager around one batch: send() is
+    called per message and raises if that message could not be handed
+    off; leaving the block flushes the batch and raises if the whole batch
+    was lost. Transports that only deliver on flush record per-message
+    errors in `failures`, keyed by the `key` given to send(), and set
+    `delivers_on_close`. send() raises TransportUnavailable when the rest
+    of the batch should wait.
+    """
+
+    # Nothing is delivered until close(), so no message counts as sent before
+    delivers_on_close = False
+
+    def __init__(self, app, **options):
+        self.app = app
+        self.options = options
+        self.failures = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        pass
+
+    def send(self, message, key=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# Errors meaning the connection is gone rather than the message refused
+_DISCONNECTED = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPTransport(Transport):
+    """
+    Flask-Mail SMTP, reusing one connection for the whole batch.
+
+    The connection is only made by the first send(), so an idle worker
+    never talks to the relay. Servers drop long-lived connections (idle
+    timeouts, a cap on messages per connection), so a message that meets
+    a dropped connection is sent again once over a new one. When the
+    relay cannot be reached, or the retry fails too, TransportUnavailable
+    leaves the rest of the batch for later.
+    """
+
+    def open(self):
+        self.connection = None
+
+    def _connect(self):
+        connection = mail.connect()
+        try:
+            connection.__enter__()
+        except OSError as e:
+            # Refused, unreachable, TLS or login errors (SMTPException
+            # included): the relay is at fault, not the message
+            raise TransportUnavailable(str(e) or type(e).__name__) from e
+        self.connection = connection
+
+    def send(self, message, key=None):
+        if self.connection is None:
+            self._connect()
+        try:
+            self.connection.send(message)
+        except _DISCONNECTED:
+            self.close()
+            self._connect()
+            try:
+                self.connection.send(message)
+            except _DISCONNECTED as e:
+                raise TransportUnavailable(str(e) or type(e).__name__) from e
+
+    def close(self):
+        if self.connection is None:
+            return
+        # Every message was already accepted, so a failed QUIT is not a
+        # reason to send the batch again
+        try:
+            self.connection.__exit__(None, None, None)
+        except Exception as e:
+            print(f"Email Worker: Error closing SMTP connection: {e}")
+        self.connection = None
+
+
+class SendmailTransport(Transport):
+    """Pipe each message to the local MTA's sendmail binary."""
+
+    def send(self, message, key=None):
+        subprocess.run(
+            [
+                self.app.config["MAIL_SENDMAIL_PATH"],
+                "-oi",
+                "-f",
+                sanitize_address(message.sender),
+                "--",
+                *sanitize_addresses(message.send_to),
+            ],
+            input=message.as_bytes(),
+            check=True,
+            capture_output=True,
+            timeout=30,
+        )
+
+
+class MaildirTransport(Transport):
+    """
+    Spool messages into a Maildir for a local MTA to pick up.
+
+    Messages are written to tmp/ without syncing, the batch is flushed to
+    disk with a single sync, and only then moved into new/, so a crash can
+    leave stray files in tmp/ but never a truncated message in new/.
+    """
+
+    delivers_on_close = True
+
+    def open(self):
+        self.root = self.options.get("spool_dir") or self.app.config["MAIL_SPOOL_DIR"]
+        for sub in ("tmp", "new", "cur"):
+            os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+        self.pending = []
+        self.prefix = f"{int(time.time())}.P{os.getpid()}Q"
+        self.host = socket.gethostname().replace("/", "\\057").replace(":", "\\072")
+
+    def send(self, message, key=None):
+        name = f"{self.prefix}{len(self.pending)}M{time.monotonic_ns()}.{self.host}"
+        path = os.path.join(self.root, "tmp", name)
+        with open(path, "wb") as f:
+            f.write(message.as_bytes())
+        self.pending.append(name)
+
+    def close(self):
+        if not self.pending:
+            return
+        if hasattr(os, "sync"):
+            os.sync()
+        else:
+            for name in self.pending:
+                fd = os.open(os.path.join(self.root, "tmp", name), os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        for name in self.pending:
+            os.rename(
+                os.path.join(self.root, "tmp", name),
+                os.path.join(self.root, "new", name),
+            )
+        self.pending = []
+
+
+class NullTransport(Transport):
+    """Render and discard; used for benchmarks and dry runs."""
+
+    sent = 0
+
+    def send(self, message, key=None):
+        message.as_bytes()
+        self.sent += 1
+
+
+class AsyncSMTPTransport(Transport):
+    """
+    Send a whole batch concurrently over the process-wide async SMTP pool.
+
+    Messages are collected by send() and delivered when the batch closes,
+    so failures are reported through `failures` rather than raised.
+    """
+
+    delivers_on_close = True
+
+    def open(self):
+        self.pending = []
+
+    def send(self, message, key=None):
+        self.pending.append((key, message))
+
+    def close(self):
+        if not self.pending:
+            return
+        results = smtp_pool(self.app).send_many([m for _, m in self.pending])
+        for (key, _), error in zip(self.pending, results):
+            if error is not None:
+                self.failures[key] = error
+        self.pending = []
+
+
+_pool_lock = threading.Lock()
+
+
+def smtp_pool(app):
+    """The app's shared AsyncSMTPPool, started on first use."""
+    with _pool_lock:
+        pool = app.extensions.get("async_smtp_pool")
+        if pool is None:
+            from app.async_smtp import AsyncSMTPPool
+
+            pool = app.extensions["async_smtp_pool"] = AsyncSMTPPool(app.config)
+        return pool
+
+
+TRANSPORTS = {
+    "smtp": SMTPTransport,
+    "async_smtp": AsyncSMTPTransport,
+    "sendmail": SendmailTransport,
+    "maildir": MaildirTransport,
+    "null": NullTransport,
+}
+
+
+def get_transport(app, name=None, **options):
+    """Instantiate the transport named by MAIL_TRANSPORT (or `name`)."""
+    name = (name or app.config.get("MAIL_TRANSPORT") or "smtp").lower()
+    try:
+        return TRANSPORTS[name](app, **options)
+    except KeyError:
+        raise ValueError(
+            f"Unknown MAIL_TRANSPORT {name!r}; choose from {', '.join(TRANSPORTS)}"
+        ) from None
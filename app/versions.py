@@ -0,0 +1,252 @@
+import threading
+import time
+
+from blinker import Namespace
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import (
+    CheckIn,
+    DataVersion,
+    Event,
+    Shift,
+    ShiftPreference,
+    Signup,
+    User,
+    Visitor,
+)
+
+# Bumped on any write to the schedule: events, their shifts and signups
+SCHEDULE = "schedule"
+# Bumped by bulk statements that cannot be attributed to a single event
+EVENTS = "events"
+USERS = "users"
+VISITORS = "visitors"
+
+_signals = Namespace()
+# Sent by the app after a commit, with the set of keys that commit bumped
+versions_bumped = _signals.signal("versions-bumped")
+# Sent by the session just before it commits, with the keys about to be
+# bumped and the connection of the transaction, for work that must commit
+# along with the change (see app.stats)
+versions_committing = _signals.signal("versions-committing")
+
+
+def event_key(event_id):
+    return f"event:{event_id}"
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def shift_key(shift_id):
+    """Stands for the shift's event key; resolved when the session commits."""
+    return f"shift:{shift_id}"
+
+
+def _mirror():
+    """Per-app copy of recently read versions."""
+    return current_app.extensions.setdefault(
+        "data_versions", {"values": {}, "lock": threading.Lock()}
+    )
+
+
+def data_versions(*keys):
+    """
+    Current versions of `keys` (0 for keys never bumped), as a tuple.
+
+    Versions are mirrored per process for DATA_VERSION_TTL seconds, so a
+    warm lookup costs no query. Commits in this process drop the keys they
+    bump straight away; the TTL only bounds how long a write made by
+    another process can go unnoticed.
+    """
+    mirror = _mirror()
+    ttl = current_app.config.get("DATA_VERSION_TTL", 2)
+    now = time.monotonic()
+    values = mirror["values"]
+
+    with mirror["lock"]:
+        cached = {key: values.get(key) for key in keys}
+    missing = [
+        key for key, entry in cached.items() if entry is None or now - entry[1] >= ttl
+    ]
+
+    if missing:
+        found = dict(
+            db.session.execute(
+                select(DataVersion.key, DataVersion.version).where(
+                    DataVersion.key.in_(missing)
+                )
+            ).all()
+        )
+        with mirror["lock"]:
+            for key in missing:
+                cached[key] = values[key] = (found.get(key, 0), now)
+
+    return tuple(cached[key][0] for key in keys)
+
+
+def data_version(key):
+    """Current version of a single key (see data_versions)."""
+    return data_versions(key)[0]
+
+
+def _forget(keys):
+    mirror = _mirror()
+    with mirror["lock"]:
+        for key in keys:
+            mirror["values"].pop(key, None)
+
+
+def touch(*keys):
+    """Mark keys as changed; they are bumped when the session commits."""
+    _touched(db.session()).update(keys)
+
+
+def _touched(session):
+    return session.info.setdefault("touched_versions", set())
+
+
+def _previous(obj, attr):
+    """Value an attribute had before this flush (or its current value)."""
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+
+def _keys_for_object(obj):
+    if isinstance(obj, Event):
+        return {SCHEDULE, event_key(obj.id)}
+    if isinstance(obj, Shift):
+        return {
+            SCHEDULE,
+            event_key(obj.event_id),
+            event_key(_previous(obj, "event_id")),
+        }
+    if isinstance(obj, Signup):
+        return {
+            SCHEDULE,
+            shift_key(obj.shift_id),
+            shift_key(_previous(obj, "shift_id")),
+            user_key(obj.user_id),
+        }
+    if isinstance(obj, CheckIn):
+        return {event_key(obj.event_id)}
+    if isinstance(obj, User):
+        return {USERS, user_key(obj.id)}
+    if isinstance(obj, ShiftPreference):
+        return {USERS, user_key(obj.user_id)}
+    if isinstance(obj, Visitor):
+        return {VISITORS}
+    return set()
+
+
+def _keys_for_bulk(cls):
+    """Coarse keys for a bulk statement that did not name its own."""
+    if issubclass(cls, (Event, Shift, Signup)):
+        return {SCHEDULE, EVENTS}
+    if issubclass(cls, CheckIn):
+        return {EVENTS}
+    if issubclass(cls, (User, ShiftPreference)):
+        return {USERS}
+    if issubclass(cls, Visitor):
+        return {VISITORS}
+    return set()
+
+
+def _bump(connection, keys):
+    """Increment `keys` (in order), in one executemany where upserts exist."""
+    table = DataVersion.__table__
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        connection.execute(
+            insert(table).on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"version": table.c.version + 1},
+            ),
+            [{"key": key, "version": 1} for key in keys],
+        )
+        return
+
+    for key in keys:
+        result = connection.execute(
+            update(table).where(table.c.key == key).values(version=table.c.version + 1)
+        )
+        if not result.rowcount:
+            connection.execute(table.insert().values(key=key, version=1))
+
+
+def _resolve_shift_keys(connection, keys):
+    """Replace shift:<id> placeholders by the keys of their events."""
+    shift_ids = {int(k.split(":", 1)[1]) for k in keys if k.startswith("shift:")}
+    keys = {k for k in keys if not k.startswith("shift:")}
+    if shift_ids:
+        shifts = Shift.__table__
+        event_ids = connection.execute(
+            select(shifts.c.event_id).where(shifts.c.id.in_(shift_ids)).distinct()
+        ).scalars()
+        keys.update(event_key(event_id) for event_id in event_ids)
+    return keys
+
+
+@event.listens_for(Session, "after_flush")
+def _versions_after_flush(session, flush_context):
+    keys = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        keys |= _keys_for_object(obj)
+    if keys:
+        _touched(session).update(keys)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _versions_on_dml(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush; they can name
+    # the keys they affect with .execution_options(versions=[...])
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+
+    keys = orm_execute_state.execution_options.get("versions")
+    if keys is None:
+        mapper = orm_execute_state.bind_mapper
+        keys = _keys_for_bulk(mapper.class_) if mapper is not None else ()
+    if keys:
+        _touched(orm_execute_state.session).update(keys)
+
+
+@event.listens_for(Session, "before_commit")
+def _versions_before_commit(session):
+    # Flush first so the changes it makes are seen by after_flush
+    session.flush()
+    keys = session.info.pop("touched_versions", None)
+    if keys:
+        connection = session.connection()
+        keys = _resolve_shift_keys(connection, keys)
+        versions_committing.send(session, connection=connection, keys=keys)
+        _bump(connection, sorted(keys))
+        session.info["bumped_versions"] = keys
+
+
+@event.listens_for(Session, "after_commit")
+def _versions_after_commit(session):
+    keys = session.info.pop("bumped_versions", None)
+    if keys and has_app_context():
+        _forget(keys)
+        versions_bumped.send(current_app._get_current_object(), keys=keys)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _versions_after_rollback(session, previous_transaction):
+    if previous_transaction.nested:
+        # Keys touched before the savepoint still commit; the ones touched
+        # inside it are kept too, at worst bumping a version needlessly
+        return
+    session.info.pop("touched_versions", None)
+    session.info.pop("bumped_versions", None)
@@ -1,4 +1,5 @@
 import requests
+import time
 from datetime import datetime, timedelta
 import logging
 
@@ -9,9 +10,26 @@ def get_weather_forecast():
     """
     Fetches 14-day weather forecast for Montpelier, VT (05602).
     Returns a list of dicts: {'date': date_obj, 'high': int, 'low': int}
+
+    A successful fetch is kept for WEATHER_CACHE_SECONDS, so the calendar
+    and the activation planner share one request to the API.
     """
     from flask import current_app
 
+    cached = current_app.extensions.get("weather_forecast")
+    max_age = current_app.config.get("WEATHER_CACHE_SECONDS", 0)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+
+    forecast = _fetch_forecast()
+    if forecast:
+        current_app.extensions["weather_forecast"] = (time.monotonic(), forecast)
+    return forecast
+
+
+def _fetch_forecast():
+    from flask import current_app
+
     # Montpelier, VT specific coordinates
     LAT = current_app.config["WEATHER_LAT"]
     LON = current_app.config["WEATHER_LON"]
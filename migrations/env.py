@@ -43,6 +43,23 @@ target_db = current_app.extensions["migrate"].db
 # ... etc.
 
 
+# The search index is raw DDL outside the models (see app.search): FTS5
+# tables on SQLite, trigram indexes on PostgreSQL. Autogenerate must not
+# mistake them for leftovers to drop.
+SEARCH_TABLE_PREFIXES = ("user_search", "visitor_search")
+SEARCH_INDEXES = ("ix_users_search_trgm", "ix_visitors_search_trgm")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == "table":
+        return not name.startswith(SEARCH_TABLE_PREFIXES)
+    if type_ == "index":
+        return name not in SEARCH_INDEXES
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, "metadatas"):
         return target_db.metadatas[None]
@@ -62,7 +79,12 @@ def run_migrations_offline():
 
     """
     url = config.get_main_option("sqlalchemy.url")
-    context.configure(url=url, target_metadata=get_metadata(), literal_binds=True)
+    context.configure(
+        url=url,
+        target_metadata=get_metadata(),
+        literal_binds=True,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -89,6 +111,7 @@ def run_migrations_online():
     conf_args = current_app.extensions["migrate"].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
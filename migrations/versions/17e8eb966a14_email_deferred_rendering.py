@@ -0,0 +1,28 @@
+"""Deferred email rendering
+
+Revision ID: 17e8eb966a14
+Revises: bc1bfca768dc
+Create Date: 2026-10-19 12:41:08.557210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '17e8eb966a14'
+down_revision = 'bc1bfca768dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('context', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.drop_column('context')
+        batch_op.drop_column('template')
@@ -0,0 +1,107 @@
+"""Full-text search index for users and visitors
+
+Revision ID: 3a61f8e9b4c2
+Revises: 9e4b7c21d0a8
+Create Date: 2026-10-19 22:04:11.318240
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3a61f8e9b4c2'
+down_revision = '9e4b7c21d0a8'
+branch_labels = None
+depends_on = None
+
+# The DDL as of this revision, kept here so later changes to app.search
+# do not change what this migration does
+
+USER_PHONE = (
+    "coalesce(phone_number, '') || ' ' || "
+    "replace(replace(replace(replace(replace(replace(coalesce(phone_number, ''), "
+    "'-', ''), '(', ''), ')', ''), ' ', ''), '.', ''), '+', '')"
+)
+NEW_USER_PHONE = USER_PHONE.replace('phone_number', 'new.phone_number')
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+    "name, email, phone, tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3')",
+    "INSERT INTO user_search(user_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 5.0, 2.0)')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS visitor_search USING fts5("
+    "name, alias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO visitor_search(visitor_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 8.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, {NEW_USER_PHONE});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_au
+    AFTER UPDATE OF name, email, phone_number ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, {NEW_USER_PHONE});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_ai AFTER INSERT ON visitors BEGIN
+        INSERT INTO visitor_search(rowid, name, alias)
+        VALUES (new.id, new.name, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_au
+    AFTER UPDATE OF name, alias ON visitors BEGIN
+        DELETE FROM visitor_search WHERE rowid = old.id;
+        INSERT INTO visitor_search(rowid, name, alias)
+        VALUES (new.id, new.name, new.alias);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS visitor_search_ad AFTER DELETE ON visitors BEGIN
+        DELETE FROM visitor_search WHERE rowid = old.id;
+    END""",
+    "INSERT INTO user_search(rowid, name, email, phone) "
+    f"SELECT id, name, email, {USER_PHONE} FROM users",
+    "INSERT INTO visitor_search(rowid, name, alias) "
+    "SELECT id, name, alias FROM visitors",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS user_search_ai",
+    "DROP TRIGGER IF EXISTS user_search_au",
+    "DROP TRIGGER IF EXISTS user_search_ad",
+    "DROP TRIGGER IF EXISTS visitor_search_ai",
+    "DROP TRIGGER IF EXISTS visitor_search_au",
+    "DROP TRIGGER IF EXISTS visitor_search_ad",
+    "DROP TABLE IF EXISTS user_search",
+    "DROP TABLE IF EXISTS visitor_search",
+]
+
+POSTGRES_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin (("
+    "lower(coalesce(users.name, '') || ' ' || coalesce(users.email, '') "
+    "|| ' ' || coalesce(users.phone_number, ''))) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_visitors_search_trgm ON visitors USING gin (("
+    "lower(coalesce(visitors.name, '') || ' ' || coalesce(visitors.alias, '')))"
+    " gin_trgm_ops)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_users_search_trgm",
+    "DROP INDEX IF EXISTS ix_visitors_search_trgm",
+]
+
+
+def _run(statements):
+    for statement in statements.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
+
+
+def upgrade():
+    # SQLite: FTS5 tables plus sync triggers; PostgreSQL: trigram indexes
+    _run({'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE})
+
+
+def downgrade():
+    _run({'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE})
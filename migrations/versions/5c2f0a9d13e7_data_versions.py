@@ -0,0 +1,28 @@
+"""Data version counters for cached views
+
+Revision ID: 5c2f0a9d13e7
+Revises: 17e8eb966a14
+Create Date: 2026-10-19 19:48:22.104318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2f0a9d13e7'
+down_revision = '17e8eb966a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
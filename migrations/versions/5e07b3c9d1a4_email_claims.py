@@ -0,0 +1,29 @@
+"""Emails claimed by a worker before sending
+
+Revision ID: 5e07b3c9d1a4
+Revises: a8d3e61f2c90
+Create Date: 2026-10-20 09:12:37.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e07b3c9d1a4'
+down_revision = 'a8d3e61f2c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Without claims, anything mid-send goes back to the queue
+    op.execute(sa.text("UPDATE emails SET status = 'pending' WHERE status = 'sending'"))
+
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
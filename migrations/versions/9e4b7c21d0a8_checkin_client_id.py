@@ -0,0 +1,28 @@
+"""Kiosk client ids on check-ins
+
+Revision ID: 9e4b7c21d0a8
+Revises: 5c2f0a9d13e7
+Create Date: 2026-10-19 21:12:40.551093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7c21d0a8'
+down_revision = '5c2f0a9d13e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checkins', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_id', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_checkins_client_id', ['client_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('checkins', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_checkins_client_id', type_='unique')
+        batch_op.drop_column('client_id')
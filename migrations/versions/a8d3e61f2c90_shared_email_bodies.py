@@ -0,0 +1,162 @@
+"""Email bodies stored once in email_bodies
+
+Revision ID: a8d3e61f2c90
+Revises: f47a1c9e5b02
+Create Date: 2026-10-20 01:04:51.337120
+
+"""
+import hashlib
+import json
+import re
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e61f2c90'
+down_revision = 'f47a1c9e5b02'
+branch_labels = None
+depends_on = None
+
+# Emails moved per round trip, so a large table is never held in memory
+BATCH_SIZE = 1000
+
+emails = sa.table(
+    'emails',
+    sa.column('id', sa.Integer),
+    sa.column('body_text', sa.Text),
+    sa.column('body_html', sa.Text),
+    sa.column('body_digest', sa.String),
+    sa.column('substitutions', sa.Text),
+)
+bodies = sa.table(
+    'email_bodies',
+    sa.column('digest', sa.String),
+    sa.column('text_z', sa.LargeBinary),
+    sa.column('html_z', sa.LargeBinary),
+)
+
+# Digest, compression and placeholder format as of this revision; later
+# changes to app.email must not change what this migration writes
+
+PLACEHOLDER = re.compile(r'\{\{ (\w+) \}\}')
+
+
+def body_digest(text, html):
+    return hashlib.sha256(json.dumps([text, html]).encode()).hexdigest()
+
+
+def compress(body):
+    return None if body is None else zlib.compress(body.encode())
+
+
+def decompress(data):
+    return None if data is None else zlib.decompress(data).decode()
+
+
+def fill_placeholders(body, substitutions):
+    if not body or not substitutions:
+        return body
+    return PLACEHOLDER.sub(
+        lambda match: substitutions.get(match.group(1), match.group(0)), body
+    )
+
+
+def store_email_bodies(bind, pairs):
+    """Insert {digest: (text, html)}, leaving digests already stored alone."""
+    rows = [
+        {'digest': digest, 'text_z': compress(text), 'html_z': compress(html)}
+        for digest, (text, html) in pairs.items()
+    ]
+    dialect = bind.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        bind.execute(
+            dialect_insert(bodies).on_conflict_do_nothing(index_elements=['digest']),
+            rows,
+        )
+        return
+    stored = set(bind.execute(
+        sa.select(bodies.c.digest).where(bodies.c.digest.in_(list(pairs)))
+    ).scalars())
+    rows = [row for row in rows if row['digest'] not in stored]
+    if rows:
+        bind.execute(bodies.insert(), rows)
+
+
+def _batches(bind, query):
+    """Rows of `query` (ordered by emails.id) in BATCH_SIZE slices."""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            query.where(emails.c.id > last_id).order_by(emails.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.create_table('email_bodies',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('text_z', sa.LargeBinary(), nullable=True),
+    sa.Column('html_z', sa.LargeBinary(), nullable=True),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('body_digest', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('substitutions', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_emails_body_digest'), ['body_digest'], unique=False)
+        batch_op.create_foreign_key('fk_emails_body_digest', 'email_bodies', ['body_digest'], ['digest'])
+
+    bind = op.get_bind()
+    stored = sa.select(emails.c.id, emails.c.body_text, emails.c.body_html).where(
+        sa.or_(emails.c.body_text.is_not(None), emails.c.body_html.is_not(None))
+    )
+    for rows in _batches(bind, stored):
+        digests = {row.id: body_digest(row.body_text, row.body_html) for row in rows}
+        store_email_bodies(bind, {
+            digests[row.id]: (row.body_text, row.body_html) for row in rows
+        })
+        bind.execute(
+            emails.update()
+            .where(emails.c.id == sa.bindparam('email_id'))
+            .values(body_digest=sa.bindparam('digest'), body_text=None, body_html=None),
+            [{'email_id': email_id, 'digest': digest} for email_id, digest in digests.items()],
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    shared = (
+        sa.select(emails.c.id, emails.c.substitutions, bodies.c.text_z, bodies.c.html_z)
+        .join(bodies, bodies.c.digest == emails.c.body_digest)
+    )
+    for rows in _batches(bind, shared):
+        restored = []
+        for row in rows:
+            substitutions = json.loads(row.substitutions or '{}')
+            text, html = decompress(row.text_z), decompress(row.html_z)
+            restored.append({
+                'email_id': row.id,
+                'text': fill_placeholders(text, substitutions),
+                'html': fill_placeholders(html, substitutions),
+            })
+        bind.execute(
+            emails.update()
+            .where(emails.c.id == sa.bindparam('email_id'))
+            .values(body_text=sa.bindparam('text'), body_html=sa.bindparam('html')),
+            restored,
+        )
+
+    with op.batch_alter_table('emails', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_emails_body_digest', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_emails_body_digest'))
+        batch_op.drop_column('substitutions')
+        batch_op.drop_column('body_digest')
+
+    op.drop_table('email_bodies')
@@ -0,0 +1,35 @@
+"""Unique signup per user and shift
+
+Revision ID: acce8e4da5bc
+Revises: d434dbd7e0b6
+Create Date: 2026-10-19 09:12:41.215803
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'acce8e4da5bc'
+down_revision = 'd434dbd7e0b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate signups left over from the racy check-then-insert path,
+    # keeping the oldest row for each (user_id, shift_id) pair
+    op.execute(
+        sa.text(
+            "DELETE FROM signups WHERE id NOT IN ("
+            "SELECT MIN(id) FROM signups GROUP BY user_id, shift_id)"
+        )
+    )
+
+    with op.batch_alter_table('signups', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_signups_user_shift', ['user_id', 'shift_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('signups', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_signups_user_shift', type_='unique')
@@ -0,0 +1,39 @@
+"""Denormalized signup counters on shifts
+
+Revision ID: b738970f8b85
+Revises: acce8e4da5bc
+Create Date: 2026-10-19 10:03:17.482911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b738970f8b85'
+down_revision = 'acce8e4da5bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('signup_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('confirmed_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing signup rows
+    op.execute(
+        sa.text(
+            "UPDATE shifts SET "
+            "signup_count = (SELECT COUNT(*) FROM signups "
+            "WHERE signups.shift_id = shifts.id), "
+            "confirmed_count = (SELECT COUNT(*) FROM signups "
+            "WHERE signups.shift_id = shifts.id AND signups.confirmed = :confirmed)"
+        ).bindparams(confirmed=True)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.drop_column('confirmed_count')
+        batch_op.drop_column('signup_count')
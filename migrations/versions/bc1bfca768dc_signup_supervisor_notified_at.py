@@ -0,0 +1,36 @@
+"""Track supervisor notification per signup
+
+Revision ID: bc1bfca768dc
+Revises: b738970f8b85
+Create Date: 2026-10-19 11:26:54.309127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bc1bfca768dc'
+down_revision = 'b738970f8b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('signups', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('supervisor_notified_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_signups_supervisor_notified_at'), ['supervisor_notified_at'], unique=False)
+
+    # Existing signups were already announced by the per-signup emails
+    op.execute(
+        sa.text(
+            "UPDATE signups SET supervisor_notified_at = "
+            "COALESCE(created_at, CURRENT_TIMESTAMP)"
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('signups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_signups_supervisor_notified_at'))
+        batch_op.drop_column('supervisor_notified_at')
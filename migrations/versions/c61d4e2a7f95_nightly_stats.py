@@ -0,0 +1,90 @@
+"""Nightly occupancy and staffing rollup
+
+Revision ID: c61d4e2a7f95
+Revises: 3a61f8e9b4c2
+Create Date: 2026-10-19 23:02:51.774512
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c61d4e2a7f95'
+down_revision = '3a61f8e9b4c2'
+branch_labels = None
+depends_on = None
+
+# The rollup as app.stats computed it at this revision, frozen here
+BACKFILL = """
+INSERT INTO nightly_stats (event_id, date, guests, new_guests, returning_guests,
+                           slots_required, slots_filled, slots_confirmed, updated_at)
+SELECT events.id, events.date,
+       coalesce(guests.guests, 0),
+       coalesce(guests.guests, 0) - coalesce(guests.repeat_guests, 0),
+       coalesce(guests.repeat_guests, 0),
+       coalesce(slots.required, 0),
+       coalesce(slots.filled, 0),
+       coalesce(slots.confirmed, 0),
+       :now
+FROM events
+LEFT OUTER JOIN (
+    SELECT guest_rows.event_id, count(*) AS guests,
+           sum(guest_rows.seen_before) AS repeat_guests
+    FROM (
+        SELECT DISTINCT checkins.event_id, checkins.visitor_id,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM checkins AS earlier
+                   JOIN events AS earlier_event ON earlier_event.id = earlier.event_id
+                   WHERE earlier.visitor_id = checkins.visitor_id
+                     AND earlier_event.date < events.date
+               ) THEN 1 ELSE 0 END AS seen_before
+        FROM checkins JOIN events ON events.id = checkins.event_id
+    ) AS guest_rows
+    GROUP BY guest_rows.event_id
+) AS guests ON guests.event_id = events.id
+LEFT OUTER JOIN (
+    SELECT shifts.event_id,
+           sum(coalesce(shifts.capacity, 0)) AS required,
+           sum(shifts.signup_count) AS filled,
+           sum(shifts.confirmed_count) AS confirmed
+    FROM shifts
+    GROUP BY shifts.event_id
+) AS slots ON slots.event_id = events.id
+"""
+
+
+def upgrade():
+    op.create_table('nightly_stats',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('guests', sa.Integer(), nullable=False),
+    sa.Column('new_guests', sa.Integer(), nullable=False),
+    sa.Column('returning_guests', sa.Integer(), nullable=False),
+    sa.Column('slots_required', sa.Integer(), nullable=False),
+    sa.Column('slots_filled', sa.Integer(), nullable=False),
+    sa.Column('slots_confirmed', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    with op.batch_alter_table('nightly_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_nightly_stats_date'), ['date'], unique=False)
+
+    with op.batch_alter_table('checkins', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_checkins_visitor_id'), ['visitor_id'], unique=False)
+
+    # Backfill from the existing history
+    op.get_bind().execute(sa.text(BACKFILL), {'now': datetime.utcnow()})
+
+
+def downgrade():
+    with op.batch_alter_table('checkins', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_checkins_visitor_id'))
+
+    with op.batch_alter_table('nightly_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_nightly_stats_date'))
+
+    op.drop_table('nightly_stats')
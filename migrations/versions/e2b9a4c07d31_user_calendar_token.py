@@ -0,0 +1,28 @@
+"""Calendar feed tokens for users
+
+Revision ID: e2b9a4c07d31
+Revises: c61d4e2a7f95
+Create Date: 2026-10-19 23:41:07.239810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b9a4c07d31'
+down_revision = 'c61d4e2a7f95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('calendar_token', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_calendar_token'), ['calendar_token'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_calendar_token'))
+        batch_op.drop_column('calendar_token')
@@ -0,0 +1,99 @@
+"""Shift preferences in their own table
+
+Revision ID: f47a1c9e5b02
+Revises: e2b9a4c07d31
+Create Date: 2026-10-20 00:12:36.580214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f47a1c9e5b02'
+down_revision = 'e2b9a4c07d31'
+branch_labels = None
+depends_on = None
+
+# Rebuilding users on SQLite drops its search triggers (see revision
+# 3a61f8e9b4c2); they are recreated as they stood then. The FTS rows are
+# keyed by user id, which the rebuild keeps, so they stay valid.
+USER_PHONE = (
+    "coalesce(new.phone_number, '') || ' ' || "
+    "replace(replace(replace(replace(replace(replace(coalesce(new.phone_number, ''), "
+    "'-', ''), '(', ''), ')', ''), ' ', ''), '.', ''), '+', '')"
+)
+USER_SEARCH_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, {USER_PHONE});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_search_au
+    AFTER UPDATE OF name, email, phone_number ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+        INSERT INTO user_search(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, {USER_PHONE});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM user_search WHERE rowid = old.id;
+    END""",
+]
+
+
+def restore_search_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in USER_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    preferences = op.create_table('shift_preferences',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('slot', sa.String(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'slot')
+    )
+    with op.batch_alter_table('shift_preferences', schema=None) as batch_op:
+        batch_op.create_index('ix_shift_preferences_slot_user', ['slot', 'user_id'], unique=False)
+
+    # Split the comma-joined strings into one row per slot
+    users = sa.table('users', sa.column('id'), sa.column('shift_preference'))
+    rows = op.get_bind().execute(
+        sa.select(users.c.id, users.c.shift_preference).where(
+            users.c.shift_preference.is_not(None)
+        )
+    )
+    op.bulk_insert(preferences, [
+        {'user_id': user_id, 'slot': slot}
+        for user_id, value in rows
+        for slot in sorted({part.strip() for part in value.split(',') if part.strip()})
+    ])
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('shift_preference')
+
+    restore_search_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shift_preference', sa.String(length=50), nullable=True))
+
+    bind = op.get_bind()
+    preferences = sa.table('shift_preferences', sa.column('user_id'), sa.column('slot'))
+    joined = {}
+    for user_id, slot in bind.execute(
+        sa.select(preferences.c.user_id, preferences.c.slot).order_by(preferences.c.slot)
+    ):
+        joined.setdefault(user_id, []).append(slot)
+    users = sa.table('users', sa.column('id'), sa.column('shift_preference'))
+    for user_id, slots in joined.items():
+        bind.execute(
+            users.update().where(users.c.id == user_id).values(shift_preference=','.join(slots))
+        )
+
+    with op.batch_alter_table('shift_preferences', schema=None) as batch_op:
+        batch_op.drop_index('ix_shift_preferences_slot_user')
+
+    op.drop_table('shift_preferences')
+    restore_search_triggers()
@@ -21,6 +21,22 @@ def app():
         db.drop_all()
 
 
+@pytest.fixture
+def file_app(tmp_path):
+    """App backed by an on-disk SQLite file so threads share one database."""
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(tmp_path / "race.db")
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30}}
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
 @pytest.fixture
 def client(app):
     return app.test_client()
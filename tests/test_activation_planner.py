@@ -0,0 +1,106 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+from flask import g
+
+from app.activation import propose_activations
+from app.email import render_email_bodies
+from app.models import Email, Event, Shift, User, db
+from app.weather import get_weather_forecast
+
+TODAY = date.today()
+
+
+def night(days, high, low):
+    return {"date": TODAY + timedelta(days=days), "high": high, "low": low}
+
+
+@pytest.fixture
+def forecast(app):
+    series = [
+        night(-1, 5, -10),
+        night(0, 30, 15),
+        night(1, 20, 5),
+        night(2, 12, 8),
+        night(3, 40, 25),
+    ]
+    # Seed the cache the planner reads, as a fetch from the API would
+    app.extensions["weather_forecast"] = (time.monotonic(), series)
+    return series
+
+
+def test_cached_forecast_is_reused(app, forecast):
+    assert get_weather_forecast() is forecast
+
+
+def test_proposals_meet_thresholds(app, forecast):
+    existing = Event(date=TODAY + timedelta(days=2), status="active")
+    db.session.add(existing)
+    db.session.commit()
+
+    # Past nights are never proposed
+    proposals = propose_activations()
+    assert [p.date for p in proposals] == [TODAY + timedelta(days=i) for i in (1, 2)]
+    assert proposals[0].reasons == ["Low 5° (below 10°)"]
+    assert proposals[0].event_id is None
+    assert (proposals[1].event_id, proposals[1].status) == (existing.id, "active")
+
+    app.config["ACTIVATION_HIGH_BELOW"] = 32
+    proposals = propose_activations()
+    assert [p.date for p in proposals] == [TODAY + timedelta(days=i) for i in (0, 1, 2)]
+    assert proposals[1].reasons == ["Low 5° (below 10°)", "High 20° (below 32°)"]
+
+
+def test_create_and_broadcast(client, app, forecast):
+    admin = User(email="planner@test.com", role="Shelter Supervisor")
+    volunteers = [
+        User(email=f"vol{i}@test.com", name=f"Vol {i}", role="Team Member")
+        for i in range(2)
+    ]
+    db.session.add_all([admin, *volunteers])
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    page = client.get("/admin/events/activations").get_data(as_text=True)
+    assert "Low 8° (below 10°)" in page
+    assert page.count('name="dates"') == 2
+
+    nights = [(TODAY + timedelta(days=i)).isoformat() for i in (1, 2)]
+    resp = client.post(
+        "/admin/events/activations",
+        data={"dates": nights, "action": "broadcast"},
+        follow_redirects=True,
+    )
+    assert b"Created 2 planned event(s). Broadcast sent to 2 volunteers." in resp.data
+
+    assert {e.status for e in Event.query} == {"planned"}
+    assert Shift.query.count() == 6
+    # One email per volunteer covering both nights
+    emails = Email.query.order_by(Email.recipient).all()
+    assert [e.recipient for e in emails] == ["vol0@test.com", "vol1@test.com"]
+    first = (TODAY + timedelta(days=1)).strftime("%B %d, %Y")
+    body_text, _ = render_email_bodies(emails[0])
+    assert f"activating the shelter for {first} and " in body_text
+
+    # Running it again creates nothing new
+    resp = client.post(
+        "/admin/events/activations",
+        data={"dates": nights, "action": "create"},
+        follow_redirects=True,
+    )
+    assert b"Created 0 planned event(s)." in resp.data
+    assert Event.query.count() == 2
+
+
+def test_plan_activations_command(runner, forecast):
+    result = runner.invoke(args=["plan-activations"])
+    assert "2 night(s) meet the activation thresholds." in result.output
+    assert Event.query.count() == 0
+
+    result = runner.invoke(args=["plan-activations", "--create"])
+    assert "Created 2 planned event(s)." in result.output
+    assert Event.query.count() == 2
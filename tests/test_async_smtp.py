@@ -0,0 +1,186 @@
+import asyncio
+import socket
+import time
+
+import pytest
+from sqlalchemy import insert
+
+from app.email_worker import process_batch
+from app.models import Email, db
+
+pytest.importorskip("aiosmtplib")
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    """Local SMTP stand-in that tracks deliveries and concurrency."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.received = []
+        self.sessions = set()
+        self.active = 0
+        self.max_active = 0
+        # Hang up on MAIL FROM after this many messages per connection, or
+        # on every connection once this many were received in total
+        self.per_connection = None
+        self.down_after = None
+        self.per_session = {}
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        sent = self.per_session.get(session.peer, 0)
+        if (self.per_connection and sent >= self.per_connection) or (
+            self.down_after is not None and len(self.received) >= self.down_after
+        ):
+            server.transport.close()
+            return "421 Closing connection"
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            # Simulate the round trip of a remote server
+            await asyncio.sleep(self.delay)
+            self.received.append(envelope.rcpt_tos[0])
+            self.per_session[session.peer] = self.per_session.get(session.peer, 0) + 1
+        finally:
+            self.active -= 1
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(app):
+    handler = RecordingHandler()
+    port = free_port()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    app.config.update(
+        MAIL_TRANSPORT="async_smtp",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_USE_TLS=False,
+        MAIL_USERNAME=None,
+        MAIL_PASSWORD=None,
+        MAIL_DEFAULT_SENDER="worker@test.com",
+        MAIL_ASYNC_CONCURRENCY=4,
+    )
+    yield handler
+    pool = app.extensions.pop("async_smtp_pool", None)
+    if pool is not None:
+        pool.close()
+    controller.stop()
+
+
+def queue(recipients):
+    db.session.execute(
+        insert(Email),
+        [
+            {"recipient": r, "subject": "Async", "body_text": "hi", "status": "pending"}
+            for r in recipients
+        ],
+    )
+    db.session.commit()
+
+
+def test_async_batch_sends_concurrently_over_pooled_connections(app, smtp_server):
+    recipients = [f"async{i}@test.com" for i in range(20)]
+    queue(recipients)
+
+    started = time.perf_counter()
+    assert process_batch(app) == 20
+    elapsed = time.perf_counter() - started
+
+    assert sorted(smtp_server.received) == sorted(recipients)
+    assert Email.query.filter_by(status="sent").count() == 20
+    # Bounded concurrency, with messages overlapping on up to 4 connections
+    assert 1 < smtp_server.max_active <= 4
+    assert len(smtp_server.sessions) <= 4
+    assert elapsed < 20 * smtp_server.delay
+
+    # The next batch reuses the idle connections
+    queue(["again@test.com"])
+    assert process_batch(app) == 1
+    assert len(smtp_server.sessions) <= 4
+
+
+def test_async_rejections_are_recorded_per_message(app, smtp_server):
+    queue(["ok1@test.com", "reject@test.com", "ok2@test.com"])
+
+    assert process_batch(app) == 3
+
+    assert sorted(smtp_server.received) == ["ok1@test.com", "ok2@test.com"]
+    failed = Email.query.filter_by(status="failed").one()
+    assert failed.recipient == "reject@test.com"
+    assert "No such user" in failed.error_message
+    assert Email.query.filter_by(status="sent").count() == 2
+
+
+def test_async_rate_limit_spaces_out_sends(app, smtp_server):
+    app.config["MAIL_RATE_LIMIT"] = 50
+    queue([f"rate{i}@test.com" for i in range(10)])
+
+    started = time.perf_counter()
+    assert process_batch(app) == 10
+    # Ten sends at 50/s need at least nine intervals of 20ms
+    assert time.perf_counter() - started >= 0.18
+
+
+@pytest.fixture
+def sync_smtp(app, smtp_server, monkeypatch):
+    """The same server, reached through the blocking SMTP transport."""
+    app.config["MAIL_TRANSPORT"] = "smtp"
+    # Flask-Mail read its settings when the app was created
+    state = app.extensions["mail"]
+    for name, value in [
+        ("server", app.config["MAIL_SERVER"]),
+        ("port", app.config["MAIL_PORT"]),
+        ("use_tls", False),
+        ("username", None),
+        ("suppress", False),
+    ]:
+        monkeypatch.setattr(state, name, value)
+    return smtp_server
+
+
+def test_smtp_reconnects_when_the_server_hangs_up(app, sync_smtp):
+    sync_smtp.per_connection = 3
+    recipients = [f"cap{i}@test.com" for i in range(8)]
+    queue(recipients)
+
+    assert process_batch(app) == 8
+
+    assert sorted(sync_smtp.received) == sorted(recipients)
+    assert Email.query.filter_by(status="sent").count() == 8
+    assert len(sync_smtp.sessions) == 3
+
+
+def test_smtp_leaves_the_batch_pending_when_the_server_stays_down(app, sync_smtp):
+    sync_smtp.down_after = 3
+    queue([f"down{i}@test.com" for i in range(8)])
+
+    assert process_batch(app) == 3
+
+    assert Email.query.filter_by(status="sent").count() == 3
+    assert Email.query.filter_by(status="pending").count() == 5
+    assert Email.query.filter_by(status="failed").count() == 0
+
+    # Back up: the next run picks up where the last one stopped
+    sync_smtp.down_after = None
+    assert process_batch(app) == 5
+    assert Email.query.filter_by(status="sent").count() == 8
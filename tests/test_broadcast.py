@@ -1,5 +1,6 @@
 import pytest
 from datetime import date
+from app.email import render_email_bodies
 from app.models import Event, User, Email, LoginToken, db
 
 def test_broadcast_email_functionality(client, app):
@@ -51,12 +52,13 @@ def test_broadcast_email_functionality(client, app):
         assert email.subject == "[MECWS] Urgent Help Needed"
         
         # Check Variable Replacement in Body
-        assert "Hi Vol One" in email.body_text
-        assert "December 30, 2025" in email.body_text
+        body_text, _ = render_email_bodies(email)
+        assert "Hi Vol One" in body_text
+        assert "December 30, 2025" in body_text
         
         # Check link generation
-        assert "http" in email.body_text
+        assert "http" in body_text
         # We can't easily check the token validity without parsing, but we can check a token exists for the user
         token = LoginToken.query.filter_by(user_id=vol1_id).first()
         assert token is not None
-        assert token.token in email.body_text
+        assert token.token in body_text
@@ -0,0 +1,110 @@
+from datetime import date, time
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.models import Email, Event, Shift, Signup, User, db
+from app.targeting import broadcast_recipients
+
+
+@pytest.fixture
+def night(app):
+    """One night: the first shift is full, the other two have room."""
+    night = Event(date=date(2026, 12, 1))
+    db.session.add(night)
+    db.session.flush()
+    shifts = [
+        Shift(event_id=night.id, start_time=start, end_time=end, capacity=1)
+        for start, end in (
+            (time(19, 45), time(0, 0)),
+            (time(0, 0), time(4, 0)),
+            (time(4, 0), time(8, 0)),
+        )
+    ]
+    db.session.add_all(shifts)
+    db.session.commit()
+    return night, shifts
+
+
+def volunteer(name, slots=None, **kwargs):
+    user = User(email=f"{name}@test.com", name=name, role="Team Member", **kwargs)
+    user.shift_slots = slots
+    db.session.add(user)
+    return user
+
+
+def test_recipients_can_fill_an_open_slot(night):
+    event_night, (first, second, _) = night
+    signed_up = volunteer("signed_up")
+    volunteer("early_only", ["7:45PM-12AM"])
+    volunteer("middle", ["12AM-4AM"])
+    volunteer("no_preference")
+    volunteer("opted_out", email_allowed=False)
+    db.session.add(User(email="boss@test.com", role="Shelter Supervisor"))
+    db.session.flush()
+    db.session.add(Signup(user_id=signed_up.id, shift_id=first.id))
+    db.session.commit()
+    event_id = event_night.id
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        names = sorted(u.name for u in broadcast_recipients([event_id]))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert names == ["middle", "no_preference"]
+    assert len(statements) == 1
+
+    # With every shift full, nobody is asked
+    for shift in Shift.query:
+        shift.capacity = 0
+    db.session.commit()
+    assert broadcast_recipients([event_night.id]).all() == []
+
+
+def test_odd_hours_match_any_preference(night):
+    event_night, _ = night
+    db.session.add(
+        Shift(event_id=event_night.id, start_time=time(21, 0), end_time=time(1, 0))
+    )
+    volunteer("early_only", ["7:45PM-12AM"])
+    for shift in Shift.query.filter(Shift.start_time != time(21, 0)):
+        shift.capacity = 0
+    db.session.commit()
+    assert [u.name for u in broadcast_recipients([event_night.id])] == ["early_only"]
+
+
+def test_broadcast_page_shows_and_uses_the_count(client, night):
+    event_night, (first, _, _) = night
+    admin = User(email="target_admin@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    committed = volunteer("committed")
+    volunteer("early_only", ["7:45PM-12AM"])
+    volunteer("free")
+    db.session.flush()
+    db.session.add(Signup(user_id=committed.id, shift_id=first.id))
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    page = client.get(f"/admin/events/{event_night.id}/broadcast").get_data(
+        as_text=True
+    )
+    assert "<strong>1</strong> of 3 volunteers" in page
+    assert 'name="targeted"' in page
+
+    resp = client.post(
+        f"/admin/events/{event_night.id}/broadcast",
+        data={"subject": "Help", "message": "Hi {{ name }}", "targeted": "y"},
+        follow_redirects=True,
+    )
+    assert b"Broadcast sent to 1 volunteers" in resp.data
+    assert [e.recipient for e in Email.query] == ["free@test.com"]
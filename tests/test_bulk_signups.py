@@ -0,0 +1,118 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from app.email import render_email_bodies
+from app.models import Email, Event, Shift, Signup, User, db
+
+
+@pytest.fixture
+def pending_setup(app):
+    supervisor = User(email="bulk_admin@test.com", role="Shelter Supervisor")
+    event_obj = Event(date=date(2025, 12, 31), description="Bulk Night")
+    shift = Shift(
+        start_time=time(19, 45), end_time=time(0, 0), event=event_obj, capacity=10
+    )
+    volunteers = [User(email=f"bulk{i}@test.com", name=f"Bulk {i}") for i in range(5)]
+    db.session.add_all([supervisor, event_obj, shift, *volunteers])
+    db.session.commit()
+
+    signups = [Signup(user_id=v.id, shift_id=shift.id) for v in volunteers]
+    db.session.add_all(signups)
+    db.session.commit()
+
+    return {
+        "admin_id": supervisor.id,
+        "shift_id": shift.id,
+        "signup_ids": [s.id for s in signups],
+    }
+
+
+def login_as(client, user_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+
+def count_email_inserts():
+    """Count INSERT statements against the emails table (executemany counts once)."""
+    calls = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        if statement.startswith("INSERT INTO emails"):
+            calls.append(many)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    return calls, lambda: event.remove(
+        db.engine, "before_cursor_execute", before_cursor_execute
+    )
+
+
+def test_bulk_confirm_queues_emails_in_one_insert(client, app, pending_setup):
+    login_as(client, pending_setup["admin_id"])
+    selected = pending_setup["signup_ids"][:3]
+
+    calls, stop = count_email_inserts()
+    try:
+        resp = client.post(
+            "/admin/signups/bulk",
+            data={"action": "confirm", "signup_ids": selected},
+        )
+    finally:
+        stop()
+
+    assert resp.status_code == 302
+    assert resp.headers["Location"].endswith("/admin/signups")
+    assert len(calls) == 1
+
+    confirmed = Signup.query.filter_by(confirmed=True).all()
+    assert sorted(s.id for s in confirmed) == sorted(selected)
+
+    emails = Email.query.order_by(Email.recipient).all()
+    assert [e.recipient for e in emails] == [f"bulk{i}@test.com" for i in range(3)]
+    assert all(e.subject == "[MECWS] Signup Confirmed" for e in emails)
+    assert "CONFIRMED" in render_email_bodies(emails[0])[0]
+
+    shift = db.session.get(Shift, pending_setup["shift_id"])
+    assert (shift.signup_count, shift.confirmed_count) == (5, 3)
+
+
+def test_bulk_reject_deletes_selected(client, app, pending_setup):
+    login_as(client, pending_setup["admin_id"])
+    selected = pending_setup["signup_ids"][1:4]
+
+    resp = client.post(
+        "/admin/signups/bulk",
+        data={"action": "reject", "signup_ids": selected},
+        follow_redirects=True,
+    )
+
+    assert b"3 signup(s) rejected" in resp.data
+    remaining = {s.id for s in Signup.query.all()}
+    assert remaining == set(pending_setup["signup_ids"]) - set(selected)
+    assert Email.query.count() == 0
+
+    shift = db.session.get(Shift, pending_setup["shift_id"])
+    assert (shift.signup_count, shift.confirmed_count) == (2, 0)
+
+
+def test_bulk_requires_selection(client, app, pending_setup):
+    login_as(client, pending_setup["admin_id"])
+
+    resp = client.post(
+        "/admin/signups/bulk", data={"action": "confirm"}, follow_redirects=True
+    )
+
+    assert b"Select at least one signup" in resp.data
+    assert Signup.query.filter_by(confirmed=True).count() == 0
+
+
+def test_manage_signups_renders_bulk_controls(client, app, pending_setup):
+    login_as(client, pending_setup["admin_id"])
+
+    resp = client.get("/admin/signups")
+
+    assert resp.status_code == 200
+    assert b'id="bulk-signups"' in resp.data
+    assert b'name="signup_ids"' in resp.data
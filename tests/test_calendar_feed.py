@@ -0,0 +1,117 @@
+from datetime import date, datetime, time
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.ical import _fold, shift_span
+from app.models import Event, Shift, Signup, User, db
+
+
+def test_overnight_shift_spans():
+    night = date(2026, 12, 1)
+    assert shift_span(night, time(19, 45), time(0, 0)) == (
+        datetime(2026, 12, 1, 19, 45),
+        datetime(2026, 12, 2, 0, 0),
+    )
+    assert shift_span(night, time(0, 0), time(4, 0)) == (
+        datetime(2026, 12, 2, 0, 0),
+        datetime(2026, 12, 2, 4, 0),
+    )
+    assert shift_span(night, time(22, 0), time(2, 0))[1] == datetime(2026, 12, 2, 2)
+
+
+def test_long_lines_are_folded():
+    line = "SUMMARY:" + "é" * 60
+    folded = _fold(line)
+    assert all(len(part.encode()) <= 75 for part in folded.split("\r\n"))
+    assert folded.replace("\r\n ", "") == line
+
+
+@pytest.fixture
+def volunteer(client, app):
+    night = Event(date=date(2026, 12, 1))
+    db.session.add(night)
+    db.session.flush()
+    shifts = [
+        Shift(event_id=night.id, start_time=start, end_time=end)
+        for start, end in ((time(19, 45), time(0, 0)), (time(0, 0), time(4, 0)))
+    ]
+    user = User(email="cal_vol@test.com", name="Cal", role="Team Member")
+    db.session.add_all([*shifts, user])
+    db.session.flush()
+    db.session.add_all(
+        [
+            Signup(user_id=user.id, shift_id=shifts[0].id, confirmed=True),
+            Signup(user_id=user.id, shift_id=shifts[1].id),
+        ]
+    )
+    db.session.commit()
+
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+    resp = client.post("/volunteer/calendar/token", follow_redirects=True)
+    assert b"Calendar link created" in resp.data
+    return user
+
+
+def feed_url(user):
+    db.session.refresh(user)
+    return f"/volunteer/calendar/{user.calendar_token}.ics"
+
+
+def test_feed_lists_confirmed_and_pending_shifts(app, volunteer):
+    # Calendar apps poll without the browser session
+    client = app.test_client()
+    resp = client.get(feed_url(volunteer))
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/calendar"
+
+    body = resp.get_data(as_text=True)
+    assert body.startswith("BEGIN:VCALENDAR\r\n")
+    assert body.count("BEGIN:VEVENT") == 2
+    assert "DTSTART;TZID=America/New_York:20261201T194500" in body
+    assert "DTEND;TZID=America/New_York:20261202T000000" in body
+    assert "DTSTART;TZID=America/New_York:20261202T000000" in body
+    assert "STATUS:CONFIRMED" in body
+    assert "STATUS:TENTATIVE" in body
+
+    assert client.get("/volunteer/calendar/nope.ics").status_code == 404
+
+
+def test_feed_is_cached_until_signups_change(app, volunteer):
+    client = app.test_client()
+    url = feed_url(volunteer)
+    etag = client.get(url).headers["ETag"]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        resp = client.get(url, headers={"If-None-Match": etag})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    assert resp.status_code == 304
+    # Only the token lookup; the feed and versions come from memory
+    assert len(statements) == 1
+
+    signup = Signup.query.filter_by(confirmed=False).one()
+    db.session.delete(signup)
+    db.session.commit()
+
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).count("BEGIN:VEVENT") == 1
+
+
+def test_reset_revokes_the_old_link(client, volunteer):
+    old = feed_url(volunteer)
+    resp = client.post("/volunteer/calendar/token", follow_redirects=True)
+    assert b"Your calendar link was replaced" in resp.data
+    assert client.get(old).status_code == 404
+    assert client.get(feed_url(volunteer)).status_code == 200
@@ -0,0 +1,159 @@
+from datetime import date, datetime
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+import app.routes.admin as admin_routes
+from app.models import CheckIn, Event, User, Visitor, db
+
+
+@pytest.fixture
+def door(app):
+    supervisor = User(email="kiosk@test.com", role="Shelter Supervisor")
+    tonight = Event(date=date.today(), description="Door Night")
+    regular = Visitor(name="Regular Rita", alias="Rita")
+    known = Visitor(name="Known Ken")
+    db.session.add_all([supervisor, tonight, regular, known])
+    db.session.commit()
+    return {
+        "admin_id": supervisor.id,
+        "event_id": tonight.id,
+        "regular_id": regular.id,
+        "known_id": known.id,
+    }
+
+
+@pytest.fixture
+def kiosk(client, door):
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(door["admin_id"])
+        sess["_fresh"] = True
+
+    def sync(checkins):
+        return client.post(
+            f"/admin/events/{door['event_id']}/checkins/batch",
+            json={"checkins": checkins},
+        )
+
+    return sync
+
+
+def test_batch_applies_each_item(kiosk, door):
+    resp = kiosk(
+        [
+            {"client_id": "k1-1", "name": "regular rita"},
+            {"client_id": "k1-2", "visitor_id": door["known_id"]},
+            {
+                "client_id": "k1-3",
+                "name": "New Nora",
+                "timestamp": "2026-01-05T03:15:00Z",
+            },
+            {"client_id": "k1-4", "name": "NEW NORA"},
+            {"name": "No Id"},
+            {"client_id": "k1-6", "visitor_id": 9999},
+            {"client_id": "k1-7", "name": "Late Larry", "timestamp": "yesterday"},
+        ]
+    )
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+
+    assert [r["status"] for r in results] == [
+        "created",
+        "created",
+        "created",
+        "already_checked_in",
+        "error",
+        "error",
+        "error",
+    ]
+    assert results[0]["visitor_id"] == door["regular_id"]
+    assert results[3]["checkin_id"] == results[2]["checkin_id"]
+    assert results[4]["error"] == "client_id is required"
+    assert results[6]["client_id"] == "k1-7"
+
+    nora = Visitor.query.filter_by(name="New Nora").one()
+    assert nora.alias == "New Nora"
+    checkin = db.session.get(CheckIn, results[2]["checkin_id"])
+    assert checkin.visitor_id == nora.id
+    assert checkin.check_in_time == datetime(2026, 1, 5, 3, 15)
+    assert CheckIn.query.filter_by(event_id=door["event_id"]).count() == 3
+
+
+def test_replayed_batch_is_idempotent(kiosk, door):
+    batch = [
+        {"client_id": "k2-1", "name": "Replay Ray"},
+        {"client_id": "k2-2", "visitor_id": door["regular_id"]},
+    ]
+    first = kiosk(batch).get_json()["results"]
+    again = kiosk(batch).get_json()["results"]
+
+    assert [r["status"] for r in again] == ["duplicate", "duplicate"]
+    assert [r["checkin_id"] for r in again] == [r["checkin_id"] for r in first]
+    assert CheckIn.query.count() == 2
+    assert Visitor.query.filter_by(name="Replay Ray").count() == 1
+
+
+def test_walk_up_then_kiosk_sync(kiosk, door):
+    db.session.add(CheckIn(event_id=door["event_id"], visitor_id=door["known_id"]))
+    db.session.commit()
+
+    result = kiosk([{"client_id": "k3-1", "name": "Known Ken"}]).get_json()["results"]
+    assert result[0]["status"] == "already_checked_in"
+    assert CheckIn.query.count() == 1
+
+
+def test_query_count_does_not_grow_with_the_batch(kiosk, door):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    batch = [{"client_id": f"k4-{i}", "name": f"Guest {i}"} for i in range(40)]
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        results = kiosk(batch).get_json()["results"]
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert all(r["status"] == "created" for r in results)
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) < 10
+
+
+def test_bad_payloads_are_rejected(kiosk, app):
+    assert kiosk("nope").status_code == 400
+
+    app.config["CHECKIN_BATCH_LIMIT"] = 2
+    resp = kiosk([{"client_id": str(i), "name": "X"} for i in range(3)])
+    assert resp.status_code == 413
+    assert CheckIn.query.count() == 0
+
+
+def test_conflicting_syncs_are_retried(kiosk, door, monkeypatch):
+    apply = admin_routes.apply_checkin_batch
+    conflicts = {"left": 2}
+
+    def conflicting(event_id, items):
+        results = apply(event_id, items)
+        if conflicts["left"]:
+            conflicts["left"] -= 1
+            raise IntegrityError("INSERT INTO checkins", {}, Exception("UNIQUE"))
+        return results
+
+    monkeypatch.setattr(admin_routes, "apply_checkin_batch", conflicting)
+
+    # Two conflicts in a row, then the batch goes through
+    resp = kiosk([{"client_id": "race-1", "visitor_id": door["known_id"]}])
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.get_json()["results"]] == ["created"]
+    assert CheckIn.query.count() == 1
+
+    # Conflicting on every attempt: a 409 the kiosk can retry, nothing applied
+    conflicts["left"] = 99
+    resp = kiosk([{"client_id": "race-2", "visitor_id": door["regular_id"]}])
+    assert resp.status_code == 409
+    assert "retry" in resp.get_json()["error"]
+    assert CheckIn.query.count() == 1
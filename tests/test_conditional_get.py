@@ -0,0 +1,133 @@
+from datetime import date, time, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.models import CheckIn, Event, Shift, Signup, User, Visitor, db
+from app.versions import data_version, event_key
+
+
+@pytest.fixture
+def night(app):
+    supervisor = User(email="etag_admin@test.com", role="Shelter Supervisor")
+    volunteer = User(email="etag_vol@test.com", name="Etag Vol")
+    tonight = Event(date=date.today() + timedelta(days=1), description="Tonight")
+    other = Event(date=date.today() + timedelta(days=2), description="Other")
+    shift = Shift(start_time=time(19, 45), end_time=time(0, 0), event=tonight)
+    visitor = Visitor(name="Guest One")
+    db.session.add_all([supervisor, volunteer, tonight, other, shift, visitor])
+    db.session.commit()
+    return {
+        "admin_id": supervisor.id,
+        "volunteer_id": volunteer.id,
+        "event_id": tonight.id,
+        "other_event_id": other.id,
+        "shift_id": shift.id,
+        "visitor_id": visitor.id,
+    }
+
+
+def login(client, user_id):
+    # Requests share the test's app context, where Flask-Login caches the user
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+
+def revalidate(client, url, etag):
+    """GET with If-None-Match, returning the response and the SQL it ran."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    # Auth reloads the user on every request, so start from a cold g
+    g.pop("_login_user", None)
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers={"If-None-Match": etag})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return response, statements
+
+
+@pytest.mark.parametrize("url", ["/volunteer/shifts", "/volunteer/my-schedule"])
+def test_volunteer_pages_answer_304_without_queries(client, night, url):
+    login(client, night["volunteer_id"])
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    response, statements = revalidate(client, url, etag)
+    assert response.status_code == 304
+    assert response.data == b""
+    # Only the Flask-Login user lookup touches the database
+    assert len(statements) == 1
+    assert "FROM users" in statements[0]
+
+
+def test_signup_changes_the_etag(client, night):
+    login(client, night["volunteer_id"])
+    etag = client.get("/volunteer/shifts").headers["ETag"]
+
+    db.session.add(Signup(user_id=night["volunteer_id"], shift_id=night["shift_id"]))
+    db.session.commit()
+
+    response, _ = revalidate(client, "/volunteer/shifts", etag)
+    assert response.status_code == 200
+    assert b"Signed Up" in response.data
+    assert response.headers["ETag"] != etag
+
+
+def test_view_event_is_versioned_per_event(client, night):
+    login(client, night["admin_id"])
+    url = f"/admin/events/{night['event_id']}"
+    etag = client.get(url).headers["ETag"]
+
+    response, statements = revalidate(client, url, etag)
+    assert response.status_code == 304
+    assert len(statements) == 1
+
+    # A check-in at another event leaves this page alone
+    db.session.add(
+        CheckIn(event_id=night["other_event_id"], visitor_id=night["visitor_id"])
+    )
+    db.session.commit()
+    response, _ = revalidate(client, url, etag)
+    assert response.status_code == 304
+
+    db.session.add(CheckIn(event_id=night["event_id"], visitor_id=night["visitor_id"]))
+    db.session.commit()
+    response, _ = revalidate(client, url, etag)
+    assert response.status_code == 200
+    assert b"Guest One" in response.data
+
+
+def test_bulk_confirm_bumps_the_event_version(client, night):
+    signup = Signup(user_id=night["volunteer_id"], shift_id=night["shift_id"])
+    db.session.add(signup)
+    db.session.commit()
+    before = data_version(event_key(night["event_id"]))
+    other_before = data_version(event_key(night["other_event_id"]))
+
+    login(client, night["admin_id"])
+    client.post(
+        "/admin/signups/bulk", data={"action": "confirm", "signup_ids": [signup.id]}
+    )
+
+    assert data_version(event_key(night["event_id"])) == before + 1
+    assert data_version(event_key(night["other_event_id"])) == other_before
+
+
+def test_pages_with_flashes_are_not_tagged(client, night):
+    login(client, night["volunteer_id"])
+    with client.session_transaction() as sess:
+        sess["_flashes"] = [("info", "Hello there")]
+
+    response = client.get("/volunteer/shifts")
+    assert b"Hello there" in response.data
+    assert "ETag" not in response.headers
@@ -0,0 +1,123 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+from app.email import (
+    _compiled_template,
+    decode_context,
+    encode_context,
+    render_email_bodies,
+    send_template_email,
+)
+from app.models import Email, Event, LoginToken, Shift, Signup, User, db
+
+
+@pytest.fixture
+def signup_setup(app):
+    supervisor = User(email="defer_admin@test.com", role="Shelter Supervisor")
+    volunteer = User(email="defer_vol@test.com", name="Deferred Dana")
+    event_obj = Event(date=date(2025, 12, 31))
+    shift = Shift(start_time=time(0, 0), end_time=time(4, 0), event=event_obj)
+    db.session.add_all([supervisor, volunteer, event_obj, shift])
+    db.session.commit()
+
+    signup = Signup(user_id=volunteer.id, shift_id=shift.id)
+    db.session.add(signup)
+    db.session.commit()
+    return {"admin_id": supervisor.id, "signup_id": signup.id}
+
+
+def test_deferred_confirmation_stores_template_reference(client, app, signup_setup):
+    app.config["EMAIL_DEFERRED_RENDERING"] = True
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(signup_setup["admin_id"])
+        sess["_fresh"] = True
+
+    client.post(f"/admin/signups/confirm/{signup_setup['signup_id']}")
+
+    email = Email.query.filter_by(recipient="defer_vol@test.com").one()
+    assert email.template == "email/signup_confirmed"
+    assert email.body_text is None and email.body_html is None
+    volunteer = User.query.filter_by(email="defer_vol@test.com").one()
+    context = json.loads(email.context)
+    assert context["user"] == {"__model__": "User", "id": volunteer.id}
+    assert context["shift"]["__model__"] == "Shift"
+
+    # The worker renders from the reference at send time
+    body_text, body_html = render_email_bodies(email)
+    assert "CONFIRMED" in body_text
+    assert "defer_vol@test.com" in body_text
+    assert "<b>CONFIRMED</b>" in body_html
+
+
+def test_immediate_rendering_is_default(app, signup_setup):
+    user = User.query.filter_by(email="defer_vol@test.com").one()
+
+    send_template_email(
+        "Hello", None, [user.email], "email/login_link", url="https://x/y", name="Dana"
+    )
+
+    email = Email.query.one()
+    assert email.template is None and email.body_digest is not None
+    body_text, _ = render_email_bodies(email)
+    assert "https://x/y" in body_text
+
+
+def test_deferred_context_keeps_plain_values(app):
+    app.config["EMAIL_DEFERRED_RENDERING"] = True
+
+    send_template_email(
+        "[MECWS] Reminder",
+        None,
+        ["link@test.com"],
+        "email/login_link",
+        url="https://example.org/login/abc",
+        name="Lee",
+    )
+
+    email = Email.query.one()
+    assert json.loads(email.context) == {
+        "url": "https://example.org/login/abc",
+        "name": "Lee",
+    }
+    body_text, _ = render_email_bodies(email)
+    assert "https://example.org/login/abc" in body_text
+
+
+def test_deferred_context_round_trips_types(app, signup_setup):
+    context = {
+        "shift": Shift.query.one(),
+        "night": date(2025, 12, 31),
+        "starts": datetime(2025, 12, 31, 19, 45),
+        "ends": time(4, 0),
+        "total": Decimal("12.50"),
+        "nested": {"days": [date(2026, 1, 1)], "note": "plain"},
+    }
+    decoded = decode_context(encode_context(context))
+    assert decoded == context
+    assert type(decoded["starts"]) is datetime
+
+    with pytest.raises(TypeError):
+        encode_context({"tags": {"a", "b"}})
+
+
+def test_login_links_are_never_deferred(client, app):
+    app.config["EMAIL_DEFERRED_RENDERING"] = True
+    db.session.add(User(email="login@test.com", name="Lee"))
+    db.session.commit()
+
+    client.post("/login", data={"email": "login@test.com"})
+
+    email = Email.query.one()
+    assert email.sensitive is True
+    assert email.template is None and email.context is None
+    token = LoginToken.query.one().token
+    assert token in render_email_bodies(email)[0]
+
+
+def test_compiled_templates_are_cached(app):
+    first = _compiled_template("email/login_link.txt")
+    assert _compiled_template("email/login_link.txt") is first
@@ -0,0 +1,75 @@
+from datetime import date
+
+from sqlalchemy import func, insert, select
+
+from app.email import fill_placeholders, render_email_bodies, send_email
+from app.email_worker import process_batch
+from app.extensions import mail
+from app.models import Email, EmailBody, Event, LoginToken, User, db
+from app.notifications import BROADCAST_MESSAGE, queue_broadcast
+
+
+def test_broadcast_stores_one_body(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    db.session.add_all(
+        [User(email=f"vol{i}@test.com", name=f"Vol {i}") for i in range(20)]
+    )
+    night = Event(date=date(2026, 12, 24))
+    db.session.add(night)
+    db.session.commit()
+
+    with app.test_request_context():
+        assert queue_broadcast([night], "Help", BROADCAST_MESSAGE) == 20
+    db.session.commit()
+
+    assert db.session.scalar(select(func.count()).select_from(EmailBody)) == 1
+    email = Email.query.filter_by(recipient="vol7@test.com").one()
+    assert email.body_text is None and email.body_html is None
+    user = User.query.filter_by(email="vol7@test.com").one()
+    token = LoginToken.query.filter_by(user_id=user.id).one().token
+
+    body_text, body_html = render_email_bodies(email)
+    assert body_text.startswith("Hi Vol 7,")
+    assert "December 24, 2026" in body_text
+    assert token in body_text
+    assert '">Click here to sign up</a>' in body_html
+    assert "{{" not in body_text + body_html
+
+    with mail.record_messages() as outbox:
+        assert process_batch(app) == 20
+    sent = {message.recipients[0]: message.body for message in outbox}
+    assert sent["vol7@test.com"] == body_text
+    assert sent["vol8@test.com"].startswith("Hi Vol 8,")
+
+
+def test_identical_bodies_are_stored_once(app):
+    large = "The same notice, again and again. " * 200
+    for _ in range(2):
+        send_email("Notice", None, ["a@test.com", "b@test.com"], large, None)
+        db.session.commit()
+
+    assert Email.query.count() == 4
+    body = db.session.scalars(select(EmailBody)).one()
+    assert body.html_z is None
+    assert len(body.text_z) < len(large) / 10
+    assert {render_email_bodies(email) for email in Email.query} == {(large, None)}
+
+
+def test_bodies_written_directly_still_render(app):
+    db.session.execute(
+        insert(Email),
+        [{"recipient": "raw@test.com", "subject": "Raw", "body_text": "inline"}],
+    )
+    db.session.commit()
+
+    assert render_email_bodies(Email.query.one()) == ("inline", None)
+    assert EmailBody.query.count() == 0
+
+
+def test_fill_placeholders():
+    assert fill_placeholders("Hi {{ name }}, {{ other }}", {"name": "Al"}) == (
+        "Hi Al, {{ other }}"
+    )
+    # Without substitutions a body is returned exactly as stored
+    assert fill_placeholders("Hi {{ name }}", None) == "Hi {{ name }}"
+    assert fill_placeholders(None, {"name": "Al"}) is None
@@ -0,0 +1,82 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from app.email import send_email
+from app.models import Email, Event, LoginToken, User, db
+
+
+def capture_statements():
+    """Record (statement, executemany) pairs sent to the database."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append((statement, many))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(
+        db.engine, "before_cursor_execute", before_cursor_execute
+    )
+
+
+def test_send_email_does_not_commit(app):
+    """Queued emails are discarded with the caller's transaction."""
+    send_email("Rolled back", None, ["a@test.com"], "text", "<p>html</p>")
+    db.session.rollback()
+
+    assert Email.query.count() == 0
+
+
+def test_savepoint_rollback_keeps_earlier_emails(app):
+    send_email("Before", None, ["before@test.com"], "text", None)
+    with db.session.begin_nested() as savepoint:
+        send_email("Inside", None, ["inside@test.com"], "text", None)
+        assert Email.query.count() == 0
+        savepoint.rollback()
+    db.session.commit()
+
+    assert [e.recipient for e in Email.query] == ["before@test.com"]
+
+
+def test_outbox_flushes_with_one_bulk_insert_at_commit(app):
+    statements, stop = capture_statements()
+    try:
+        send_email("One", None, ["a@test.com", "b@test.com"], "text", "<p>html</p>")
+        send_email("Two", None, ["c@test.com"], "text", "<p>html</p>")
+        # Nothing is written until the caller's unit of work runs
+        assert not any("INSERT INTO emails" in s for s, _ in statements)
+        db.session.commit()
+    finally:
+        stop()
+
+    inserts = [many for s, many in statements if s.startswith("INSERT INTO emails")]
+    assert inserts == [True]
+    assert Email.query.count() == 3
+
+
+def test_broadcast_commits_tokens_and_emails_once(client, app):
+    supervisor = User(email="outbox_sup@test.com", role="Shelter Supervisor")
+    volunteers = [
+        User(email=f"outbox{i}@test.com", role="Team Member") for i in range(3)
+    ]
+    event_obj = Event(date=date(2025, 12, 30))
+    db.session.add_all([supervisor, *volunteers, event_obj])
+    db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(supervisor.id)
+        sess["_fresh"] = True
+
+    statements, stop = capture_statements()
+    try:
+        client.post(
+            f"/admin/events/{event_obj.id}/broadcast",
+            data={"subject": "Help", "message": "Hi {{ name }} {{ link }}"},
+        )
+    finally:
+        stop()
+
+    email_inserts = [s for s, _ in statements if s.startswith("INSERT INTO emails")]
+    assert len(email_inserts) == 1
+    assert Email.query.count() == 3
+    assert LoginToken.query.count() == 3
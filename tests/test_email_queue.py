@@ -1,6 +1,6 @@
 import pytest
 from app.models import Email, db
-from app.email import send_email
+from app.email import render_email_bodies, send_email
 
 
 def test_email_queuing(app):
@@ -28,4 +28,4 @@ def test_email_queuing(app):
         assert email.subject == "Test Subject"
         assert email.recipient == "recipient@example.com"
         assert email.status == "pending"
-        assert email.body_text == "Hello"
+        assert render_email_bodies(email) == ("Hello", "<b>Hello</b>")
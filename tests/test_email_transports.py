@@ -0,0 +1,110 @@
+import os
+from email import message_from_bytes
+
+import pytest
+from flask_mail import Message
+from sqlalchemy import insert
+
+import app.transports as transports
+from app.email_worker import process_batch
+from app.models import Email, db
+from app.transports import (
+    MaildirTransport,
+    NullTransport,
+    SMTPTransport,
+    get_transport,
+)
+
+
+def make_message(i):
+    return Message(
+        subject=f"Spool {i}",
+        recipients=[f"spool{i}@test.com"],
+        body="text",
+        html="<p>html</p>",
+        sender="worker@test.com",
+    )
+
+
+def test_get_transport_uses_config(app):
+    assert isinstance(get_transport(app), SMTPTransport)
+    app.config["MAIL_TRANSPORT"] = "null"
+    assert isinstance(get_transport(app), NullTransport)
+    with pytest.raises(ValueError, match="Unknown MAIL_TRANSPORT"):
+        get_transport(app, "pigeon")
+
+
+def test_maildir_moves_batch_into_new_on_close(app, tmp_path):
+    transport = MaildirTransport(app, spool_dir=str(tmp_path))
+    with transport:
+        for i in range(3):
+            transport.send(make_message(i))
+        # Nothing is visible to the MTA until the batch is synced
+        assert os.listdir(tmp_path / "new") == []
+        assert len(os.listdir(tmp_path / "tmp")) == 3
+
+    assert os.listdir(tmp_path / "tmp") == []
+    spooled = sorted(os.listdir(tmp_path / "new"))
+    assert len(spooled) == 3
+    subjects = sorted(
+        message_from_bytes((tmp_path / "new" / name).read_bytes())["Subject"]
+        for name in spooled
+    )
+    assert subjects == ["Spool 0", "Spool 1", "Spool 2"]
+
+
+def test_worker_spools_to_maildir(app, tmp_path):
+    app.config.update(
+        MAIL_TRANSPORT="maildir",
+        MAIL_SPOOL_DIR=str(tmp_path),
+        MAIL_DEFAULT_SENDER="worker@test.com",
+    )
+    db.session.execute(
+        insert(Email),
+        [
+            {
+                "recipient": f"spool{i}@test.com",
+                "subject": f"Spool {i}",
+                "body_text": "text",
+                "status": "pending",
+            }
+            for i in range(5)
+        ],
+    )
+    db.session.commit()
+
+    assert process_batch(app) == 5
+    assert Email.query.filter_by(status="sent").count() == 5
+    assert len(os.listdir(tmp_path / "new")) == 5
+
+
+def test_email_benchmark_command(runner):
+    result = runner.invoke(args=["email-benchmark", "--count", "20"])
+    assert result.exit_code == 0, result.output
+    assert "null" in result.output
+    assert "maildir" in result.output
+    assert "msg/s" in result.output
+
+
+def test_smtp_connects_only_when_there_is_mail(app, monkeypatch):
+    def unreachable():
+        raise AssertionError("connected to the relay")
+
+    monkeypatch.setattr(transports.mail, "connect", unreachable)
+    assert process_batch(app) == 0
+
+
+def test_unreachable_relay_leaves_mail_pending(app, monkeypatch):
+    class Refused:
+        def __enter__(self):
+            raise ConnectionRefusedError("Connection refused")
+
+    monkeypatch.setattr(transports.mail, "connect", Refused)
+    db.session.execute(
+        insert(Email),
+        [{"recipient": "r@test.com", "subject": "S", "status": "pending"}],
+    )
+    db.session.commit()
+
+    assert process_batch(app) == 0
+    assert Email.query.filter_by(status="pending").count() == 1
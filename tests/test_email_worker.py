@@ -0,0 +1,245 @@
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.email_worker import (
+    STATUS_CHUNK_SIZE,
+    _claim_batch,
+    drain_queue,
+    process_batch,
+    run_email_worker,
+)
+from app.extensions import mail
+from app.models import Email, db
+from app.transports import NullTransport
+
+# Raise to e.g. 100000 for a long-running soak test
+QUEUE_SIZE = int(os.environ.get("EMAIL_WORKER_TEST_QUEUE", "2000"))
+
+
+def queue_bulk(count, start=0):
+    db.session.execute(
+        insert(Email),
+        [
+            {
+                "recipient": f"bulk{i}@test.com",
+                "subject": f"Bulk {i}",
+                "body_text": "x" * 2000,
+                "body_html": "<p>" + "x" * 4000 + "</p>",
+                "status": "pending",
+            }
+            for i in range(start, start + count)
+        ],
+    )
+    db.session.commit()
+
+
+def test_process_batch_sends_and_marks_statuses(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(3)
+    # A newline in a header makes the mail library refuse the message
+    db.session.execute(
+        insert(Email),
+        [{"recipient": "bad@test.com", "subject": "Bad\nSubject", "status": "pending"}],
+    )
+    db.session.commit()
+
+    with mail.record_messages() as outbox:
+        assert process_batch(app, batch_size=10) == 4
+
+    assert sorted(m.recipients[0] for m in outbox) == [
+        "bulk0@test.com",
+        "bulk1@test.com",
+        "bulk2@test.com",
+    ]
+    assert Email.query.filter_by(status="sent").count() == 3
+    failed = Email.query.filter_by(status="failed").one()
+    assert failed.recipient == "bad@test.com"
+    assert failed.error_message
+    assert process_batch(app) == 0
+
+
+def test_drain_queue_keeps_memory_flat(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    batch_size = 50
+    queue_bulk(QUEUE_SIZE)
+
+    tracemalloc.start()
+    try:
+        # Warm up caches and the connection before taking the baseline
+        process_batch(app, batch_size)
+        process_batch(app, batch_size)
+        gc.collect()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        processed = 2 * batch_size
+        while True:
+            count = process_batch(app, batch_size)
+            # Nothing survives a batch in the session
+            assert len(db.session.identity_map) == 0
+            processed += count
+            if count < batch_size:
+                break
+
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert processed == QUEUE_SIZE
+    assert Email.query.filter_by(status="pending").count() == 0
+    # Growth does not scale with the number of emails drained
+    assert current - baseline < 512 * 1024
+
+
+def test_drain_queue_stops_when_empty(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(120)
+    assert drain_queue(app, batch_size=50) == 120
+    assert Email.query.filter_by(status="sent").count() == 120
+    assert drain_queue(app, batch_size=50) == 0
+
+
+def test_shards_split_the_queue(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(10)
+
+    assert process_batch(app, shard=(0, 2)) == 5
+    sent_ids = [e.id for e in Email.query.filter_by(status="sent")]
+    assert all(i % 2 == 0 for i in sent_ids)
+    assert process_batch(app, shard=(1, 2)) == 5
+
+
+def test_worker_threads_send_each_email_once(file_app):
+    app = file_app
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(200)
+
+    stop = threading.Event()
+    with mail.record_messages() as outbox:
+        runner = threading.Thread(
+            target=run_email_worker,
+            args=(app,),
+            kwargs={"threads": 3, "poll_interval": 0.05, "stop": stop},
+        )
+        runner.start()
+        deadline = time.monotonic() + 30
+        while Email.query.filter_by(status="pending").count():
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+            db.session.remove()
+        # Stopping waits for the threads to finish their batches
+        stop.set()
+        runner.join(timeout=30)
+        assert not runner.is_alive()
+
+    recipients = [m.recipients[0] for m in outbox]
+    assert len(recipients) == 200
+    assert len(set(recipients)) == 200
+    assert Email.query.filter_by(status="sent").count() == 200
+
+
+def test_drain_queue_stops_between_batches(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(10)
+    stop = threading.Event()
+    stop.set()
+    assert drain_queue(app, batch_size=5, stop=stop) == 0
+    assert Email.query.filter_by(status="pending").count() == 10
+
+
+def test_email_worker_command_once(app, runner):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(3)
+    result = runner.invoke(args=["email-worker", "--once"])
+    assert result.exit_code == 0, result.output
+    assert "Processed 3 email(s)." in result.output
+    assert Email.query.filter_by(status="sent").count() == 3
+
+
+def test_statuses_are_committed_as_the_batch_goes(app, monkeypatch):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    app.config["MAIL_TRANSPORT"] = "null"
+    queue_bulk(25)
+    delivered = []
+
+    def send(self, message, key=None):
+        if len(delivered) == 15:
+            # The process is killed part way through the batch
+            raise SystemExit(1)
+        delivered.append(key)
+
+    monkeypatch.setattr(NullTransport, "send", send)
+    with pytest.raises(SystemExit):
+        process_batch(app)
+
+    # Only the messages delivered since the last chunk go out again, once
+    # their claim has lapsed
+    assert Email.query.filter_by(status="sent").count() == STATUS_CHUNK_SIZE
+    assert Email.query.filter_by(status="sending").count() == 25 - STATUS_CHUNK_SIZE
+    assert process_batch(app) == 0
+
+    monkeypatch.undo()
+    app.config["EMAIL_CLAIM_TIMEOUT"] = 0
+    assert process_batch(app) == 25 - STATUS_CHUNK_SIZE
+    assert Email.query.filter_by(status="sent").count() == 25
+
+
+def test_claimed_emails_are_skipped(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(10)
+
+    # Another worker process holds the oldest six
+    claimed = _claim_batch(app, 6)
+    assert [row.recipient for row in claimed] == [f"bulk{i}@test.com" for i in range(6)]
+
+    with mail.record_messages() as outbox:
+        assert process_batch(app) == 4
+    assert sorted(m.recipients[0] for m in outbox) == [
+        f"bulk{i}@test.com" for i in range(6, 10)
+    ]
+    assert Email.query.filter_by(status="sending").count() == 6
+
+
+def test_stale_claims_go_back_to_the_queue(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(4)
+    _claim_batch(app, 4)
+    # The worker that claimed two of them was killed long ago
+    stale = datetime.utcnow() - timedelta(seconds=app.config["EMAIL_CLAIM_TIMEOUT"] + 1)
+    for email in Email.query.order_by(Email.id).limit(2):
+        email.claimed_at = stale
+    db.session.commit()
+
+    assert process_batch(app) == 2
+    assert Email.query.filter_by(status="sent").count() == 2
+    assert Email.query.filter_by(status="sending").count() == 2
+
+
+def test_workers_without_shards_send_each_email_once(file_app):
+    # Separate worker processes share no shard numbering
+    app = file_app
+    app.config["MAIL_DEFAULT_SENDER"] = "worker@test.com"
+    queue_bulk(120)
+
+    def work():
+        with app.app_context():
+            drain_queue(app, batch_size=10)
+
+    with mail.record_messages() as outbox:
+        workers = [threading.Thread(target=work) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+
+    recipients = [m.recipients[0] for m in outbox]
+    assert len(recipients) == 120
+    assert len(set(recipients)) == 120
+    assert Email.query.filter_by(status="sent").count() == 120
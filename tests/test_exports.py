@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+from datetime import date, time
+
+import pytest
+from flask import g
+
+from app.models import CheckIn, Email, Event, Shift, Signup, User, Visitor, db
+
+
+@pytest.fixture
+def history(app):
+    nights = [Event(date=date(2026, 12, day)) for day in (1, 2)]
+    guest = Visitor(name="Ann Lee", alias="Annie")
+    volunteer = User(email="export_vol@test.com", name="Val", role="Team Member")
+    db.session.add_all([*nights, guest, volunteer])
+    db.session.flush()
+    shift = Shift(event_id=nights[0].id, start_time=time(19, 45), end_time=time(0, 0))
+    db.session.add(shift)
+    db.session.flush()
+    db.session.add_all(
+        [
+            CheckIn(event_id=night.id, visitor_id=guest.id, client_id=f"k-{night.id}")
+            for night in nights
+        ]
+        + [
+            Signup(user_id=volunteer.id, shift_id=shift.id, confirmed=True),
+            Email(recipient="someone@test.com", subject="Hi", body_text="secret"),
+        ]
+    )
+    db.session.commit()
+
+
+@pytest.fixture
+def supervisor_client(client, app):
+    admin = User(email="export_admin@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+    return client
+
+
+def test_csv_export_streams(supervisor_client, history):
+    resp = supervisor_client.get("/admin/exports/checkins.csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "text/csv"
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [(r["event_date"], r["visitor_name"], r["visitor_alias"]) for r in rows] == [
+        ("2026-12-01", "Ann Lee", "Annie"),
+        ("2026-12-02", "Ann Lee", "Annie"),
+    ]
+
+    resp = supervisor_client.get("/admin/exports/checkins.csv?start=2026-12-02")
+    assert len(resp.get_data(as_text=True).splitlines()) == 2
+
+
+def test_csv_export_defuses_formulas(supervisor_client, history):
+    night = Event.query.filter_by(date=date(2026, 12, 1)).one()
+    guest = Visitor(name='=HYPERLINK("http://evil.example","x")', alias="@SUM(A1)")
+    db.session.add(guest)
+    db.session.flush()
+    db.session.add(CheckIn(event_id=night.id, visitor_id=guest.id))
+    db.session.commit()
+
+    resp = supervisor_client.get("/admin/exports/checkins.csv")
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[-1]["visitor_name"] == """'=HYPERLINK("http://evil.example","x")"""
+    assert rows[-1]["visitor_alias"] == "'@SUM(A1)"
+    assert rows[0]["visitor_name"] == "Ann Lee"
+
+    # JSON Lines keep the value as typed
+    resp = supervisor_client.get("/admin/exports/checkins.jsonl")
+    last = json.loads(resp.get_data(as_text=True).splitlines()[-1])
+    assert last["visitor_name"].startswith("=HYPERLINK")
+
+
+def test_jsonl_export(supervisor_client, history):
+    resp = supervisor_client.get("/admin/exports/signups.jsonl")
+    assert resp.mimetype == "application/x-ndjson"
+    (signup,) = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert signup["volunteer_email"] == "export_vol@test.com"
+    assert signup["shift_start"] == "19:45:00"
+    assert signup["confirmed"] is True
+
+    resp = supervisor_client.get("/admin/exports/emails.jsonl?end=2099-01-01")
+    (email,) = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert email["recipient"] == "someone@test.com"
+    assert "secret" not in resp.get_data(as_text=True)
+
+
+def test_unknown_export_or_bad_dates(supervisor_client, history):
+    assert supervisor_client.get("/admin/exports/visitors.csv").status_code == 404
+    assert supervisor_client.get("/admin/exports/checkins.xml").status_code == 404
+    resp = supervisor_client.get("/admin/exports/checkins.csv?start=soon")
+    assert resp.status_code == 400
+
+
+def test_export_command(runner, history, tmp_path):
+    result = runner.invoke(args=["export", "checkins", "--end", "2026-12-01"])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0].startswith("id,event_date,")
+    assert len(result.output.splitlines()) == 2
+
+    target = tmp_path / "signups.jsonl"
+    runner.invoke(args=["export", "signups", "--format", "jsonl", "-o", str(target)])
+    assert json.loads(target.read_text())["volunteer_name"] == "Val"
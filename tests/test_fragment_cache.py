@@ -0,0 +1,145 @@
+from datetime import date, time, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.cache import LRUCache, fragment_cache
+from app.models import Event, Shift, Signup, User, db
+from app.signups import claim_shift_slot
+from app.versions import SCHEDULE, data_version
+
+
+@pytest.fixture
+def schedule(app):
+    supervisor = User(email="cache_admin@test.com", role="Shelter Supervisor")
+    alice = User(email="alice@test.com", name="Alice")
+    bob = User(email="bob@test.com", name="Bob")
+    event_obj = Event(date=date.today() + timedelta(days=1), description="Cache Night")
+    shift = Shift(
+        start_time=time(19, 45), end_time=time(0, 0), event=event_obj, capacity=3
+    )
+    db.session.add_all([supervisor, alice, bob, event_obj, shift])
+    db.session.commit()
+    return {
+        "admin_id": supervisor.id,
+        "alice_id": alice.id,
+        "bob_id": bob.id,
+        "shift_id": shift.id,
+    }
+
+
+def login(client, user_id):
+    # Requests share the test's app context, where Flask-Login caches the user
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+
+def capture_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(
+        db.engine, "before_cursor_execute", before_cursor_execute
+    )
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_schedule_version_bumps_on_commit_only(app, schedule):
+    before = data_version(SCHEDULE)
+
+    shift = db.session.get(Shift, schedule["shift_id"])
+    shift.capacity = 4
+    db.session.rollback()
+    assert data_version(SCHEDULE) == before
+
+    shift = db.session.get(Shift, schedule["shift_id"])
+    shift.capacity = 4
+    db.session.commit()
+    assert data_version(SCHEDULE) == before + 1
+
+    # Bulk statements that bypass the flush count too
+    claim_shift_slot(schedule["shift_id"], schedule["bob_id"])
+    db.session.commit()
+    assert data_version(SCHEDULE) == before + 2
+
+
+def test_cached_shift_rows_skip_schedule_queries(client, app, schedule):
+    login(client, schedule["alice_id"])
+    client.get("/volunteer/shifts")
+
+    statements, stop = capture_statements()
+    try:
+        resp = client.get("/volunteer/shifts")
+    finally:
+        stop()
+
+    assert b"3 Spots Left" in resp.data
+    assert not any("FROM shifts" in s for s in statements)
+
+
+def test_signed_up_marker_is_per_user(client, app, schedule):
+    db.session.add(Signup(user_id=schedule["bob_id"], shift_id=schedule["shift_id"]))
+    db.session.commit()
+
+    login(client, schedule["alice_id"])
+    resp = client.get("/volunteer/shifts")
+    assert b"2 Spots Left" in resp.data
+    assert b"Signed Up" not in resp.data
+
+    login(client, schedule["bob_id"])
+    resp = client.get("/volunteer/shifts")
+    assert b"Signed Up" in resp.data
+    assert b"Spots Left" not in resp.data
+
+
+def test_writes_invalidate_cached_rows(client, app, schedule):
+    login(client, schedule["alice_id"])
+    assert b"3 Spots Left" in client.get("/volunteer/shifts").data
+
+    claim_shift_slot(schedule["shift_id"], schedule["bob_id"])
+    db.session.commit()
+
+    assert b"2 Spots Left" in client.get("/volunteer/shifts").data
+
+
+def test_event_list_badges_are_cached(client, app, schedule):
+    login(client, schedule["admin_id"])
+    assert b"07:45: 0/3" in client.get("/admin/events").data
+
+    statements, stop = capture_statements()
+    try:
+        client.get("/admin/events")
+    finally:
+        stop()
+    assert not any("FROM events" in s for s in statements)
+
+    signup = Signup(user_id=schedule["bob_id"], shift_id=schedule["shift_id"])
+    signup.confirmed = True
+    db.session.add(signup)
+    db.session.commit()
+    assert b"07:45: 1/3" in client.get("/admin/events").data
+
+
+def test_cache_size_zero_disables_caching(app):
+    app.config["FRAGMENT_CACHE_SIZE"] = 0
+    app.extensions.pop("fragment_cache", None)
+    cache = fragment_cache()
+    cache.set("key", "value")
+    assert cache.get("key") is None
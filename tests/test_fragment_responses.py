@@ -0,0 +1,120 @@
+import json
+from datetime import date, time, timedelta
+
+import pytest
+from flask import g
+
+from app.models import CheckIn, Event, Shift, Signup, User, Visitor, db
+
+FRAGMENT = {"HX-Request": "true"}
+
+
+@pytest.fixture
+def night(app):
+    supervisor = User(email="frag_admin@test.com", role="Shelter Supervisor")
+    volunteer = User(email="frag_vol@test.com", name="Frag Vol")
+    event_obj = Event(date=date.today() + timedelta(days=1), description="Frag Night")
+    shift = Shift(start_time=time(19, 45), end_time=time(0, 0), event=event_obj)
+    db.session.add_all([supervisor, volunteer, event_obj, shift])
+    db.session.commit()
+    return {
+        "admin_id": supervisor.id,
+        "volunteer_id": volunteer.id,
+        "event_id": event_obj.id,
+        "shift_id": shift.id,
+    }
+
+
+@pytest.fixture
+def admin_client(client, night):
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(night["admin_id"])
+        sess["_fresh"] = True
+    return client
+
+
+def flash_of(response):
+    return json.loads(response.headers["HX-Trigger"])["flash"]
+
+
+def test_checkin_returns_only_the_new_row(admin_client, night):
+    resp = admin_client.post(
+        f"/admin/events/{night['event_id']}/checkin",
+        data={"visitor_name": "New Guest"},
+        headers=FRAGMENT,
+    )
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert html.lstrip().startswith("<tr")
+    assert "New Guest" in html
+    assert "<html" not in html
+    assert flash_of(resp)["category"] == "success"
+    assert resp.headers["Cache-Control"] == "no-store"
+
+    visitor = Visitor.query.filter_by(name="New Guest").one()
+    assert CheckIn.query.filter_by(visitor_id=visitor.id).count() == 1
+    # The message rides in the header, not in the session
+    with admin_client.session_transaction() as sess:
+        assert "_flashes" not in sess
+
+
+def test_duplicate_checkin_is_a_conflict(admin_client, night):
+    url = f"/admin/events/{night['event_id']}/checkin"
+    admin_client.post(url, data={"visitor_name": "Repeat"}, headers=FRAGMENT)
+    resp = admin_client.post(url, data={"visitor_name": "Repeat"}, headers=FRAGMENT)
+    assert resp.status_code == 409
+    assert flash_of(resp)["message"] == "Repeat is already checked in."
+
+    resp = admin_client.post(url, data={}, headers=FRAGMENT)
+    assert resp.status_code == 422
+
+
+def test_assign_and_remove_return_the_shift_card(admin_client, night):
+    resp = admin_client.post(
+        f"/admin/shifts/{night['shift_id']}/assign",
+        data={"user_identifier": "frag_vol@test.com"},
+        headers=FRAGMENT,
+    )
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert f'id="shift-{night["shift_id"]}"' in html
+    assert "Frag Vol" in html
+    assert "1/" in html
+
+    resp = admin_client.post(
+        f"/admin/shifts/{night['shift_id']}/assign",
+        data={"user_identifier": "frag_vol@test.com"},
+        headers=FRAGMENT,
+    )
+    assert resp.status_code == 409
+
+    signup = Signup.query.filter_by(shift_id=night["shift_id"]).one()
+    resp = admin_client.post(f"/admin/signups/{signup.id}/remove", headers=FRAGMENT)
+    assert resp.status_code == 200
+    assert "No signups yet." in resp.get_data(as_text=True)
+    assert flash_of(resp)["message"] == "Volunteer removed from shift."
+
+
+def test_unknown_user_is_unprocessable(admin_client, night):
+    resp = admin_client.post(
+        f"/admin/shifts/{night['shift_id']}/assign",
+        data={"user_identifier": "nobody@test.com"},
+        headers=FRAGMENT,
+    )
+    assert resp.status_code == 422
+    assert flash_of(resp)["category"] == "danger"
+
+
+def test_plain_posts_still_redirect(admin_client, night):
+    resp = admin_client.post(
+        f"/admin/events/{night['event_id']}/checkin",
+        data={"visitor_name": "Form Guest"},
+    )
+    assert resp.status_code == 302
+    with admin_client.session_transaction() as sess:
+        messages = [message for _, message in sess["_flashes"]]
+    assert messages == [
+        "Created new visitor profile for Form Guest.",
+        "Checked in Form Guest successfully.",
+    ]
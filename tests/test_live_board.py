@@ -0,0 +1,144 @@
+import threading
+from datetime import date, time, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import update
+
+from app.live import RELOAD, StreamLimitReached, live_broker
+from app.models import CheckIn, DataVersion, Event, Shift, Signup, User, Visitor, db
+from app.versions import event_key
+
+
+@pytest.fixture
+def night(file_app):
+    supervisor = User(email="live_admin@test.com", role="Shelter Supervisor")
+    volunteer = User(email="live_vol@test.com", name="Live Vol")
+    event_obj = Event(date=date.today() + timedelta(days=1), description="Live Night")
+    shift = Shift(start_time=time(19, 45), end_time=time(0, 0), event=event_obj)
+    visitor = Visitor(name="Live Guest")
+    db.session.add_all([supervisor, volunteer, event_obj, shift, visitor])
+    db.session.commit()
+    yield {
+        "admin_id": supervisor.id,
+        "volunteer_id": volunteer.id,
+        "event_id": event_obj.id,
+        "shift_id": shift.id,
+        "visitor_id": visitor.id,
+    }
+    live_broker(file_app).close()
+
+
+def pollers(event_id):
+    return [t for t in threading.enumerate() if t.name == f"live-event-{event_id}"]
+
+
+def test_one_poller_fans_out_to_every_subscriber(file_app, night):
+    broker = live_broker(file_app)
+    subscriptions = [broker.subscribe(night["event_id"]) for _ in range(50)]
+    assert len(pollers(night["event_id"])) == 1
+
+    db.session.add(CheckIn(event_id=night["event_id"], visitor_id=night["visitor_id"]))
+    db.session.commit()
+
+    messages = [s.queue.get(timeout=5) for s in subscriptions]
+    assert messages[0].startswith("id: ")
+    assert "event: checkin" in messages[0]
+    assert "Live Guest" in messages[0]
+    # Rendered once, shared by all
+    assert all(message is messages[0] for message in messages)
+
+    db.session.add(Signup(user_id=night["volunteer_id"], shift_id=night["shift_id"]))
+    db.session.commit()
+    message = subscriptions[-1].queue.get(timeout=5)
+    assert "event: shift" in message
+    assert "Live Vol" in message
+
+    poller = pollers(night["event_id"])[0]
+    for subscription in subscriptions:
+        broker.unsubscribe(subscription)
+    poller.join(timeout=5)
+    assert not poller.is_alive()
+    assert broker.channels == {}
+
+
+def test_writes_from_other_processes_are_polled(file_app, night):
+    file_app.config["LIVE_POLL_INTERVAL"] = 0.05
+    subscription = live_broker(file_app).subscribe(night["event_id"])
+
+    # A plain connection skips this process's session hooks, as another
+    # process's commit would
+    with db.engine.begin() as conn:
+        conn.execute(
+            CheckIn.__table__.insert().values(
+                event_id=night["event_id"], visitor_id=night["visitor_id"]
+            )
+        )
+        conn.execute(
+            update(DataVersion)
+            .where(DataVersion.key == event_key(night["event_id"]))
+            .values(version=DataVersion.version + 1)
+        )
+
+    assert "Live Guest" in subscription.queue.get(timeout=5)
+
+
+def test_reconnect_replays_missed_deltas(file_app, night):
+    broker = live_broker(file_app)
+    first = broker.subscribe(night["event_id"])
+    since = first.channel.version
+
+    db.session.add(CheckIn(event_id=night["event_id"], visitor_id=night["visitor_id"]))
+    db.session.commit()
+    delta = first.queue.get(timeout=5)
+
+    late = broker.subscribe(night["event_id"], since=since)
+    assert late.queue.get_nowait() == delta
+
+    # Older than anything the channel remembers
+    stale = broker.subscribe(night["event_id"], since=since - 1)
+    assert stale.queue.get_nowait() == RELOAD
+
+
+def test_stream_endpoint(file_app, night):
+    client = file_app.test_client()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(night["admin_id"])
+        sess["_fresh"] = True
+
+    response = client.get(f"/admin/events/{night['event_id']}/live?since=0")
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-store"
+    # Version 0 predates the channel, so the client is told to reload
+    assert next(response.response) == RELOAD.encode()
+
+    response.close()
+    assert live_broker(file_app).channels == {}
+
+
+def test_streams_are_capped_per_process(file_app, night):
+    file_app.config["LIVE_MAX_STREAMS"] = 2
+    broker = live_broker(file_app)
+    first = broker.subscribe(night["event_id"], limit=2)
+    broker.subscribe(night["event_id"], limit=2)
+
+    with pytest.raises(StreamLimitReached):
+        broker.subscribe(night["event_id"], limit=2)
+
+    client = file_app.test_client()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(night["admin_id"])
+        sess["_fresh"] = True
+    response = client.get(f"/admin/events/{night['event_id']}/live")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+
+    # A closed board frees its slot
+    broker.unsubscribe(first)
+    broker.unsubscribe(first)
+    assert broker.streams == 1
+    response = client.get(f"/admin/events/{night['event_id']}/live")
+    assert response.mimetype == "text/event-stream"
+    response.close()
@@ -0,0 +1,133 @@
+from datetime import date, time
+
+import pytest
+from flask import g
+from sqlalchemy import event, text, update
+
+from app.dedupe import merge_visitors
+from app.models import CheckIn, Event, NightlyStat, Shift, Signup, User, Visitor, db
+from app.planning import plan_season
+from app.signups import claim_shift_slot
+
+
+@pytest.fixture
+def season(app):
+    nights = [Event(date=date(2026, 12, day)) for day in (1, 2)]
+    db.session.add_all(nights)
+    db.session.flush()
+    shifts = [
+        Shift(event_id=night.id, start_time=time(19, 45), end_time=time(0, 0))
+        for night in nights
+    ]
+    guests = [Visitor(name=name) for name in ("Ann", "Ben", "Cy")]
+    volunteer = User(email="stats_vol@test.com", role="Team Member")
+    db.session.add_all([*shifts, *guests, volunteer])
+    db.session.commit()
+    return nights, shifts, guests, volunteer
+
+
+def stat(event_id):
+    db.session.expire_all()
+    return db.session.get(NightlyStat, event_id)
+
+
+def test_rollup_follows_checkins_and_signups(season):
+    (first, second), (shift, _), (ann, ben, cy), volunteer = season
+    assert stat(first.id).guests == 0
+    assert stat(first.id).slots_required == 2
+
+    db.session.add_all(
+        [
+            CheckIn(event_id=first.id, visitor_id=ann.id),
+            CheckIn(event_id=first.id, visitor_id=ben.id),
+            CheckIn(event_id=second.id, visitor_id=ann.id),
+            CheckIn(event_id=second.id, visitor_id=cy.id),
+        ]
+    )
+    db.session.commit()
+    assert (stat(first.id).guests, stat(first.id).new_guests) == (2, 2)
+    row = stat(second.id)
+    assert (row.guests, row.new_guests, row.returning_guests) == (2, 1, 1)
+
+    claim_shift_slot(shift.id, volunteer.id)
+    db.session.commit()
+    row = stat(first.id)
+    assert (row.slots_filled, row.slots_confirmed, row.confirmed_ratio) == (1, 0, 0)
+
+    signup = Signup.query.one()
+    signup.confirmed = True
+    db.session.commit()
+    assert stat(first.id).confirmed_ratio == 1
+
+    spare = Event(date=date(2026, 12, 3))
+    db.session.add(spare)
+    db.session.commit()
+    spare_id = spare.id
+    assert stat(spare_id).guests == 0
+    db.session.delete(spare)
+    db.session.commit()
+    assert stat(spare_id) is None
+
+
+def test_bulk_writes_are_rolled_up(app):
+    plan_season(date(2026, 12, 1), date(2026, 12, 7))
+    db.session.commit()
+    assert NightlyStat.query.count() == 7
+    assert {row.slots_required for row in NightlyStat.query} == {6}
+
+
+def test_unnamed_bulk_writes_wait_for_the_rebuild(season):
+    (first, second), _, (ann, ben, _), _ = season
+    db.session.add(CheckIn(event_id=second.id, visitor_id=ben.id))
+    db.session.commit()
+    db.session.execute(text("DELETE FROM nightly_stats"))
+    db.session.commit()
+
+    # A bulk statement naming no events bumps EVENTS; nothing is rebuilt
+    db.session.execute(update(CheckIn).values(visitor_id=ann.id))
+    db.session.commit()
+    assert NightlyStat.query.count() == 0
+
+    # Merging names the nights of the merged check-ins
+    db.session.add(CheckIn(event_id=first.id, visitor_id=ben.id))
+    db.session.commit()
+    merge_visitors(ann.id, [ben.id])
+    db.session.commit()
+    assert stat(first.id).guests == 1
+    assert stat(second.id).guests == 1
+
+
+def test_rebuild_and_report_read_the_rollup(client, runner, season):
+    (first, second), _, (ann, _, _), _ = season
+    db.session.add(CheckIn(event_id=second.id, visitor_id=ann.id))
+    db.session.commit()
+
+    db.session.execute(text("DELETE FROM nightly_stats"))
+    db.session.commit()
+    result = runner.invoke(args=["rebuild-nightly-stats"])
+    assert "Rebuilt nightly stats for 2 event(s)." in result.output
+    assert stat(second.id).new_guests == 1
+
+    admin = User(email="stats_admin@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        page = client.get("/admin/reports?start=2026-12-02").get_data(as_text=True)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert "Wed, Dec 02, 2026" in page
+    assert "Tue, Dec 01, 2026" not in page
+    # The report never aggregates the raw check-ins
+    assert not any("checkins" in s for s in statements)
@@ -0,0 +1,111 @@
+import pytest
+from flask import g
+from sqlalchemy import text, update
+
+from app.models import User, Visitor, db
+from app.search import search_users, search_visitors
+
+
+@pytest.fixture
+def people(app):
+    db.session.add_all(
+        [
+            User(
+                email="jsmith@example.com",
+                name="John Smith",
+                phone_number="(555) 123-4567",
+                role="Shelter Supervisor",
+            ),
+            User(email="johnny.walker@example.com", name="Walker"),
+            User(email="mary@example.org", name="Mary Jones"),
+            Visitor(name="Robert Paulson", alias="Bob"),
+            Visitor(name="Bobby Tables", alias="Drop"),
+            Visitor(name="Alice Zed"),
+        ]
+    )
+    db.session.commit()
+
+
+def emails(query):
+    return [user.email for user in search_users(query)]
+
+
+def test_users_match_name_email_and_phone(people):
+    assert emails("smith") == ["jsmith@example.com"]
+    assert emails("example.org") == ["mary@example.org"]
+    assert emails("5551234") == ["jsmith@example.com"]
+    assert emails("555-123") == ["jsmith@example.com"]
+    # Every word must match, each as a prefix
+    assert emails("jo sm") == ["jsmith@example.com"]
+    assert emails("nobody") == []
+    # FTS syntax in the input is not interpreted
+    assert emails('"* -') == []
+    assert emails('smith" OR "mary') == []
+
+
+def test_name_matches_rank_above_email_matches(people):
+    # "john" is John Smith's name but only part of Johnny's email
+    assert emails("john") == ["jsmith@example.com", "johnny.walker@example.com"]
+
+
+def test_visitors_match_name_and_alias(people):
+    assert {v.name for v in search_visitors("bob")} == {
+        "Robert Paulson",
+        "Bobby Tables",
+    }
+    assert [v.name for v in search_visitors("drop")] == ["Bobby Tables"]
+
+
+def test_index_follows_orm_and_bulk_writes(people):
+    user = User.query.filter_by(email="mary@example.org").one()
+    user.name = "Mary Poppins"
+    db.session.commit()
+    assert emails("poppins") == ["mary@example.org"]
+    assert emails("jones") == []
+
+    db.session.execute(
+        update(Visitor).where(Visitor.name == "Alice Zed").values(alias="Ally")
+    )
+    db.session.commit()
+    assert [v.name for v in search_visitors("ally")] == ["Alice Zed"]
+
+    db.session.delete(user)
+    db.session.commit()
+    assert emails("poppins") == []
+
+
+def test_search_uses_the_fts_index(people):
+    query = search_users("smith").statement.compile(
+        db.engine, compile_kwargs={"literal_binds": True}
+    )
+    plan = " ".join(
+        str(row[-1]) for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {query}"))
+    )
+    assert "VIRTUAL TABLE" in plan
+    assert "SCAN users" not in plan
+
+
+def test_team_and_visitor_pages_search(client, people):
+    admin = User.query.filter_by(email="jsmith@example.com").one()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    page = client.get("/admin/team?q=mary").data
+    assert b"mary@example.org" in page
+    assert b"johnny.walker@example.com" not in page
+
+    page = client.get("/visitors/?q=paul").data
+    assert b"Robert Paulson" in page
+    assert b"Alice Zed" not in page
+
+
+def test_reindex_command_repopulates(runner, people):
+    db.session.execute(text("DELETE FROM user_search"))
+    db.session.commit()
+    assert emails("smith") == []
+
+    result = runner.invoke(args=["search-reindex"])
+    assert "Search index rebuilt." in result.output
+    assert emails("smith") == ["jsmith@example.com"]
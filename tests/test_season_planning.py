@@ -0,0 +1,106 @@
+from datetime import date, time
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.models import Event, Shift, User, db
+from app.planning import parse_shift_template, plan_season
+
+
+def test_plan_season_skips_existing_dates(app):
+    db.session.add(Event(date=date(2026, 12, 3)))
+    db.session.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        plan = plan_season(date(2026, 12, 1), date(2027, 2, 28))
+        db.session.commit()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert len(plan.created) == 89
+    assert plan.skipped == [date(2026, 12, 3)]
+    assert Event.query.count() == 90
+    assert Shift.query.count() == 89 * 3
+    # Bulk statements, not a round trip per event or shift
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    assert len([s for s in inserts if "INTO shifts" in s]) == 1
+    assert len(statements) < 20
+
+    shift = Shift.query.order_by(Shift.id).first()
+    assert (shift.start_time, shift.end_time, shift.capacity) == (
+        time(19, 45),
+        time(0, 0),
+        2,
+    )
+    assert shift.signup_count == 0
+
+
+def test_weekday_filter_and_shift_template(app):
+    plan = plan_season(
+        date(2026, 11, 1),
+        date(2026, 11, 30),
+        weekdays={4, 5},
+        shifts=parse_shift_template("20:00-02:00, 02:00-08:00"),
+        capacity=3,
+    )
+    db.session.commit()
+
+    assert {day.weekday() for day in plan.created} == {4, 5}
+    assert len(plan.created) == 8
+    assert {(s.start_time, s.capacity) for s in Shift.query} == {
+        (time(20, 0), 3),
+        (time(2, 0), 3),
+    }
+
+
+def test_bad_input_is_rejected(app):
+    with pytest.raises(ValueError):
+        parse_shift_template("8pm-midnight")
+    with pytest.raises(ValueError):
+        plan_season(date(2026, 12, 1), date(2026, 11, 1))
+    with pytest.raises(ValueError):
+        plan_season(date(2026, 1, 1), date(2028, 1, 1))
+
+
+def test_plan_page(client, app):
+    admin = User(email="planner@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    assert b"19:45-00:00" in client.get("/admin/events/plan").data
+
+    resp = client.post(
+        "/admin/events/plan",
+        data={
+            "start_date": "2026-12-01",
+            "end_date": "2026-12-07",
+            "weekdays": ["5", "6"],
+            "shifts": "19:45-00:00,00:00-04:00,04:00-08:00",
+            "status": "planned",
+        },
+        follow_redirects=True,
+    )
+    assert b"Created 2 event(s)." in resp.data
+    assert Event.query.count() == 2
+
+
+def test_plan_season_command(runner, app):
+    result = runner.invoke(
+        args=["plan-season", "2026-12-01", "2026-12-12", "--weekdays", "fri"]
+    )
+    assert "Created 2 event(s)." in result.output
+
+    result = runner.invoke(args=["plan-season", "2026-12-01", "2026-12-12"])
+    assert "Created 10 event(s)." in result.output
+    assert "Skipped 2026-12-04" in result.output
@@ -0,0 +1,111 @@
+from datetime import date, time
+
+import pytest
+from flask import g
+from sqlalchemy import event, text
+
+from app.models import Event, Shift, ShiftPreference, Signup, User, db
+from app.preferences import slot_for_shift, volunteers_for_shift, volunteers_preferring
+
+
+@pytest.fixture
+def team(app):
+    users = [
+        User(email="early@test.com", name="Early", shift_preference="7:45PM-12AM"),
+        User(
+            email="both@test.com",
+            name="Both",
+            shift_preference="12AM-4AM, 7:45PM-12AM",
+        ),
+        User(email="late@test.com", name="Late", shift_preference="4AM-8AM"),
+        User(email="none@test.com", name="None"),
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def test_string_property_round_trips(team):
+    early, both, late, none = team
+    # Stored one row per slot, read back in shift order
+    assert both.shift_preference == "7:45PM-12AM,12AM-4AM"
+    assert both.shift_slots == ["7:45PM-12AM", "12AM-4AM"]
+    assert none.shift_preference is None
+    assert ShiftPreference.query.count() == 4
+
+    both.shift_slots = ["12AM-4AM", "4AM-8AM"]
+    none.shift_preference = ""
+    db.session.commit()
+    assert both.shift_preference == "12AM-4AM,4AM-8AM"
+    assert ShiftPreference.query.count() == 4
+
+
+def test_volunteers_for_shift(team):
+    early, both, late, none = team
+    night = Event(date=date(2026, 12, 1))
+    db.session.add(night)
+    db.session.flush()
+    first = Shift(event_id=night.id, start_time=time(19, 45), end_time=time(0, 0))
+    odd = Shift(event_id=night.id, start_time=time(21, 0), end_time=time(1, 0))
+    db.session.add_all([first, odd])
+    db.session.flush()
+    db.session.add(Signup(user_id=early.id, shift_id=first.id))
+    db.session.commit()
+
+    assert slot_for_shift(first) == "7:45PM-12AM"
+    assert slot_for_shift(odd) is None
+    assert [u.name for u in volunteers_for_shift(first)] == ["Both"]
+    assert [u.name for u in volunteers_for_shift(first, exclude_signed_up=False)] == [
+        "Both",
+        "Early",
+    ]
+    assert volunteers_for_shift(odd).all() == []
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        volunteers_for_shift(first).all()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    assert len(statements) == 1
+
+    plan = " ".join(
+        str(row[-1])
+        for row in db.session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT user_id FROM shift_preferences "
+                "WHERE slot = '12AM-4AM'"
+            )
+        )
+    )
+    assert "ix_shift_preferences_slot_user" in plan
+
+
+def test_profile_and_team_filter(client, team):
+    admin = User(email="pref_admin@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    resp = client.post(
+        "/profile",
+        data={"name": "Admin", "shift_preference": ["4AM-8AM", "12AM-4AM"]},
+        follow_redirects=True,
+    )
+    assert resp.status_code == 200
+    assert [u.email for u in volunteers_preferring("4AM-8AM")] == [
+        "pref_admin@test.com",
+        "late@test.com",
+    ]
+
+    page = client.get("/admin/team?slot=12AM-4AM").get_data(as_text=True)
+    assert "both@test.com" in page
+    assert "pref_admin@test.com" in page
+    assert "early@test.com" not in page
@@ -0,0 +1,144 @@
+import threading
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app.email import send_email
+from app.models import Email, Event, Shift, Signup, User, db
+from app.signups import (
+    SIGNUP_CREATED,
+    SIGNUP_DUPLICATE,
+    SIGNUP_FULL,
+    claim_shift_slot,
+)
+
+
+def make_shift(capacity=2):
+    event = Event(date=date(2025, 12, 31), description="Race Night")
+    shift = Shift(
+        start_time=time(19, 45), end_time=time(0, 0), event=event, capacity=capacity
+    )
+    db.session.add_all([event, shift])
+    db.session.commit()
+    return shift.id
+
+
+def test_claim_outcomes(app):
+    """A claim succeeds once, then reports duplicate, then full."""
+    shift_id = make_shift(capacity=1)
+    u1 = User(email="one@test.com")
+    u2 = User(email="two@test.com")
+    db.session.add_all([u1, u2])
+    db.session.commit()
+
+    assert claim_shift_slot(shift_id, u1.id) == SIGNUP_CREATED
+    db.session.commit()
+    assert claim_shift_slot(shift_id, u1.id) == SIGNUP_DUPLICATE
+    assert claim_shift_slot(shift_id, u2.id) == SIGNUP_FULL
+
+    signup = Signup.query.one()
+    assert signup.user_id == u1.id
+    assert signup.confirmed is False
+    assert signup.created_at is not None
+
+
+def test_unique_constraint_on_user_and_shift(app):
+    """The database rejects a second signup row for the same user and shift."""
+    shift_id = make_shift()
+    user = User(email="dup@test.com")
+    db.session.add(user)
+    db.session.commit()
+
+    db.session.add(Signup(user_id=user.id, shift_id=shift_id))
+    db.session.commit()
+
+    db.session.add(Signup(user_id=user.id, shift_id=shift_id))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_losing_the_race_keeps_the_callers_work(app):
+    """A duplicate caught by the constraint rolls back only the claim."""
+    shift_id = make_shift()
+    user = User(email="racer@test.com")
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+
+    # Pending work of the caller, from before the claim
+    db.session.add(User(email="bystander@test.com"))
+    send_email("Queued", None, ["queued@test.com"], "Still wanted", None)
+
+    def same_user_signs_up_meanwhile(conn, cursor, statement, *args):
+        # Another request inserts the same signup after the capacity check
+        if statement.startswith("UPDATE shifts"):
+            cursor.execute(
+                "INSERT INTO signups (user_id, shift_id, confirmed) VALUES (?, ?, 0)",
+                (user_id, shift_id),
+            )
+
+    event.listen(db.engine, "after_cursor_execute", same_user_signs_up_meanwhile)
+    try:
+        assert claim_shift_slot(shift_id, user_id) == SIGNUP_DUPLICATE
+    finally:
+        event.remove(db.engine, "after_cursor_execute", same_user_signs_up_meanwhile)
+    db.session.commit()
+
+    assert User.query.filter_by(email="bystander@test.com").count() == 1
+    assert Email.query.filter_by(recipient="queued@test.com").count() == 1
+    assert db.session.get(Shift, shift_id).signup_count == 0
+
+
+def test_concurrent_signups_never_overfill(file_app):
+    """Fire 50 simultaneous signups at one shift; only capacity may succeed."""
+    shift_id = make_shift(capacity=2)
+    users = [User(email=f"racer{i}@test.com") for i in range(50)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [u.id for u in users]
+
+    barrier = threading.Barrier(len(user_ids))
+    outcomes = []
+    lock = threading.Lock()
+
+    def attempt(user_id):
+        with file_app.app_context():
+            barrier.wait()
+            outcome = claim_shift_slot(shift_id, user_id)
+            db.session.commit()
+            with lock:
+                outcomes.append(outcome)
+
+    threads = [threading.Thread(target=attempt, args=(uid,)) for uid in user_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes.count(SIGNUP_CREATED) == 2
+    assert outcomes.count(SIGNUP_FULL) == 48
+    assert Signup.query.filter_by(shift_id=shift_id).count() == 2
+
+
+def test_signup_route_reports_full_shift(client, app):
+    """The volunteer route surfaces the atomic claim outcome."""
+    shift_id = make_shift(capacity=1)
+    taken = User(email="taken@test.com", role="Team Member")
+    late = User(email="late@test.com", role="Team Member")
+    db.session.add_all([taken, late])
+    db.session.commit()
+    db.session.add(Signup(user_id=taken.id, shift_id=shift_id))
+    db.session.commit()
+    late_id = late.id
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(late_id)
+        sess["_fresh"] = True
+
+    resp = client.post(f"/volunteer/signup/{shift_id}", follow_redirects=True)
+    assert resp.status_code == 200
+    assert b"This shift is full" in resp.data
+    assert Signup.query.filter_by(user_id=late_id).count() == 0
@@ -0,0 +1,100 @@
+from datetime import date, time
+
+from app.models import Event, Shift, Signup, User, db
+from app.signups import claim_shift_slot, find_counter_drift
+
+
+def make_shift():
+    event = Event(date=date(2025, 12, 31), description="Counter Night")
+    shift = Shift(start_time=time(0, 0), end_time=time(4, 0), event=event)
+    db.session.add_all([event, shift])
+    db.session.commit()
+    return shift
+
+
+def make_users(count):
+    users = [User(email=f"counter{i}@test.com") for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def test_counters_follow_insert_confirm_and_delete(app):
+    """Signup inserts, confirmations and deletes keep the counters in sync."""
+    shift = make_shift()
+    u1, u2 = make_users(2)
+
+    assert shift.signup_count == 0
+    assert shift.confirmed_count == 0
+
+    s1 = Signup(user_id=u1.id, shift_id=shift.id)
+    s2 = Signup(user_id=u2.id, shift_id=shift.id, confirmed=True)
+    db.session.add_all([s1, s2])
+    db.session.commit()
+    assert (shift.signup_count, shift.confirmed_count) == (2, 1)
+
+    s1.confirmed = True
+    db.session.commit()
+    assert (shift.signup_count, shift.confirmed_count) == (2, 2)
+
+    db.session.delete(s2)
+    db.session.commit()
+    assert (shift.signup_count, shift.confirmed_count) == (1, 1)
+
+    assert find_counter_drift() == []
+
+
+def test_counters_follow_move_between_shifts(app):
+    """Moving a signup to another shift updates both shifts."""
+    first = make_shift()
+    second = make_shift()
+    (user,) = make_users(1)
+
+    signup = Signup(user_id=user.id, shift_id=first.id, confirmed=True)
+    db.session.add(signup)
+    db.session.commit()
+
+    signup.shift_id = second.id
+    db.session.commit()
+
+    assert (first.signup_count, first.confirmed_count) == (0, 0)
+    assert (second.signup_count, second.confirmed_count) == (1, 1)
+
+
+def test_claim_updates_counters_once(app):
+    """The atomic claim path bumps the counters exactly once."""
+    shift = make_shift()
+    (user,) = make_users(1)
+
+    claim_shift_slot(shift.id, user.id, confirmed=True)
+    db.session.commit()
+
+    assert (shift.signup_count, shift.confirmed_count) == (1, 1)
+    assert find_counter_drift() == []
+
+
+def test_consistency_command_detects_and_repairs_drift(app, runner):
+    """The CLI reports drifted shifts and rewrites them with --repair."""
+    shift = make_shift()
+    (user,) = make_users(1)
+    db.session.add(Signup(user_id=user.id, shift_id=shift.id, confirmed=True))
+    db.session.commit()
+
+    # Simulate drift from a write that bypassed the ORM
+    db.session.execute(
+        Shift.__table__.update().values(signup_count=5, confirmed_count=0)
+    )
+    db.session.commit()
+
+    result = runner.invoke(args=["check-signup-counters"])
+    assert f"Shift {shift.id}: signups 5 (actual 1)" in result.output
+    assert "--repair" in result.output
+
+    result = runner.invoke(args=["check-signup-counters", "--repair"])
+    assert "Repaired 1 shift(s)." in result.output
+
+    db.session.expire_all()
+    assert (shift.signup_count, shift.confirmed_count) == (1, 1)
+
+    result = runner.invoke(args=["check-signup-counters"])
+    assert "All shift counters are consistent." in result.output
@@ -0,0 +1,108 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.email import render_email_bodies
+from app.models import Email, Event, Shift, Signup, User, db
+from app.notifications import send_signup_digest, supervisor_emails
+
+
+@pytest.fixture
+def digest_setup(app):
+    supervisors = [
+        User(email="sup1@test.com", role="Shelter Supervisor"),
+        User(email="sup2@test.com", role="Shelter Supervisor"),
+        User(email="quiet@test.com", role="Shelter Supervisor", email_allowed=False),
+    ]
+    volunteers = [
+        User(email=f"digest{i}@test.com", name=f"Digest {i}", role="Team Member")
+        for i in range(3)
+    ]
+    event_obj = Event(date=date(2025, 12, 31), description="Digest Night")
+    shift = Shift(
+        start_time=time(19, 45), end_time=time(0, 0), event=event_obj, capacity=5
+    )
+    db.session.add_all([*supervisors, *volunteers, event_obj, shift])
+    db.session.commit()
+    return {"volunteer_ids": [v.id for v in volunteers], "shift_id": shift.id}
+
+
+def sign_up(client, user_id, shift_id):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    return client.post(f"/volunteer/signup/{shift_id}")
+
+
+def supervisor_emails_queued():
+    return Email.query.filter(Email.recipient.like("sup%")).all()
+
+
+def test_immediate_mode_notifies_each_signup(client, app, digest_setup):
+    """Without a digest window every signup emails supervisors right away."""
+    sign_up(client, digest_setup["volunteer_ids"][0], digest_setup["shift_id"])
+
+    emails = supervisor_emails_queued()
+    assert sorted(e.recipient for e in emails) == ["sup1@test.com", "sup2@test.com"]
+    assert all(e.subject == "[MECWS] New Volunteer Signup" for e in emails)
+
+    # Already reported, so a later digest stays empty
+    assert Signup.query.one().supervisor_notified_at is not None
+    assert send_signup_digest(force=True) == 0
+
+
+def test_digest_mode_coalesces_signups(client, app, digest_setup):
+    """Signups within a window produce one summary per supervisor."""
+    app.config["SIGNUP_DIGEST_MINUTES"] = 10
+
+    first, *others = digest_setup["volunteer_ids"]
+    sign_up(client, first, digest_setup["shift_id"])
+    assert supervisor_emails_queued() == []
+
+    # current_user is cached for the whole test, so add the rest directly
+    db.session.add_all(
+        [Signup(user_id=uid, shift_id=digest_setup["shift_id"]) for uid in others]
+    )
+    db.session.commit()
+
+    # The window has not elapsed yet
+    assert send_signup_digest() == 0
+
+    # Age the oldest signup past the window
+    oldest = Signup.query.order_by(Signup.id).first()
+    oldest.created_at = datetime.utcnow() - timedelta(minutes=11)
+    db.session.commit()
+
+    assert send_signup_digest() == 3
+
+    emails = supervisor_emails_queued()
+    assert sorted(e.recipient for e in emails) == ["sup1@test.com", "sup2@test.com"]
+    assert emails[0].subject == "[MECWS] 3 New Volunteer Signup(s)"
+    body_text, _ = render_email_bodies(emails[0])
+    for i in range(3):
+        assert f"Digest {i}" in body_text
+
+    # Nothing left to report
+    assert send_signup_digest(force=True) == 0
+
+
+def test_supervisor_list_is_cached_until_users_change(app, digest_setup):
+    statements = []
+
+    def count(conn, cursor, statement, params, context, many):
+        statements.append(statement)
+
+    assert supervisor_emails() == ["sup1@test.com", "sup2@test.com"]
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        assert supervisor_emails() == ["sup1@test.com", "sup2@test.com"]
+        assert statements == []
+
+        # Any user write drops the cache
+        db.session.add(User(email="sup3@test.com", role="Shelter Supervisor"))
+        db.session.commit()
+        assert "sup3@test.com" in supervisor_emails()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
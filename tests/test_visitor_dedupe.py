@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+
+import pytest
+from flask import g
+
+from app.dedupe import blocking_keys, find_duplicates, merge_visitors, soundex
+from app.models import CheckIn, Event, User, Visitor, db
+from app.search import search_visitors
+
+
+@pytest.fixture
+def nights(app):
+    events = [Event(date=date.today() - timedelta(days=i)) for i in range(3)]
+    db.session.add_all(events)
+    db.session.commit()
+    return [event.id for event in events]
+
+
+def add_visitors(*names):
+    visitors = [Visitor(name=name) for name in names]
+    db.session.add_all(visitors)
+    db.session.commit()
+    return [visitor.id for visitor in visitors]
+
+
+def test_soundex():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert soundex("Ashcraft") == "A261"
+    assert soundex("Tymczak") == "T522"
+    assert soundex("") == ""
+
+
+def test_typos_and_swapped_names_share_a_block():
+    assert blocking_keys("Jonathan Smith") & blocking_keys("Jonathan Smiht")
+    assert blocking_keys("Jonathan Smith") & blocking_keys("Jonahtan Smith")
+    assert blocking_keys("Jonathan Smith") & blocking_keys("smith, jonathan")
+    assert not blocking_keys("Jonathan Smith") & blocking_keys("Maria Garcia")
+
+
+def test_find_duplicates(app):
+    smith, typo, swapped, accented, plain, other = add_visitors(
+        "Jonathan Smith",
+        "Jonathan Smiht",
+        "Smith Jonathan",
+        "José Álvarez",
+        "Jose Alvarez",
+        "Maria Garcia",
+    )
+
+    pairs = {(p.visitor_id, p.other_id): p.score for p in find_duplicates()}
+    assert pairs[(accented, plain)] == 1.0
+    assert pairs[(smith, swapped)] == 1.0
+    assert pairs[(smith, typo)] >= 0.85
+    assert not any(other in pair for pair in pairs)
+
+
+def test_merge_repoints_checkins(app, nights):
+    keep_id, dupe_id = add_visitors("Jonathan Smith", "Jonathon Smith")
+    db.session.get(Visitor, dupe_id).alias = "Jon"
+    db.session.add_all(
+        [
+            CheckIn(event_id=nights[0], visitor_id=keep_id),
+            CheckIn(event_id=nights[0], visitor_id=dupe_id),
+            CheckIn(event_id=nights[1], visitor_id=dupe_id),
+            CheckIn(event_id=nights[2], visitor_id=dupe_id),
+        ]
+    )
+    db.session.commit()
+
+    assert merge_visitors(keep_id, [dupe_id]) == 2
+    db.session.commit()
+
+    assert db.session.get(Visitor, dupe_id) is None
+    kept = db.session.get(Visitor, keep_id)
+    assert kept.alias == "Jon"
+    # One check-in per night, all on the kept profile
+    assert sorted(c.event_id for c in kept.checkins) == sorted(nights)
+    assert CheckIn.query.count() == 3
+    assert [v.id for v in search_visitors("jonathon")] == []
+
+
+def test_merge_page(client, app, nights):
+    admin = User(email="dedupe_admin@test.com", role="Shelter Supervisor")
+    db.session.add(admin)
+    db.session.commit()
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    keep_id, dupe_id = add_visitors("Patricia O'Neil", "Patricia ONeil")
+    page = client.get("/visitors/duplicates").get_data(as_text=True)
+    assert "Patricia ONeil" in page
+    assert "Keep Patricia O&#39;Neil" in page
+
+    resp = client.post(
+        "/visitors/merge",
+        data={"keep_id": keep_id, "merge_id": dupe_id},
+        follow_redirects=True,
+    )
+    assert b"No likely duplicates found." in resp.data
+    assert Visitor.query.count() == 1